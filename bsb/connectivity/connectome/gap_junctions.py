@@ -1,5 +1,7 @@
 import numpy as np
+from sklearn.neighbors import KDTree
 from ..strategy import ConnectionStrategy
+from ...functions import sample_per_group
 
 
 class ConnectomeGapJunctions(ConnectionStrategy):
@@ -135,3 +137,96 @@ class ConnectomeGapJunctionsGolgi(ConnectionStrategy):
             r_goc_vol, GoCaxon_x, GoCaxon_y, GoCaxon_z, golgis, first_golgi
         )
         self.scaffold.connect_cells(self, result)
+
+
+class ConnectomeGapJunctionsTree(ConnectomeGapJunctions):
+    """
+    Gap junctions between a cell type, with the same rules as
+    :class:`ConnectomeGapJunctions`, but the candidates are found with a radius query
+    on a KDTree of the cells instead of computing all pairwise distances. Only the
+    pairs within range are ever stored.
+    """
+
+    def connect(self):
+        from_cell_type = self.from_cell_types[0]
+        cells = self.from_cells[from_cell_type.name]
+        # Stretch the z-axis so that the cylindrical range becomes a subset of a sphere
+        # with radius `sqrt(2) * limit_xy`, then filter out the pairs outside of the
+        # cylinder.
+        points = cells[:, 2:5] * [1.0, 1.0, self.limit_xy / self.limit_z]
+        pre, post = _query_pairs(points, np.sqrt(2) * self.limit_xy)
+        d_xy = np.sqrt(
+            (cells[pre, 2] - cells[post, 2]) ** 2 + (cells[pre, 3] - cells[post, 3]) ** 2
+        )
+        d_z = np.abs(cells[pre, 4] - cells[post, 4])
+        roll = np.random.random(len(pre))
+        accepted = (
+            (d_z < self.limit_z)
+            & (d_z != 0)
+            & (d_xy < self.limit_xy)
+            & (roll > d_z / self.limit_z)
+            & (roll > d_xy / self.limit_xy)
+        )
+        self.scaffold.connect_cells(
+            self, _limit_divergence(cells, pre[accepted], post[accepted], self.divergence)
+        )
+
+
+class ConnectomeGapJunctionsGolgiTree(ConnectomeGapJunctionsGolgi):
+    """
+    Golgi cell gap junctions, with the same rules as
+    :class:`ConnectomeGapJunctionsGolgi`, but the candidates are found with a radius
+    query on a KDTree of the Golgi cells instead of a dense pairwise search. An
+    optional ``divergence`` limits the amount of gap junctions per Golgi cell.
+    """
+
+    casts = {"divergence": int}
+
+    defaults = {"divergence": None}
+
+    def connect(self):
+        golgi_cell_type = self.from_cell_types[0]
+        golgis = self.from_cells[golgi_cell_type.name]
+        morphology = golgi_cell_type.morphology
+        r = morphology.dendrite_radius
+        half_box = np.array(
+            [
+                r + morphology.axon_x / 2.0,
+                r + morphology.axon_y / 2.0,
+                r + morphology.axon_z / 2.0,
+            ]
+        )
+        # Scale the box criterion to a unit cube, which is a Chebyshev ball of radius 1.
+        pre, post = _query_pairs(golgis[:, 2:5] / half_box, 1.0, metric="chebyshev")
+        self.scaffold.connect_cells(
+            self, _limit_divergence(golgis, pre, post, self.divergence)
+        )
+
+
+def _query_pairs(points, radius, metric="euclidean"):
+    """
+    Return the indices of all pairs of distinct points within ``radius`` of each other,
+    in both directions.
+    """
+    if not len(points):
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    tree = KDTree(points, metric=metric)
+    neighbours = tree.query_radius(points, radius)
+    counts = np.fromiter(map(len, neighbours), dtype=int, count=len(neighbours))
+    pre = np.repeat(np.arange(len(points)), counts)
+    post = np.concatenate(neighbours).astype(int)
+    not_self = pre != post
+    return pre[not_self], post[not_self]
+
+
+def _limit_divergence(cells, pre, post, divergence):
+    """
+    Convert pairs of cell indices into a connection matrix, keeping a random selection
+    of at most ``divergence`` connections per presynaptic cell.
+    """
+    if divergence is not None:
+        limit = np.full(len(cells), divergence)
+        keep = sample_per_group(pre, np.arange(len(pre)), limit)
+        pre, post = pre[keep], post[keep]
+    order = np.lexsort((post, pre))
+    return np.column_stack((cells[pre[order], 0], cells[post[order], 0]))
@@ -2,6 +2,7 @@ import numpy as np
 from ..strategy import ConnectionStrategy
 from ...exceptions import *
 from ...reporting import warn
+from ...functions import concat_ranges, rank_in_group, sample_per_group, isin_sorted
 
 
 class ConnectomeGranuleGolgi(ConnectionStrategy):
@@ -143,3 +144,189 @@ class ConnectomeGranuleGolgi(ConnectionStrategy):
         )
         self.scaffold.connect_cells(self, result_aa, self.tag_aa)
         self.scaffold.connect_cells(self, result_pf, self.tag_pf)
+
+
+class ConnectomeGranuleGolgiBulk(ConnectomeGranuleGolgi):
+    """
+    Bulk implementation of the granule to Golgi cell connectivity. The contact zones
+    of all Golgi cells are looked up at once on a 2D grid over the granule x/z
+    positions and the convergence is sampled for all Golgi cells simultaneously,
+    instead of growing the connection matrices one Golgi cell at a time.
+
+    Follows the same rules as :class:`ConnectomeGranuleGolgi`: ascending axons within
+    the dendritic radius are accepted with a probability decreasing with distance,
+    each ascending axon contacts at most one Golgi cell and the remaining convergence
+    is filled with parallel fibers from the strip of granule cells within the dendritic
+    radius along the x-axis.
+
+    Ascending axons are assigned in rounds rather than one Golgi cell at a time: each
+    round every Golgi cell with free capacity proposes its closest unclaimed ascending
+    axons, and an ascending axon proposed by several Golgi cells goes to the one that
+    ranks first in a random priority order. The rounds repeat until no Golgi cell has
+    capacity or candidates left, so the result can differ from the sequential version.
+    """
+
+    def connect(self):
+        granule_cell_type = self.from_cell_types[0]
+        golgi_cell_type = self.to_cell_types[0]
+        granules = self.from_cells[granule_cell_type.name]
+        golgis = self.to_cells[golgi_cell_type.name]
+        if len(granules) <= len(golgis):
+            raise ConnectivityError(
+                "The number of granule cells was less than the number of golgi cells. Simulation cannot continue."
+            )
+        r = golgi_cell_type.morphology.dendrite_radius
+        tot_conn = self.aa_convergence + self.pf_convergence
+        aa_pre, aa_post = self._sample_ascending_axons(granules, golgis, r)
+        aa_count = np.bincount(aa_post, minlength=len(golgis))
+        pf_pre, pf_post = self._sample_parallel_fibers(
+            granules, golgis, r, aa_pre, aa_post, tot_conn - aa_count
+        )
+        self.scaffold.connect_cells(
+            self, self._to_connections(granules, golgis, aa_pre, aa_post), self.tag_aa
+        )
+        self.scaffold.connect_cells(
+            self, self._to_connections(granules, golgis, pf_pre, pf_post), self.tag_pf
+        )
+
+    def _sample_ascending_axons(self, granules, golgis, r):
+        n_golgi = len(golgis)
+        golgi_idx, granule_idx = _grid_neighbours(
+            granules[:, [2, 4]], golgis[:, [2, 4]], r
+        )
+        gx, gz = np.ascontiguousarray(granules[:, 2]), np.ascontiguousarray(
+            granules[:, 4]
+        )
+        dx = gx.take(granule_idx) - golgis[:, 2].take(golgi_idx)
+        dz = gz.take(granule_idx) - golgis[:, 4].take(golgi_idx)
+        dist = np.sqrt(dx ** 2 + dz ** 2)
+        in_zone = dist <= r
+        golgi_idx, granule_idx, dist = (
+            golgi_idx[in_zone],
+            granule_idx[in_zone],
+            dist[in_zone],
+        )
+        # Accept the ascending axons with a probability inversely proportional to their
+        # distance from the Golgi cell soma.
+        accepted = np.random.uniform(size=len(dist)) > dist / r
+        golgi_idx, granule_idx, dist = (
+            golgi_idx[accepted],
+            granule_idx[accepted],
+            dist[accepted],
+        )
+        # Resolve the ascending axons in rounds. Every round each Golgi cell with free
+        # capacity proposes its closest ascending axons that aren't claimed yet, and the
+        # proposals are resolved at once by giving contested ascending axons to the
+        # Golgi cell with the highest random priority.
+        priority = np.random.permutation(n_golgi)
+        capacity = np.full(n_golgi, self.aa_convergence)
+        claimed = np.zeros(len(granules), dtype=bool)
+        pre = np.empty(min(len(granules), n_golgi * self.aa_convergence), dtype=int)
+        post = np.empty(len(pre), dtype=int)
+        n = 0
+        while len(golgi_idx):
+            # Sort by Golgi cell, then by distance (`dist / r` lies within [0, 1]).
+            order = np.argsort(golgi_idx * 2.0 + dist / r)
+            golgi_idx, granule_idx, dist = (
+                golgi_idx[order],
+                granule_idx[order],
+                dist[order],
+            )
+            proposed = rank_in_group(golgi_idx) < capacity[golgi_idx]
+            prop_golgi, prop_granule = golgi_idx[proposed], granule_idx[proposed]
+            winner_order = np.argsort(prop_granule * n_golgi + priority[prop_golgi])
+            prop_golgi = prop_golgi[winner_order]
+            prop_granule = prop_granule[winner_order]
+            first = np.ones(len(prop_granule), dtype=bool)
+            first[1:] = prop_granule[1:] != prop_granule[:-1]
+            won_golgi, won_granule = prop_golgi[first], prop_granule[first]
+            pre[n : n + len(won_granule)] = won_granule
+            post[n : n + len(won_granule)] = won_golgi
+            n += len(won_granule)
+            claimed[won_granule] = True
+            capacity -= np.bincount(won_golgi, minlength=n_golgi)
+            keep = ~claimed[granule_idx] & (capacity[golgi_idx] > 0)
+            golgi_idx, granule_idx, dist = golgi_idx[keep], granule_idx[keep], dist[keep]
+        return pre[:n], post[:n]
+
+    def _sample_parallel_fibers(self, granules, golgis, r, aa_pre, aa_post, wanted):
+        n_granules = len(granules)
+        x_order = np.argsort(granules[:, 2], kind="stable")
+        sorted_x = granules[x_order, 2]
+        lo = np.searchsorted(sorted_x, golgis[:, 2] - r, side="left")
+        hi = np.searchsorted(sorted_x, golgis[:, 2] + r, side="right")
+        # A Golgi cell's own ascending axons lie within its dendritic radius and thus
+        # always lie in its parallel fiber strip, where they are excluded.
+        own_aa = np.bincount(aa_post, minlength=len(golgis))
+        available = hi - lo - own_aa
+        count = np.minimum(wanted, available)
+        if np.any(count < wanted):
+            warn(
+                "The granule cell density is too low compared to the Golgi cell density to make physiological connections!",
+                ConnectivityWarning,
+            )
+        excluded = np.sort(aa_post * n_granules + aa_pre)
+        # Draw the parallel fibers of all Golgi cells without replacement: sparse strips
+        # are sampled by rejection of duplicate draws, dense strips by random ranking of
+        # all their granule cells.
+        dense = count * 2 >= available
+        pre = np.empty(np.sum(count), dtype=int)
+        post = np.empty(len(pre), dtype=int)
+        n = 0
+        dense_golgi = np.nonzero(dense & (count > 0))[0]
+        strip_golgi = np.repeat(dense_golgi, hi[dense_golgi] - lo[dense_golgi])
+        strip_pos = concat_ranges(lo[dense_golgi], hi[dense_golgi])
+        keys = strip_golgi * n_granules + x_order[strip_pos]
+        keys = keys[~isin_sorted(keys, excluded)]
+        keys = sample_per_group(keys // n_granules, keys, count)
+        pre[n : n + len(keys)], post[n : n + len(keys)] = (
+            keys % n_granules,
+            keys // n_granules,
+        )
+        n += len(keys)
+        sparse_golgi = np.nonzero(~dense & (count > 0))[0]
+        picked = np.empty(0, dtype=int)
+        missing = count[sparse_golgi]
+        while np.any(missing > 0):
+            draw_golgi = np.repeat(sparse_golgi, missing)
+            draw_pos = np.random.randint(lo[draw_golgi], hi[draw_golgi])
+            keys = draw_golgi * n_granules + x_order[draw_pos]
+            keys = np.union1d(picked, keys[~isin_sorted(keys, excluded)])
+            picked = sample_per_group(keys // n_granules, keys, count)
+            missing = (
+                count[sparse_golgi]
+                - np.bincount(picked // n_granules, minlength=len(golgis))[sparse_golgi]
+            )
+        pre[n:], post[n:] = picked % n_granules, picked // n_granules
+        return pre, post
+
+    def _to_connections(self, granules, golgis, pre, post):
+        connections = np.empty((len(pre), 2))
+        connections[:, 0] = granules[pre, 0]
+        connections[:, 1] = golgis[post, 0]
+        # Sort the connections on the postsynaptic neurons
+        return connections[np.argsort(connections[:, 1], kind="stable")]
+
+
+def _grid_neighbours(points, centers, r):
+    """
+    Find all pairs of ``centers`` and ``points`` that share or neighbour a cell in a 2D
+    grid with cell size ``r``. Returns the center and point indices of the pairs.
+    """
+    origin = np.minimum(np.min(points, axis=0), np.min(centers, axis=0))
+    point_cells = np.floor((points - origin) / r).astype(int)
+    center_cells = np.floor((centers - origin) / r).astype(int)
+    # Pad the grid by one cell on each side so that neighbour keys never wrap around.
+    width = max(np.max(point_cells[:, 1]), np.max(center_cells[:, 1])) + 3
+    point_keys = (point_cells[:, 0] + 1) * width + point_cells[:, 1] + 1
+    order = np.argsort(point_keys, kind="stable")
+    sorted_keys = point_keys[order]
+    center_keys = (center_cells[:, 0] + 1) * width + center_cells[:, 1] + 1
+    offsets = np.array([dx * width + dz for dx in (-1, 0, 1) for dz in (-1, 0, 1)])
+    neighbour_keys = (center_keys[:, np.newaxis] + offsets).ravel()
+    starts = np.searchsorted(sorted_keys, neighbour_keys, side="left")
+    ends = np.searchsorted(sorted_keys, neighbour_keys, side="right")
+    center_idx = np.repeat(
+        np.repeat(np.arange(len(centers)), len(offsets)), ends - starts
+    )
+    return center_idx, order[concat_ranges(starts, ends)]
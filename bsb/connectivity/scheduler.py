@@ -0,0 +1,215 @@
+import random, zlib, copy, numpy as np
+from .strategy import ConnectionStrategy
+from ..reporting import warn
+from ..exceptions import *
+
+# Scheduler whose connection types are run by the processes of a local process pool.
+_pool_scheduler = None
+
+
+def get_dependency_levels(connection_types):
+    """
+    Group connection types into levels, so that each connection type only depends on
+    connection types of earlier levels through its ``after`` specification. The
+    connection types within a level are independent of each other.
+
+    :param connection_types: Connection types by name.
+    :type connection_types: dict
+    :returns: Lists of connection types, each list in resolved order.
+    :rtype: list
+    """
+    # Resolving the order checks for circular dependencies and makes sure that each
+    # connection type comes after the connection types that it depends on.
+    ordered = ConnectionStrategy.resolve_order(connection_types)
+    depths = {}
+    for connection_type in ordered:
+        after = connection_type.get_after() or []
+        depths[connection_type.name] = (
+            max((depths[name] for name in after if name in depths), default=-1) + 1
+        )
+    levels = [[] for _ in range(max(depths.values(), default=-1) + 1)]
+    for connection_type in ordered:
+        levels[depths[connection_type.name]].append(connection_type)
+    return levels
+
+
+class ConnectivityScheduler:
+    """
+    Runs the connection types of a scaffold. Sequentially, or in parallel by
+    distributing the independent connection types of each dependency level over the
+    MPI processes, or over a pool of local processes when not running under MPI. The
+    connections made in parallel are gathered into the network cache of every process
+    in the same order as a sequential run.
+
+    Connection types that use the connections of other connection types must list
+    them in their ``after`` specification to be scheduled after them.
+    """
+
+    def __init__(self, scaffold, seed=None, processes=None):
+        """
+        :param scaffold: The scaffold to connect.
+        :type scaffold: :class:`.core.Scaffold`
+        :param seed: Seed for the random generators. Each connection type is run with
+          numpy's and Python's global generators seeded with this seed and its name, so
+          that its connections don't depend on where or in which order it is run.
+        :type seed: int
+        :param processes: Size of the local process pool, by default the amount of
+          CPUs.
+        :type processes: int
+        """
+        self.scaffold = scaffold
+        self.seed = seed
+        self.processes = processes
+
+    def run(self, parallel=False):
+        """
+        Run all connection types.
+
+        :param parallel: Run independent connection types in parallel.
+        :type parallel: bool
+        """
+        scaffold = self.scaffold
+        connection_types = scaffold.configuration.connection_types
+        if parallel and scaffold.spilling:
+            warn("Connection types can't be run in parallel while spilling.")
+            parallel = False
+        if not parallel:
+            for connection_type in ConnectionStrategy.resolve_order(connection_types):
+                self.connect(connection_type)
+            return
+        levels = get_dependency_levels(connection_types)
+        if scaffold.has_mpi_installed and scaffold.MPI.COMM_WORLD.size > 1:
+            self._run_mpi(levels)
+        else:
+            self._run_pool(levels)
+
+    def connect(self, connection_type):
+        """
+        Seed the random generators for the connection type and run it.
+        """
+        if self.seed is not None:
+            name = connection_type.name
+            np.random.seed([self.seed, zlib.crc32(name.encode())])
+            random.seed("{}:{}".format(self.seed, name))
+        self.scaffold.connect_type(connection_type)
+
+    def record(self, connection_type):
+        """
+        Run the connection type and return the arguments of each of its calls to
+        :meth:`.core.Scaffold.connect_cells`, so that they can be replayed elsewhere.
+        The network cache is restored afterwards, so that connection types recorded
+        one after the other don't see each other's connections.
+        """
+        scaffold = self.scaffold
+        calls = []
+        connect_cells = scaffold.connect_cells
+
+        def recorder(connection_type, *args, **kwargs):
+            # Copy the arguments before storing them, the data might be modified.
+            calls.append(copy.deepcopy((args, kwargs)))
+            return connect_cells(connection_type, *args, **kwargs)
+
+        state = self._get_state()
+        scaffold.connect_cells = recorder
+        try:
+            self.connect(connection_type)
+        finally:
+            del scaffold.connect_cells
+            self._set_state(state)
+        return calls
+
+    def replay(self, level, calls):
+        """
+        Replay the recorded calls of a level of connection types on the scaffold.
+
+        :param level: Connection types of the level, in resolved order.
+        :type level: list
+        :param calls: Recorded calls of each connection type, by name.
+        :type calls: dict
+        """
+        for connection_type in level:
+            for args, kwargs in calls[connection_type.name]:
+                self.scaffold.connect_cells(connection_type, *args, **kwargs)
+
+    def _run_mpi(self, levels):
+        comm = self.scaffold.MPI.COMM_WORLD
+        rank, size = comm.rank, comm.size
+        self._check_placement(comm)
+        if self.seed is None:
+            self.seed = comm.bcast(np.random.randint(np.iinfo(np.int32).max))
+        for level in levels:
+            # Record our share of the level, the connections of the whole level are then
+            # replayed in order.
+            calls = {ct.name: self.record(ct) for ct in level[rank::size]}
+            for node_calls in comm.allgather(calls):
+                calls.update(node_calls)
+            self.replay(level, calls)
+
+    def _run_pool(self, levels):
+        global _pool_scheduler
+        import multiprocessing
+
+        try:
+            context = multiprocessing.get_context("fork")
+        except ValueError:
+            warn("Process pools require `fork`, connection types are run sequentially.")
+            for level in levels:
+                for connection_type in level:
+                    self.connect(connection_type)
+            return
+        if self.seed is None:
+            self.seed = np.random.randint(np.iinfo(np.int32).max)
+        for level in levels:
+            if len(level) == 1:
+                self.connect(level[0])
+                continue
+            # Fork the processes for each level, so that they have the connections of
+            # the previous levels.
+            _pool_scheduler = self
+            try:
+                with context.Pool(self.processes) as pool:
+                    names = [ct.name for ct in level]
+                    calls = dict(zip(names, pool.map(_record_in_pool, names)))
+            finally:
+                _pool_scheduler = None
+            self.replay(level, calls)
+
+    def _check_placement(self, comm):
+        # All processes need the same placement to make the same connections.
+        cells = np.ascontiguousarray(self.scaffold.cells)
+        checksums = comm.allgather(zlib.crc32(cells.tobytes()))
+        for rank, checksum in enumerate(checksums):
+            if checksum != checksums[0]:
+                raise ParallelIntegrityError(
+                    "MPI process %rank% placed different cells than MPI process 0."
+                    + " Seed the placement identically on all MPI processes.",
+                    rank,
+                )
+
+    def _get_state(self):
+        # The cached arrays are replaced rather than modified when connections are
+        # added, so shallow copies suffice, except for the morphology maps.
+        scaffold = self.scaffold
+        return (
+            dict(scaffold.cell_connections_by_tag),
+            dict(scaffold.connection_compartments),
+            {
+                k: v.copy() if isinstance(v, list) else v
+                for k, v in scaffold.connection_morphologies.items()
+            },
+            dict(scaffold._connectivity_set_meta),
+        )
+
+    def _set_state(self, state):
+        scaffold = self.scaffold
+        (
+            scaffold.cell_connections_by_tag,
+            scaffold.connection_compartments,
+            scaffold.connection_morphologies,
+            scaffold._connectivity_set_meta,
+        ) = state
+
+
+def _record_in_pool(name):
+    scaffold = _pool_scheduler.scaffold
+    return _pool_scheduler.record(scaffold.configuration.connection_types[name])
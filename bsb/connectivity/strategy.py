@@ -1,5 +1,4 @@
 from ..helpers import ConfigurableClass, SortableByAfter
-from ..functions import compute_intersection_slice
 from ..models import ConnectivitySet
 import abc
 
@@ -77,15 +76,11 @@ class ConnectionStrategy(ConfigurableClass, SortableByAfter):
             for cell_type in self.__dict__[t + "_types"]:
                 # Get the cell matrix and ids for the type.
                 cells = cell_type.get_cells()
-                ids = cell_type.get_ids().tolist()
-                ids.sort()
                 if label is not None:
-                    labelled = self.scaffold.get_labelled_ids(label).tolist()
-                    labelled.sort()
-                    # Compute intersect of sorted list
-                    label_slice = compute_intersection_slice(ids, labelled)
+                    # Look up the cell ids in the sorted label array.
+                    labelled = self.scaffold.labels.contains(cells[:, 0], label)
                     # Store the labelled cells of the type.
-                    self.__dict__[t + "s"][cell_type.name] = cells[label_slice]
+                    self.__dict__[t + "s"][cell_type.name] = cells[labelled]
                 else:
                     # Store all cells of the type.
                     self.__dict__[t + "s"][cell_type.name] = cells
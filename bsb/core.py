@@ -3,10 +3,19 @@ from .plotting import plot_network
 import numpy as np
 import time
 from .trees import TreeCollection
-from .output import MorphologyRepository
+from .labels import LabelCollection
+from .output import (
+    MorphologyRepository,
+    SpillCache,
+    SpillCellCache,
+    SpillLayerCache,
+    SpillCellArray,
+)
 from .helpers import map_ndarray, listify_input
 from .models import CellType
 from .connectivity import ConnectionStrategy
+from .connectivity.scheduler import ConnectivityScheduler
+from .placement.scheduler import PlacementScheduler
 from warnings import warn as std_warn
 from .exceptions import *
 from .reporting import report, warn, has_mpi_installed, get_report_file
@@ -190,13 +199,28 @@ class Scaffold:
         for device in simulation.devices.values():
             device.initialise(self)
 
-    def place_cell_types(self):
+    def place_cell_types(self, parallel=False, seed=None, tile_size=None, processes=None):
         """
         Run the placement strategies of all cell types.
-        """
-        sorted_cell_types = CellType.resolve_order(self.configuration.cell_types)
-        for cell_type in sorted_cell_types:
-            self.place_cell_type(cell_type)
+
+        :param parallel: Split the layers of placement strategies that support it into
+          tiles that are placed in parallel: distributed over the MPI processes, or
+          over a pool of local processes when not running under MPI.
+        :type parallel: boolean
+        :param seed: Seed the random generators per cell type and tile, so that the
+          placement doesn't depend on how the tiles are scheduled.
+        :type seed: int
+        :param tile_size: Size of the tiles along the X and Z axis, by default the
+          layers are split in about as many tiles as there are processes.
+        :type tile_size: float
+        :param processes: Size of the local process pool, by default the amount of
+          CPUs.
+        :type processes: int
+        """
+        scheduler = PlacementScheduler(
+            self, seed=seed, tile_size=tile_size, processes=processes
+        )
+        scheduler.run(parallel=parallel)
 
     def place_cell_type(self, cell_type):
         """
@@ -204,6 +228,10 @@ class Scaffold:
         """
         # Place cell type according to PlacementStrategy
         cell_type.placement.place()
+        self._finish_placement(cell_type)
+
+    def _finish_placement(self, cell_type):
+        # Report the placed cell type and construct the tree of its cells.
         if cell_type.entity:
             entities = self.entities_by_type[cell_type.name]
             report(
@@ -220,15 +248,24 @@ class Scaffold:
                 level=2,
             )
 
-    def connect_cell_types(self):
+    def connect_cell_types(self, parallel=False, seed=None, processes=None):
         """
         Run the connection strategies of all cell types.
-        """
-        sorted_connection_types = ConnectionStrategy.resolve_order(
-            self.configuration.connection_types
-        )
-        for connection_type in sorted_connection_types:
-            self.connect_type(connection_type)
+
+        :param parallel: Run the connection types that don't depend on each other in
+          parallel: distributed over the MPI processes, or over a pool of local
+          processes when not running under MPI. Connection types that use the
+          connections of other connection types must list them under ``after``.
+        :type parallel: boolean
+        :param seed: Seed the random generators per connection type, so that the
+          connections don't depend on how the connection types are scheduled.
+        :type seed: int
+        :param processes: Size of the local process pool, by default the amount of
+          CPUs.
+        :type processes: int
+        """
+        scheduler = ConnectivityScheduler(self, seed=seed, processes=processes)
+        scheduler.run(parallel=parallel)
 
     def connect_type(self, connection_type):
         """
@@ -247,6 +284,67 @@ class Scaffold:
                 level=2,
             )
 
+    def compile_connectivity(self, output=True):
+        """
+        Discard the connectivity and run the connection strategies and the after
+        connectivity hooks again on the current placement.
+
+        :param output: Replace the connectivity in the output file afterwards.
+        :type output: boolean
+        """
+        self._reset_connectivity_cache()
+        self.connect_cell_types()
+        self.run_after_connectivity_hooks()
+        if output:
+            self.compile_output(placement=False)
+
+    def start_spill(self):
+        """
+        Replace the network cache by the output file: from here on placed cells and
+        connections are appended to the output file and the ``cells``,
+        ``cells_by_type``, ``cells_by_layer``, ``cell_connections_by_tag``,
+        ``connection_compartments`` and ``rotations`` caches read them back from it.
+        """
+        formatter = self.output_formatter
+        formatter.start_spill()
+        self.cells_by_type = SpillCellCache(formatter, self.cells_by_type.keys())
+        self.cells_by_layer = SpillLayerCache(formatter, self.cells_by_layer.keys())
+        self.cells = SpillCellArray(formatter)
+        self.rotations = SpillCache(formatter, "/cells/placement/{}/rotations")
+        self.spilling = True
+        self._reset_connectivity_cache()
+
+    def _reset_connectivity_cache(self):
+        if self.spilling:
+            formatter = self.output_formatter
+            dtype = formatter.get_spill_dtype()
+            self.cell_connections_by_tag = SpillCache(
+                formatter, "/cells/connections/{}", dtype
+            )
+            self.connection_compartments = SpillCache(
+                formatter, "/cells/connection_compartments/{}", dtype
+            )
+            self._spilled_morphologies = SpillCache(
+                formatter, "/cells/connection_morphologies/{}", dtype
+            )
+            for cache in (
+                self.cell_connections_by_tag,
+                self.connection_compartments,
+                self._spilled_morphologies,
+            ):
+                cache.clear()
+            for key in self.configuration.connection_types.keys():
+                self.cell_connections_by_tag[key] = np.empty((0, 2))
+        else:
+            self.cell_connections_by_tag = {
+                key: np.empty((0, 2))
+                for key in self.configuration.connection_types.keys()
+            }
+            self.connection_compartments = {}
+        # Only the morphology maps are kept in memory when spilling.
+        self.connection_morphologies = {}
+        self._connectivity_set_meta = {}
+
     def run_after_placement_hooks(self):
         """
         Run all after placement hooks.
@@ -261,28 +359,44 @@ class Scaffold:
         for hook in self.configuration.after_connect_hooks.values():
             hook.after_connectivity()
 
-    def compile_network(self, tries=1, output=True):
+    def compile_network(self, tries=1, output=True, parallel=False, seed=None):
         """
         Run all steps in the scaffold sequence to obtain a full network.
 
+        If the output formatter is configured to ``spill``, the cells and connections
+        are written to the output file as they are created instead of being kept in
+        the network cache, and are read back from the file when they are needed.
+
         :param output: Store the network after compilation.
         :type output: boolean
-        """
+        :param parallel: Place and connect the cell types in parallel, see
+          :meth:`.place_cell_types` and :meth:`.connect_cell_types`. Under MPI only the
+          master process stores the network.
+        :type parallel: boolean
+        :param seed: Seed for the cell types and connection types, see
+          :meth:`.place_cell_types` and :meth:`.connect_cell_types`.
+        :type seed: int
+        """
+        # Parallel MPI processes end up with the same network, store it only once.
+        output = output and (self.is_mpi_master or not parallel)
         times = np.zeros(tries)
         for i in np.arange(tries, dtype=int):
             if i > 0:
                 self.reset_network_cache()
+            if getattr(self.output_formatter, "spill", False):
+                self.start_spill()
             t = time.time()
-            self.place_cell_types()
+            self.place_cell_types(parallel=parallel, seed=seed)
             self.run_after_placement_hooks()
             if output:
                 self.compile_output()
-            self.connect_cell_types()
+            self.connect_cell_types(parallel=parallel, seed=seed)
             self.run_after_connectivity_hooks()
             times[i] = time.time() - t
 
             if output:
-                self.compile_output()
+                # The placement was stored already, only update the connectivity.
+                self.compile_output(placement=False)
 
             for type in self.configuration.cell_types.values():
                 if type.entity:
@@ -362,15 +476,11 @@ class Scaffold:
         }
         # Cells collection. Columns: Cell ID, Type, X, Y, Z.
         self.cells = np.empty((0, 5))
+        self.spilling = False
         # Cell connections per connection type. Columns: From ID, To ID.
-        self.cell_connections_by_tag = {
-            key: np.empty((0, 2)) for key in self.configuration.connection_types.keys()
-        }
-        self.connection_morphologies = {}
-        self.connection_compartments = {}
+        self._reset_connectivity_cache()
         self.appends = {}
-        self._connectivity_set_meta = {}
-        self.labels = {}
+        self.labels = LabelCollection()
         self.rotations = {}
 
     def run_simulation(self, simulation_name, quit=False):
@@ -444,16 +554,19 @@ class Scaffold:
         cell_data = np.column_stack(
             (cell_ids, np.ones(positions.shape[0]) * cell_type.id, positions)
         )
-        # Cache them per type
-        self.cells_by_type[cell_type.name] = np.concatenate(
-            (self.cells_by_type[cell_type.name], cell_data)
-        )
-        # Cache them per layer
-        self.cells_by_layer[layer.name] = np.concatenate(
-            (self.cells_by_layer[layer.name], cell_data)
-        )
-        # Store
-        self.cells = np.concatenate((self.cells, cell_data))
+        if self.spilling:
+            self.output_formatter.spill_cells(cell_type, cell_data, rotations, layer)
+        else:
+            # Cache them per type
+            self.cells_by_type[cell_type.name] = np.concatenate(
+                (self.cells_by_type[cell_type.name], cell_data)
+            )
+            # Cache them per layer
+            self.cells_by_layer[layer.name] = np.concatenate(
+                (self.cells_by_layer[layer.name], cell_data)
+            )
+            # Store
+            self.cells = np.concatenate((self.cells, cell_data))
 
         placement_dict = self.statistics.cells_placed
         if cell_type.name not in placement_dict:
@@ -463,7 +576,7 @@ class Scaffold:
             cell_type.placement.__dict__["cells_placed"] = 0
         cell_type.placement.cells_placed += cell_count
 
-        if rotations is not None:
+        if rotations is not None and not self.spilling:
             if cell_type.name not in self.rotations:
                 self.rotations[cell_type.name] = np.empty((0, 2))
             self.rotations[cell_type.name] = np.concatenate(
@@ -511,7 +624,10 @@ class Scaffold:
         # Keep track of relevant tags in the connection_type object
         if tag not in connection_type.tags:
             connection_type.tags.append(tag)
-        self._append_tagged("cell_connections_by_tag", tag, connectome_data)
+        if self.spilling:
+            self.cell_connections_by_tag.append(tag, connectome_data)
+        else:
+            self._append_tagged("cell_connections_by_tag", tag, connectome_data)
         if compartments is not None or morphologies is not None:
             if len(morphologies) != len(connectome_data) or len(compartments) != len(
                 connectome_data
@@ -519,10 +635,17 @@ class Scaffold:
                 raise MorphologyDataError(
                     "The morphological data did not match the connectome data."
                 )
-            self._append_mapped(
-                "connection_morphologies", tag, morphologies, use_map=morpho_map
-            )
-            self._append_tagged("connection_compartments", tag, compartments)
+            if self.spilling:
+                mapped_data = self._map_tagged(
+                    "connection_morphologies", tag, morphologies, use_map=morpho_map
+                )
+                self._spilled_morphologies.append(tag, mapped_data)
+                self.connection_compartments.append(tag, np.asarray(compartments, int))
+            else:
+                self._append_mapped(
+                    "connection_morphologies", tag, morphologies, use_map=morpho_map
+                )
+                self._append_tagged("connection_compartments", tag, compartments)
         # Store the metadata internally until the output is compiled.
         if meta is not None:
             self._connectivity_set_meta[tag] = meta
@@ -577,7 +700,19 @@ class Scaffold:
         Appends or creates the data with a map to a tagged numpy array in a dictionary
         attribute of the scaffold.
         """
-        # Map data
+        mapped_data = self._map_tagged(attr, tag, data, use_map=use_map)
+        # Append data
+        if tag in self.__dict__[attr]:
+            cache = self.__dict__[attr][tag]
+            self.__dict__[attr][tag] = np.concatenate((cache, mapped_data))
+        else:
+            self.__dict__[attr][tag] = np.copy(mapped_data)
+
+    def _map_tagged(self, attr, tag, data, use_map=None):
+        """
+        Map the data with the map of a tagged numpy array in a dictionary attribute of
+        the scaffold, extending the map where needed.
+        """
         if use_map:  # Is the data already mapped and should we use the given map?
             if not attr + "_map" in self.__dict__[attr]:
                 self.__dict__[attr][tag + "_map"] = use_map.copy()
@@ -592,13 +727,7 @@ class Scaffold:
                 data, _map=self.__dict__[attr][tag + "_map"]
             )
             mapped_data = np.array(mapped_data, dtype=int)
-
-        # Append data
-        if tag in self.__dict__[attr]:
-            cache = self.__dict__[attr][tag]
-            self.__dict__[attr][tag] = np.concatenate((cache, mapped_data))
-        else:
-            self.__dict__[attr][tag] = np.copy(mapped_data)
+        return mapped_data
 
     def append_dset(self, name, data):
         """
@@ -621,6 +750,8 @@ class Scaffold:
             raise TypeNotFoundError(
                 "Attempting to load unknown cell type '{}'".format(name)
             )
+        if self.spilling:
+            return self.cells_by_type[name]
         if self.cells_by_type[name].shape[0] == 0:
             if not self.output_formatter.exists():
                 return self.cells_by_type[name]
@@ -656,15 +787,22 @@ class Scaffold:
                 )
         return self.entities_by_type[name]
 
-    def compile_output(self):
+    def compile_output(self, placement=True, connectivity=True):
         """
         Task the output formatter to generate all output from the current state.
 
         The default formatter is the HDF5Formatter; therefor calling this function
         will generate an HDF5 file that contains all the data currently present in
-        this object.
+        this object. If the file exists it is updated in place.
+
+        :param placement: Store the placement data.
+        :type placement: bool
+        :param connectivity: Store the connectivity data.
+        :type connectivity: bool
         """
-        self.output_formatter.create_output()
+        self.output_formatter.create_output(
+            placement=placement, connectivity=connectivity
+        )
 
     def _connection_types_query(self, postsynaptic=[], presynaptic=[]):
         # This function searches through all connection types that include the given
@@ -949,11 +1087,7 @@ class Scaffold:
         :param ids: global identifiers of the cells that need to be labelled.
         :type ids: iterable
         """
-        # Initialize (if required)
-        if not label in self.labels.keys():
-            self.labels[label] = []
-        # Extend labels
-        self.labels[label].extend(ids)
+        self.labels.label(ids, label)
 
     def get_labels(self, pattern):
         """
@@ -973,18 +1107,13 @@ class Scaffold:
         :returns: All labels matching the pattern
         :rtype: list
         """
-        if pattern.endswith("*"):
-            p = pattern[:-1]
-            finder = lambda l: l.startswith(p)
-        else:
-            finder = lambda l: l == pattern
-        return list(filter(finder, self.labels.keys()))
+        return self.labels.find(pattern)
 
     def get_labelled_ids(self, label):
         """
         Get all the global identifiers of cells labelled with the specific label.
         """
-        return np.array(self.labels[label], dtype=int)
+        return self.labels.get(label)
 
     def get_cell_total(self):
         """
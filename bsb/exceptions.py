@@ -36,6 +36,7 @@ _t(
                 ReceptorSpecificationError=_e(),
             ),
             ParallelIntegrityError=_e("rank"),
+            UnmappedIdentifierError=_e(),
         ),
         ConnectivityError=_e(),
         MorphologyError=_e(
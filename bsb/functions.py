@@ -151,6 +151,52 @@ def compute_intersection_slice(l1, l2):
     return intersection_list
 
 
+def concat_ranges(starts, ends):
+    """
+    Concatenate ``np.arange(start, end)`` for each pair of ``starts`` and ``ends``.
+    """
+    lengths = ends - starts
+    total = np.sum(lengths)
+    if total == 0:
+        return np.empty(0, dtype=int)
+    shift = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return shift + np.arange(total)
+
+
+def rank_in_group(groups):
+    """
+    Return the position of each element within its run of equal values in the sorted
+    ``groups`` array.
+    """
+    if not len(groups):
+        return np.empty(0, dtype=int)
+    run_start = np.ones(len(groups), dtype=bool)
+    run_start[1:] = groups[1:] != groups[:-1]
+    first = np.nonzero(run_start)[0]
+    return np.arange(len(groups)) - np.repeat(
+        first, np.diff(np.append(first, len(groups)))
+    )
+
+
+def sample_per_group(groups, values, limit):
+    """
+    Keep a random selection of at most ``limit[group]`` values per group.
+    """
+    order = np.argsort(groups + np.random.uniform(size=len(groups)))
+    groups, values = groups[order], values[order]
+    return values[rank_in_group(groups) < limit[groups]]
+
+
+def isin_sorted(values, sorted_array):
+    """
+    Vectorized membership test of ``values`` in the sorted ``sorted_array``.
+    """
+    if not len(sorted_array):
+        return np.zeros(len(values), dtype=bool)
+    idx = np.minimum(np.searchsorted(sorted_array, values), len(sorted_array) - 1)
+    return sorted_array[idx] == values
+
+
 # Stolen from abandoned neuronpy project. By Tom McCavish
 def poisson_train(frequency, duration, start_time=0, seed=None):
     """
@@ -182,6 +228,58 @@ def poisson_train(frequency, duration, start_time=0, seed=None):
         yield cur_time
 
 
+def poisson_trains(frequency, duration, count, start_time=0, random_state=None):
+    """
+    Generate ``count`` independent homogeneous Poisson trains with vectorized draws.
+    Each train is the cumulative sum of exponential intervals, truncated at
+    ``start_time + duration``.
+
+    :param frequency: The mean spiking frequency, for all trains or per train.
+    :type frequency: float or array-like
+    :param duration: Maximum duration.
+    :param count: Amount of trains.
+    :param start_time: Timestamp.
+    :param random_state: Random state to draw the intervals from. If None, the global
+      numpy random state is used.
+    :type random_state: :class:`numpy.random.RandomState`
+    :returns: The spike times of all trains, concatenated, and the offsets of each
+      train in the spike times: the spikes of train ``i`` are
+      ``times[offsets[i]:offsets[i + 1]]``.
+    :rtype: tuple
+    """
+    if random_state is None:
+        random_state = np.random
+    with np.errstate(divide="ignore"):
+        # Trains with a frequency of 0 have infinite intervals and no spikes.
+        isi = 1.0 / np.broadcast_to(np.asarray(frequency, dtype=float), (count,))
+    end_time = start_time + duration
+    # Draw enough intervals for nearly all trains to pass the end in one block, and
+    # draw further blocks only for the trains that didn't.
+    expected = np.max(duration / isi, initial=0)
+    block = int(np.ceil(expected + 5 * np.sqrt(expected) + 5))
+    rows = np.arange(count)
+    last = np.full(count, float(start_time))
+    spikes, train_ids = [], []
+    while len(rows):
+        with np.errstate(invalid="ignore"):
+            intervals = (
+                random_state.exponential(size=(len(rows), block)) * isi[rows, None]
+            )
+        times = last[rows, None] + np.cumsum(intervals, axis=1)
+        mask = times <= end_time
+        spikes.append(times[mask])
+        train_ids.append(np.repeat(rows, np.count_nonzero(mask, axis=1)))
+        last[rows] = times[:, -1]
+        rows = rows[times[:, -1] <= end_time]
+    if not spikes:
+        return np.empty(0), np.zeros(1, dtype=int)
+    # Merge the blocks per train, a stable sort keeps the blocks of a train in order.
+    train_ids = np.concatenate(train_ids)
+    order = np.argsort(train_ids, kind="stable")
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(train_ids, minlength=count))))
+    return np.concatenate(spikes)[order], offsets
+
+
 def get_distances(candidates, point):
     """
     Return the distances of a list of points to a common point
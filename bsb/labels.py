@@ -0,0 +1,151 @@
+import numpy as np
+from .functions import concat_ranges
+
+
+class LabelCollection:
+    """
+    Keeps track of labelled subsets of cells. Each label is stored as a sorted array of
+    unique global identifiers, so that set algebra across labels and the selection of
+    labelled cells can be done with vectorized sorted array operations.
+    """
+
+    def __init__(self, labels=None):
+        self._labels = {}
+        if labels is not None:
+            for label, ids in labels.items():
+                self.label(ids, label)
+
+    def label(self, ids, label):
+        """
+        Add the given cells to a label.
+
+        :param ids: Global identifiers of the cells that need to be labelled.
+        :type ids: iterable
+        :param label: Name of the label
+        :type label: str
+        """
+        ids = np.asarray(ids, dtype=int).reshape(-1)
+        if label in self._labels:
+            ids = np.concatenate((self._labels[label], ids))
+        self._labels[label] = np.unique(ids)
+
+    def get(self, label):
+        """
+        Get the sorted global identifiers of the cells labelled with ``label``.
+        """
+        return self._labels[label]
+
+    def find(self, pattern):
+        """
+        Retrieve the labels that match an exact label or a pattern ending in a wildcard
+        (``*``).
+        """
+        if pattern.endswith("*"):
+            p = pattern[:-1]
+            return [l for l in self._labels.keys() if l.startswith(p)]
+        return [pattern] if pattern in self._labels else []
+
+    def union(self, *labels):
+        """
+        Get the identifiers of the cells that have any of the given labels.
+        """
+        if not labels:
+            return np.empty(0, dtype=int)
+        return np.unique(np.concatenate([self._labels[l] for l in labels]))
+
+    def intersection(self, *labels):
+        """
+        Get the identifiers of the cells that have all of the given labels.
+        """
+        if not labels:
+            return np.empty(0, dtype=int)
+        result = self._labels[labels[0]]
+        for label in labels[1:]:
+            result = np.intersect1d(result, self._labels[label], assume_unique=True)
+        return result
+
+    def difference(self, label, *others):
+        """
+        Get the identifiers of the cells that have ``label`` but none of the ``others``.
+        """
+        result = self._labels[label]
+        if others:
+            result = result[~self.contains(result, *others)]
+        return result
+
+    def contains(self, ids, *labels):
+        """
+        Get a boolean mask of which of the given ``ids`` have any of the given labels.
+        """
+        ids = np.asarray(ids, dtype=int)
+        mask = np.zeros(ids.shape, dtype=bool)
+        for label in labels:
+            labelled = self._labels[label]
+            if not len(labelled):
+                continue
+            idx = np.searchsorted(labelled, ids)
+            mask |= labelled[np.minimum(idx, len(labelled) - 1)] == ids
+        return mask
+
+    def store(self, group):
+        """
+        Store each label as a dataset in the given HDF5 group. Labels that consist of
+        long runs of consecutive identifiers are stored as continuity lists.
+        """
+        for label, ids in self._labels.items():
+            compact = _continuity_list(ids)
+            dtype = _smallest_int(ids)
+            if len(compact) < len(ids):
+                dset = group.create_dataset(label, data=compact, dtype=dtype)
+                dset.attrs["continuity"] = True
+            else:
+                group.create_dataset(label, data=ids, dtype=dtype)
+
+    @classmethod
+    def from_group(cls, group):
+        """
+        Load the labels stored in an HDF5 group by :meth:`store`.
+        """
+        labels = cls()
+        for label, dset in group.items():
+            ids = dset[()]
+            if dset.attrs.get("continuity", False):
+                ids = concat_ranges(ids[::2], ids[::2] + ids[1::2])
+            labels.label(ids, label)
+        return labels
+
+    def __getitem__(self, label):
+        return self.get(label)
+
+    def __contains__(self, label):
+        return label in self._labels
+
+    def __iter__(self):
+        return iter(self._labels)
+
+    def __len__(self):
+        return len(self._labels)
+
+    def keys(self):
+        return self._labels.keys()
+
+    def items(self):
+        return self._labels.items()
+
+    def values(self):
+        return self._labels.values()
+
+
+def _continuity_list(ids):
+    # Vectorized equivalent of `helpers.continuity_list` for sorted unique arrays.
+    if not len(ids):
+        return ids
+    chain_starts = np.concatenate(([0], np.nonzero(np.diff(ids) != 1)[0] + 1))
+    counts = np.diff(np.append(chain_starts, len(ids)))
+    return np.column_stack((ids[chain_starts], counts)).reshape(-1)
+
+
+def _smallest_int(ids):
+    if len(ids) and np.max(ids) >= np.iinfo(np.int32).max:
+        return np.int64
+    return np.int32
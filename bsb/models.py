@@ -189,7 +189,23 @@ class Resource:
         self._handler = handler
         self._path = path
 
-    def get_dataset(self, selector=(), dtype=None):
+    def get_dataset(self, selector=(), dtype=None, mmap=None):
+        """
+        Read the dataset from storage.
+
+        :param selector: Selects the part of the dataset to read.
+        :param dtype: Type to convert the data to.
+        :param mmap: Map an uncompressed contiguous dataset read-only into memory
+          instead of reading it, so that the data isn't copied and its pages are shared
+          with every process that maps the same file. Datasets that can't be mapped, or
+          whose file is open for writing, are read. Defaults to the ``memory_map``
+          attribute of the handler. Mapped data is only valid until the next write to
+          the file, which can change it or make accessing it crash the process (SIGBUS),
+          copy it if it has to outlive a write.
+        :type mmap: bool
+        """
+        if mmap is None:
+            mmap = getattr(self._handler, "memory_map", False)
         with self._handler.load("r") as f:
             if not self._path in f():
                 raise DatasetNotFoundError(
@@ -197,11 +213,27 @@ class Resource:
                         self._path, self._handler.file
                     )
                 )
-            d = f()[self._path][selector]
+            dataset = f()[self._path]
+            mapped = self._get_mapped(dataset) if mmap else None
+            if mapped is not None:
+                d = np.asarray(mapped[selector])
+            else:
+                d = dataset[selector]
             if dtype:
-                d = d.astype(dtype)
+                d = d.astype(dtype, copy=False)
             return d
 
+    def _get_mapped(self, dataset):
+        handler = self._handler
+        # A file that is open for writing might not have flushed its data yet.
+        if handler.handle_mode != "r":
+            return None
+        # The handler drops its maps when it opens the file for writing.
+        key = (handler.file, self._path)
+        if key not in handler._mapped:
+            handler._mapped[key] = _memory_map(dataset)
+        return handler._mapped[key]
+
     @property
     def attributes(self):
         with self._handler.load("r") as f:
@@ -243,6 +275,30 @@ class Resource:
             return f()[self._path].shape
 
 
+def _memory_map(dataset):
+    # Map an uncompressed contiguous dataset read-only into memory, using the offset of
+    # its data in the file. Returns None if the dataset can't be mapped.
+    if (
+        dataset.chunks is not None
+        or dataset.is_virtual
+        or dataset.external
+        or dataset.dtype.kind not in "biuf"
+        or dataset.file.driver != "sec2"
+    ):
+        return None
+    offset = dataset.id.get_offset()
+    if offset is None:
+        # No storage allocated, e.g. an empty dataset.
+        return None
+    return np.memmap(
+        dataset.file.filename,
+        mode="r",
+        dtype=dataset.dtype,
+        shape=dataset.shape,
+        offset=offset,
+    )
+
+
 class Connection:
     def __init__(
         self,
@@ -289,6 +345,7 @@ class ConnectivitySet(Resource):
         self.tag = tag
         self.compartment_set = Resource(handler, "/cells/connection_compartments/" + tag)
         self.morphology_set = Resource(handler, "/cells/connection_morphologies/" + tag)
+        self._morphologies = {}
 
     @property
     def connections(self):
@@ -318,49 +375,90 @@ class ConnectivitySet(Resource):
         Return a list of :class:`Intersections <.models.Connection>`. Intersections
         contain pre- & postsynaptic identifiers and the intersecting compartments.
         """
-        if not self.compartment_set.exists():
-            raise MissingMorphologyError(
-                "No intersection/morphology information for the '{}' connectivity set.".format(
-                    self.tag
-                )
-            )
-        else:
-            return self.get_intersections()
+        self._assert_intersections()
+        return self.get_intersections()
 
     def get_intersections(self):
         intersections = []
-        morphos = {}
-
-        def _cache_morpho(id):
-            # Keep a cache of the morphologies so that all morphologies with the same
-            # id refer to the same object, and so that they aren't redundandly loaded.
-            id = int(id)
-            if not id in morphos:
-                name = self.morphology_set.unmap_one(id)[0]
-                if isinstance(name, bytes):
-                    name = name.decode("UTF-8")
-                morphos[id] = self.scaffold.morphology_repository.get_morphology(name)
-
         cells = self.get_dataset()
         for cell_ids, comp_ids, morpho_ids in zip(
             cells, self.compartment_set.get_dataset(), self.morphology_set.get_dataset()
         ):
-            from_morpho_id = int(morpho_ids[0])
-            to_morpho_id = int(morpho_ids[1])
-            # Load morphologies from the map if they're not in the cache yet
-            _cache_morpho(from_morpho_id)
-            _cache_morpho(to_morpho_id)
             # Append the intersection with a new connection
             intersections.append(
                 Connection(
                     *cell_ids,  # zipped dataset: from id & to id
                     *comp_ids,  # zipped morphologyset: from comp & to comp
-                    morphos[from_morpho_id],  # cached: 'from' TrueMorphology
-                    morphos[to_morpho_id]  # cached: 'to' TrueMorphology
+                    self._load_morphology(morpho_ids[0]),  # cached: 'from' morphology
+                    self._load_morphology(morpho_ids[1])  # cached: 'to' morphology
                 )
             )
         return intersections
 
+    def get_intersection_arrays(self):
+        """
+        Return the intersections as parallel arrays, rather than as a list of
+        :class:`Connections <.models.Connection>`.
+
+        :returns: The presynaptic identifiers, postsynaptic identifiers, presynaptic
+          compartment ids, postsynaptic compartment ids, presynaptic morphology ids and
+          postsynaptic morphology ids of all intersections.
+        :rtype: tuple of 6 :class:`numpy.ndarray`
+        """
+        self._assert_intersections()
+        cells = self.get_dataset(dtype=int)
+        compartments = self.compartment_set.get_dataset(dtype=int)
+        morphologies = self.morphology_set.get_dataset(dtype=int)
+        return (
+            cells[:, 0],
+            cells[:, 1],
+            compartments[:, 0],
+            compartments[:, 1],
+            morphologies[:, 0],
+            morphologies[:, 1],
+        )
+
+    def get_section_ids(self, compartments, morphologies):
+        """
+        Look up the section id of each compartment.
+
+        :param compartments: Compartment ids, as returned by
+          :meth:`get_intersection_arrays`.
+        :type compartments: :class:`numpy.ndarray`
+        :param morphologies: Morphology id of each compartment, as returned by
+          :meth:`get_intersection_arrays`.
+        :type morphologies: :class:`numpy.ndarray`
+        :rtype: :class:`numpy.ndarray`
+        """
+        sections = np.empty(len(compartments), dtype=int)
+        for morpho_id in np.unique(morphologies):
+            morphology = self._load_morphology(morpho_id)
+            section_map = np.array([c.section_id for c in morphology.compartments])
+            mask = morphologies == morpho_id
+            sections[mask] = section_map[compartments[mask]]
+        return sections
+
+    def _assert_intersections(self):
+        if not self.compartment_set.exists():
+            raise MissingMorphologyError(
+                "No intersection/morphology information for the '{}' connectivity set.".format(
+                    self.tag
+                )
+            )
+
+    def _load_morphology(self, id):
+        # Keep a cache of the morphologies so that all morphologies with the same id
+        # refer to the same object, and so that they aren't redundantly loaded.
+        id = int(id)
+        if not id in self._morphologies:
+            name = self.morphology_set.unmap_one(id)[0]
+            if isinstance(name, bytes):
+                name = name.decode("UTF-8")
+            self._morphologies[id] = self.scaffold.morphology_repository.get_morphology(
+                name
+            )
+        return self._morphologies[id]
+
     def get_divergence_list(self):
         presynaptic_type = self.get_presynaptic_types()[0]
         placement_set = self.scaffold.get_placement_set(presynaptic_type)
@@ -519,6 +617,27 @@ class PlacementSet(Resource):
             Cell(id, self.type, position, rotation) for id, position, rotation in self
         ]
 
+    def get_node_cells(self, node, nodes):
+        """
+        Load only the cells that a round robin load balance over ``nodes`` assigns to
+        ``node``, meaning the cells whose identifier modulo ``nodes`` equals ``node``.
+        Only the rows of those cells are read from the position dataset.
+
+        :param node: Rank of the node
+        :type node: int
+        :param nodes: Total amount of nodes
+        :type nodes: int
+        :returns: The identifiers and positions of the node's cells. Positions are
+          ``None`` if this placement set has no position information.
+        :rtype: tuple
+        """
+        ids, selector = _round_robin_rows(self.identifier_set.get_dataset(), node, nodes)
+        if not self.positions_set.exists():
+            return ids, None
+        if not len(ids):
+            return ids, np.empty((0, 3))
+        return ids, self.positions_set.get_dataset(selector)
+
     def __iter__(self):
         id_iter = iterate_continuity_list(self.identifier_set.get_dataset())
         iterators = [iter(id_iter), self._none(), self._none()]
@@ -539,6 +658,24 @@ class PlacementSet(Resource):
             yield None
 
 
+def _round_robin_rows(continuity, node, nodes):
+    # Find the rows of the identifiers in a continuity list that are assigned to `node`.
+    # Each chain of consecutive identifiers contributes a strided range of rows, so that
+    # a single chain can be read from a dataset as one strided hyperslab.
+    starts, counts = np.array(continuity[::2], dtype=int), np.array(continuity[1::2])
+    first_rows = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    offsets = (node - starts) % nodes
+    rows = [
+        np.arange(r + o, r + c, nodes) for r, o, c in zip(first_rows, offsets, counts)
+    ]
+    ids = [np.arange(s + o, s + c, nodes) for s, o, c in zip(starts, offsets, counts)]
+    if len(rows) == 1:
+        selector = slice(first_rows[0] + offsets[0], counts[0], nodes)
+    else:
+        selector = np.concatenate(rows) if rows else np.empty(0, dtype=int)
+    return (np.concatenate(ids) if ids else np.empty(0, dtype=int)), selector
+
+
 class Cell:
     def __init__(self, id, cell_type, position, rotation=None):
         self.id = int(id)
@@ -9,6 +9,9 @@ import h5py, os, time, pickle, random, numpy as np
 from numpy import string_
 from .exceptions import *
 from .models import ConnectivitySet, PlacementSet
+from .labels import LabelCollection
+from .simulation.results import append_dataset
+from collections.abc import Mapping, MutableMapping
 from sklearn.neighbors import KDTree
 import os, sys
 
@@ -19,14 +22,20 @@ class ResourceHandler(ABC):
     def __init__(self):
         self.handle_mode = None
         self._handle = None
+        # Memory maps of the datasets of the resource, by file and path.
+        self._mapped = {}
 
     @contextmanager
     def load(self, mode="r"):
         restore_previous = False
-        if mode != self.handle_mode:
+        # Reading can be done with any open handle.
+        if mode != self.handle_mode and (mode != "r" or self.handle_mode is None):
             restore_previous = True
             previous_mode = self.handle_mode
             self.handle_mode = mode
+            if mode != "r":
+                # Writing can move, overwrite or truncate the mapped data.
+                self._mapped.clear()
             if self._handle is not None:
                 self.release_handle(self._handle)
             self._handle = self.get_handle(mode)
@@ -148,7 +157,7 @@ class OutputFormatter(ConfigurableClass, TreeHandler):
         self.save_file_as = None
 
     @abstractmethod
-    def create_output(self):
+    def create_output(self, placement=True, connectivity=True):
         pass
 
     @abstractmethod
@@ -694,6 +703,219 @@ class MorphologyCache:
 _round = lambda x: int(round(x))
 
 
+class SpillCache(MutableMapping):
+    """
+    Dictionary of arrays that are stored as extendable datasets in the output file
+    instead of in memory. Items are read from the file each time they are accessed.
+    """
+
+    def __init__(self, handler, path, dtype=None):
+        """
+        :param handler: Handler of the output file.
+        :type handler: :class:`.HDF5Formatter`
+        :param path: Path of each item in the output file, with ``{}`` in place of
+          its key, e.g. ``/cells/connections/{}``.
+        :type path: str
+        :param dtype: Type to store the data as, by default the type of the data.
+        :type dtype: :class:`numpy.dtype`
+        """
+        self.handler = handler
+        self.path = path
+        self.dtype = dtype
+
+    def append(self, key, data):
+        """
+        Append data to an item, creating it if it doesn't exist yet.
+        """
+        with self.handler.load("a") as f:
+            _append_spill(f(), self.path.format(key), np.asarray(data, self.dtype))
+
+    def __getitem__(self, key):
+        with self.handler.load() as f:
+            path = self.path.format(key)
+            if path not in f():
+                raise KeyError(key)
+            return f()[path][()]
+
+    def __setitem__(self, key, data):
+        data = np.asarray(data, self.dtype)
+        with self.handler.load("a") as f:
+            path = self.path.format(key)
+            _remove(f(), path)
+            _create_spill_dataset(f(), path, data.shape, data.dtype)
+            f()[path][()] = data
+
+    def __delitem__(self, key):
+        with self.handler.load("a") as f:
+            path = self.path.format(key)
+            if path not in f():
+                raise KeyError(key)
+            del f()[path]
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def clear(self):
+        keys = self._keys()
+        with self.handler.load("a") as f:
+            for key in keys:
+                del f()[self.path.format(key)]
+
+    def _keys(self):
+        parent = self.path[: self.path.index("{}")].rstrip("/") or "/"
+        with self.handler.load() as f:
+            if parent not in f():
+                return []
+            return [k for k in f()[parent] if self.path.format(k) in f()]
+
+
+class SpillCellCache(Mapping):
+    """
+    Read-only dictionary of the spilled cells of each cell type.
+    """
+
+    def __init__(self, handler, names):
+        self.handler = handler
+        self.names = list(names)
+
+    def __getitem__(self, name):
+        if name not in self.names:
+            raise KeyError(name)
+        return self.handler.get_cells_of_type(name)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+
+class SpillLayerCache(SpillCellCache):
+    """
+    Read-only dictionary of the spilled cells of each layer.
+    """
+
+    def __getitem__(self, name):
+        if name not in self.names:
+            raise KeyError(name)
+        return self.handler.get_cells_of_layer(name)
+
+
+class SpillCellArray:
+    """
+    Read-only array of all the spilled cells, with columns ID, type, X, Y and Z. Only
+    the selected rows are read from the output file.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    @property
+    def shape(self):
+        return (len(self), 5)
+
+    @property
+    def ndim(self):
+        return 2
+
+    def __len__(self):
+        with self.handler.load() as f:
+            return len(f()["/cells/positions"])
+
+    def __array__(self, dtype=None):
+        return np.asarray(self[:], dtype=dtype)
+
+    def __getitem__(self, selector):
+        if isinstance(selector, tuple):
+            rows, columns = selector
+        else:
+            rows, columns = selector, slice(None)
+        if isinstance(rows, (int, np.integer)):
+            return self.handler.read_cells(np.array([rows]))[0, columns]
+        return self.handler.read_cells(rows)[:, columns]
+
+
+# Amount of rows per chunk of the spilled datasets.
+_spill_chunk_rows = 2 ** 14
+
+
+def _create_spill_dataset(group, path, shape, dtype):
+    maxshape = (None,) + tuple(shape[1:])
+    chunks = (_spill_chunk_rows,) + tuple(shape[1:])
+    return group.create_dataset(
+        path, shape=shape, maxshape=maxshape, chunks=chunks, dtype=dtype
+    )
+
+
+def _append_spill(group, path, data):
+    data = np.asarray(data)
+    chunks = (_spill_chunk_rows,) + data.shape[1:]
+    return append_dataset(group, path, data, chunks=chunks)
+
+
+def _remove(group, *names):
+    # Delete the given children of an HDF5 group, if they exist.
+    for name in names:
+        if name in group:
+            del group[name]
+
+
+def _is_contiguous(indices):
+    return len(indices) > 0 and indices[-1] - indices[0] + 1 == len(indices)
+
+
+def _read_rows(dataset, rows, block=2 ** 16):
+    # Read the given rows of a dataset in blocks of sorted rows. Dense blocks are read
+    # as a single slice, sparse blocks with a point selection.
+    order = np.argsort(rows, kind="stable")
+    sorted_rows = rows[order]
+    data = np.empty((len(rows),) + dataset.shape[1:], dtype=dataset.dtype)
+    for i in range(0, len(rows), block):
+        chunk = sorted_rows[i : i + block]
+        first, last = chunk[0], chunk[-1]
+        if last - first + 1 <= 4 * len(chunk):
+            data[order[i : i + block]] = dataset[first : last + 1][chunk - first]
+        else:
+            unique, inverse = np.unique(chunk, return_inverse=True)
+            data[order[i : i + block]] = dataset[unique][inverse]
+    return data
+
+
+def _read_cells(cells_group, rows):
+    # Read a slice or an index array of cells as rows of ID, type, X, Y, Z. Compact
+    # files store the identifiers and types apart from the coordinates.
+    def read(dataset):
+        if isinstance(rows, slice):
+            return dataset[rows]
+        return _read_rows(dataset, rows)
+
+    positions = read(cells_group["positions"])
+    if "identifiers" not in cells_group:
+        return positions
+    cells = np.empty((len(positions), 5))
+    cells[:, 0] = read(cells_group["identifiers"])
+    cells[:, 1] = read(cells_group["types"])
+    cells[:, 2:5] = positions
+    return cells
+
+
+def _id_dtype(ids):
+    # Identifiers are stored as 32 bit integers, unless they don't fit.
+    ids = np.asarray(ids)
+    if ids.size and np.max(ids) > np.iinfo(np.int32).max:
+        return np.int64
+    return np.int32
+
+
+def _index_dtype(indices):
+    # Smallest unsigned integer type that fits all of the indices.
+    indices = np.asarray(indices)
+    return np.min_scalar_type(int(np.max(indices)) if indices.size else 0)
+
+
 class HDF5Formatter(OutputFormatter, MorphologyRepository):
     """
     Stores the output of the scaffold as a single HDF5 file. Is also a MorphologyRepository
@@ -706,29 +928,133 @@ class HDF5Formatter(OutputFormatter, MorphologyRepository):
         ),
         "simulator_output_path": False,
         "morphology_repository": None,
+        "spill": False,
+        "compact": False,
+        "coordinate_dtype": "float64",
+        "memory_map": False,
     }
 
-    def create_output(self):
-        was_compiled = self.exists()
-        if was_compiled:
-            with h5py.File("__backup__.hdf5", "w") as backup:
-                with self.load() as repo:
-                    repo().copy("/morphologies", backup)
-
+    def create_output(self, placement=True, connectivity=True):
+        """
+        Store the network into the output file. If the file already exists it is updated
+        in place, group by group, and only the placement and/or connectivity data that
+        was asked for is replaced. The morphologies in the file are left untouched.
+
+        :param placement: Replace the placement data (positions, trees, statistics).
+        :type placement: bool
+        :param connectivity: Replace the connectivity data.
+        :type connectivity: bool
+        """
+        source = self.file if self.exists() else None
         if self.save_file_as:
             self.file = self.save_file_as
+        if source is None or os.path.abspath(source) != os.path.abspath(self.file):
+            # A new file has to contain everything.
+            placement = connectivity = True
+            mode = "w"
+        else:
+            mode = "a"
 
-        with self.load("w") as output:
+        with self.load(mode) as output:
             self.store_configuration()
-            self.store_cells()
-            self.store_entities()
-            self.store_tree_collections(self.scaffold.trees.__dict__.values())
-            self.store_statistics()
+            self.store_cells(placement=placement, connectivity=connectivity)
+            if placement:
+                self.store_entities()
+                self.store_tree_collections(self.scaffold.trees.__dict__.values())
+                self.store_statistics()
             self.store_appendices()
-            self.store_morphology_repository(was_compiled)
+            if mode == "w":
+                self.store_morphology_repository(source)
+
+    def start_spill(self):
+        """
+        Prepare the output file to receive the cells and connections as they are
+        placed and connected, instead of keeping them in memory until
+        :meth:`create_output`. Any network previously stored in the file is removed.
+        """
+        source = self.file if self.exists() else None
+        if self.save_file_as:
+            self.file = self.save_file_as
+        new_file = source is None or os.path.abspath(source) != os.path.abspath(self.file)
+        with self.load("w" if new_file else "a") as f:
+            if new_file:
+                self.store_morphology_repository(source)
+            _remove(f(), "cells")
+            cells_group = f().create_group("cells")
+            cell_type_names = self.scaffold.configuration.cell_type_map
+            cells_group.attrs["types"] = cell_type_names
+            coordinates = self.get_coordinate_dtype()
+            if self.compact:
+                _create_spill_dataset(cells_group, "positions", (0, 3), coordinates)
+                _create_spill_dataset(cells_group, "identifiers", (0,), np.int32)
+                _create_spill_dataset(
+                    cells_group, "types", (0,), _index_dtype([len(cell_type_names)])
+                )
+            else:
+                _create_spill_dataset(cells_group, "positions", (0, 5), float)
+            for cell_type in self.scaffold.get_cell_types():
+                _create_spill_dataset(
+                    cells_group,
+                    "type_maps/{}_map".format(cell_type.name),
+                    (0,),
+                    self.get_spill_dtype() or int,
+                )
+                if not cell_type.entity:
+                    _create_spill_dataset(
+                        cells_group,
+                        "placement/{}/positions".format(cell_type.name),
+                        (0, 3),
+                        coordinates,
+                    )
 
-        if was_compiled:
-            os.remove("__backup__.hdf5")
+    def spill_cells(self, cell_type, cell_data, rotations=None, layer=None):
+        """
+        Append placed cells to the output file.
+
+        :param cell_type: Cell type of the cells.
+        :type cell_type: :class:`.models.CellType`
+        :param layer: Layer the cells were placed in.
+        :type layer: :class:`.models.Layer`
+        :param cell_data: Rows of ID, type ID, X, Y and Z of the cells.
+        :type cell_data: :class:`numpy.ndarray`
+        :param rotations: Rotations of the cells.
+        :type rotations: :class:`numpy.ndarray`
+        """
+        name = cell_type.name
+        with self.load("a") as f:
+            cells_group = f()["cells"]
+            start = len(cells_group["positions"])
+            rows = np.arange(start, start + len(cell_data))
+            if self.compact:
+                _append_spill(cells_group, "positions", cell_data[:, 2:5])
+                _append_spill(cells_group, "identifiers", cell_data[:, 0])
+                _append_spill(cells_group, "types", cell_data[:, 1])
+            else:
+                _append_spill(cells_group, "positions", cell_data)
+            _append_spill(cells_group, "type_maps/{}_map".format(name), rows)
+            if layer is not None:
+                _append_spill(cells_group, "layer_maps/{}_map".format(layer.name), rows)
+            _append_spill(
+                cells_group, "placement/{}/positions".format(name), cell_data[:, 2:5]
+            )
+            if rotations is not None:
+                _append_spill(
+                    cells_group, "placement/{}/rotations".format(name), rotations
+                )
+
+    def get_spill_dtype(self):
+        """
+        Return the integer type of spilled identifiers and indices, or ``None`` to
+        store them as they are given. The final amount of cells and connections isn't
+        known while spilling, so the compact schema uses 32 bit integers throughout.
+        """
+        return np.int32 if self.compact else None
+
+    def get_coordinate_dtype(self):
+        """
+        Return the type that coordinates are stored as.
+        """
+        return np.dtype(self.coordinate_dtype) if self.compact else np.dtype(float)
 
     def exists(self):
         return os.path.exists(self.file)
@@ -746,12 +1072,19 @@ class HDF5Formatter(OutputFormatter, MorphologyRepository):
                     self.scaffold.configuration.connection_types[
                         contributing_type
                     ].tags.append(tag)
-            self.scaffold.labels = {
-                l: resource()["cells/labels/" + l][()] for l in resource()["cells/labels"]
-            }
+            self.scaffold.labels = LabelCollection.from_group(resource()["cells/labels"])
 
     def validate(self):
-        pass
+        try:
+            dtype = np.dtype(self.coordinate_dtype)
+        except TypeError:
+            dtype = None
+        if dtype is None or dtype.kind != "f":
+            raise ConfigurationError(
+                "Invalid `coordinate_dtype` '{}', a floating point type is required.".format(
+                    self.coordinate_dtype
+                )
+            )
 
     def store_configuration(self, config=None):
         config = config if config is not None else self.scaffold.configuration
@@ -768,16 +1101,39 @@ class HDF5Formatter(OutputFormatter, MorphologyRepository):
                 '"simulation_volume_z": 400.0', '"simulation_volume_z": ' + str(config.Z)
             )
 
-    def store_cells(self):
+    def store_cells(self, placement=True, connectivity=True):
         with self.load("a") as f:
-            cells_group = f().create_group("cells")
-            self.store_cell_positions(cells_group)
-            self.store_placement(cells_group)
-            self.store_cell_connections(cells_group)
+            cells_group = f().require_group("cells")
+            if placement and self.scaffold.spilling:
+                self.store_spilled_placement(cells_group)
+            elif placement:
+                _remove(
+                    cells_group,
+                    "positions",
+                    "identifiers",
+                    "types",
+                    "type_maps",
+                    "layer_maps",
+                    "placement",
+                )
+                self.store_cell_positions(cells_group)
+                self.store_placement(cells_group)
+            if connectivity and self.scaffold.spilling:
+                self.store_spilled_connections(cells_group)
+            elif connectivity:
+                _remove(
+                    cells_group,
+                    "connections",
+                    "connection_compartments",
+                    "connection_morphologies",
+                )
+                self.store_cell_connections(cells_group)
+            _remove(cells_group, "labels")
             self.store_labels(cells_group)
 
     def store_entities(self):
         with self.load("a") as f:
+            _remove(f(), "entities")
             cells_group = f().create_group("entities")
             for key, data in self.scaffold.entities_by_type.items():
                 cells_group.create_dataset(key, data=data)
@@ -791,7 +1147,9 @@ class HDF5Formatter(OutputFormatter, MorphologyRepository):
             )
             if not cell_type.entity:
                 cell_type_group.create_dataset(
-                    "positions", data=self.scaffold.cells_by_type[cell_type.name][:, 2:5]
+                    "positions",
+                    data=self.scaffold.cells_by_type[cell_type.name][:, 2:5],
+                    dtype=self.get_coordinate_dtype(),
                 )
             if cell_type.name in self.scaffold.rotations.keys():
                 cell_type_group.create_dataset(
@@ -799,19 +1157,33 @@ class HDF5Formatter(OutputFormatter, MorphologyRepository):
                 )
 
     def store_cell_positions(self, cells_group):
-        position_dataset = cells_group.create_dataset(
-            "positions", data=self.scaffold.cells
-        )
+        cells = self.scaffold.cells
         cell_type_names = self.scaffold.configuration.cell_type_map
+        if self.compact:
+            # Store the identifiers and types apart, as the smallest sufficient integers.
+            cells_group.create_dataset(
+                "positions", data=cells[:, 2:5], dtype=self.get_coordinate_dtype()
+            )
+            cells_group.create_dataset(
+                "identifiers", data=cells[:, 0], dtype=_id_dtype(cells[:, 0])
+            )
+            cells_group.create_dataset(
+                "types", data=cells[:, 1], dtype=_index_dtype([len(cell_type_names)])
+            )
+            map_dtype = _id_dtype([len(cells)])
+        else:
+            cells_group.create_dataset("positions", data=cells)
+            map_dtype = int
         cells_group.attrs["types"] = cell_type_names
         type_maps_group = cells_group.create_group("type_maps")
         for type in self.scaffold.configuration.cell_types.keys():
-            type_maps_group.create_dataset(
-                type + "_map",
-                data=np.where(self.scaffold.cells[:, 1] == cell_type_names.index(type))[
-                    0
-                ],
+            type_map = np.where(cells[:, 1] == cell_type_names.index(type))[0]
+            map_dataset = type_maps_group.create_dataset(
+                type + "_map", data=type_map, dtype=map_dtype
             )
+            if _is_contiguous(type_map):
+                # Store the range so that the type can be read as a single slice.
+                map_dataset.attrs["range"] = [type_map[0], type_map[-1] + 1]
 
     def store_cell_connections(self, cells_group):
         if "connections" not in cells_group:
@@ -827,44 +1199,79 @@ class HDF5Formatter(OutputFormatter, MorphologyRepository):
         else:
             morphologies_group = cells_group["connection_morphologies"]
         for tag, connectome_data in self.scaffold.cell_connections_by_tag.items():
-            related_types = list(
-                filter(
-                    lambda x: tag in x.tags,
-                    self.scaffold.configuration.connection_types.values(),
-                )
-            )
             connection_dataset = connections_group.create_dataset(
-                tag, data=connectome_data
-            )
-            connection_dataset.attrs["tag"] = tag
-            connection_dataset.attrs["connection_types"] = list(
-                map(lambda x: x.name, related_types)
+                tag,
+                data=connectome_data,
+                dtype=_id_dtype(connectome_data) if self.compact else None,
             )
-            connection_dataset.attrs["connection_type_classes"] = list(
-                map(get_qualified_class_name, related_types)
-            )
-            if tag in self.scaffold._connectivity_set_meta:
-                meta_dict = self.scaffold._connectivity_set_meta[tag]
-                for key in meta_dict:
-                    connection_dataset.attrs[key] = meta_dict[key]
+            self.store_connection_attributes(connection_dataset, tag)
             if tag in self.scaffold.connection_compartments:
+                compartments = self.scaffold.connection_compartments[tag]
+                morphologies = self.scaffold.connection_morphologies[tag]
                 compartments_group.create_dataset(
-                    tag, data=self.scaffold.connection_compartments[tag], dtype=int
+                    tag,
+                    data=compartments,
+                    dtype=_index_dtype(compartments) if self.compact else int,
                 )
                 morphology_dataset = morphologies_group.create_dataset(
-                    tag, data=self.scaffold.connection_morphologies[tag], dtype=int
+                    tag,
+                    data=morphologies,
+                    dtype=_index_dtype(morphologies) if self.compact else int,
                 )
                 morphology_dataset.attrs["map"] = self.scaffold.connection_morphologies[
                     tag + "_map"
                 ]
 
+    def store_connection_attributes(self, connection_dataset, tag):
+        related_types = list(
+            filter(
+                lambda x: tag in x.tags,
+                self.scaffold.configuration.connection_types.values(),
+            )
+        )
+        connection_dataset.attrs["tag"] = tag
+        connection_dataset.attrs["connection_types"] = list(
+            map(lambda x: x.name, related_types)
+        )
+        connection_dataset.attrs["connection_type_classes"] = list(
+            map(get_qualified_class_name, related_types)
+        )
+        if tag in self.scaffold._connectivity_set_meta:
+            meta_dict = self.scaffold._connectivity_set_meta[tag]
+            for key in meta_dict:
+                connection_dataset.attrs[key] = meta_dict[key]
+
+    def store_spilled_placement(self, cells_group):
+        # The positions were spilled during placement, store what's left.
+        for type_map in cells_group["type_maps"].values():
+            rows = type_map[()]
+            if _is_contiguous(rows):
+                type_map.attrs["range"] = [rows[0], rows[-1] + 1]
+        placement = cells_group.require_group("placement")
+        for cell_type in self.scaffold.get_cell_types():
+            cell_type_group = placement.require_group(cell_type.name)
+            _remove(cell_type_group, "identifiers")
+            cell_type_group.create_dataset(
+                "identifiers", data=cell_type.serialize_identifiers(), dtype=np.int32
+            )
+
+    def store_spilled_connections(self, cells_group):
+        # The connections were spilled during connectivity, store what's left.
+        morphologies_group = cells_group.require_group("connection_morphologies")
+        for tag, connection_dataset in cells_group["connections"].items():
+            self.store_connection_attributes(connection_dataset, tag)
+            if tag in morphologies_group:
+                morphologies_group[tag].attrs[
+                    "map"
+                ] = self.scaffold.connection_morphologies[tag + "_map"]
+
     def store_labels(self, cells_group):
         labels_group = cells_group.create_group("labels")
-        for label in self.scaffold.labels.keys():
-            labels_group.create_dataset(label, data=self.scaffold.labels[label])
+        self.scaffold.labels.store(labels_group)
 
     def store_statistics(self):
         with self.load("a") as f:
+            _remove(f(), "statistics")
             statistics = f().create_group("statistics")
             self.store_placement_statistics(statistics)
 
@@ -877,16 +1284,23 @@ class HDF5Formatter(OutputFormatter, MorphologyRepository):
         # Append extra datasets specified internally or by user.
         with self.load("a") as f:
             for key, data in self.scaffold.appends.items():
+                _remove(f(), key)
                 dset = f().create_dataset(key, data=data)
 
-    def store_morphology_repository(self, was_compiled=False):
+    def store_morphology_repository(self, source=None):
+        """
+        Store the morphology repository of a new output file.
+
+        :param source: Path of a previously compiled file whose morphologies should be
+          copied.
+        :type source: str
+        """
         with self.load("a") as resource:
-            if was_compiled:  # File already existed?
-                # Copy from the backup of previous version
-                with h5py.File("__backup__.hdf5", "r") as backup:
-                    if "morphologies" in resource():
-                        del resource()["/morphologies"]
-                    backup.copy("/morphologies", resource())
+            if source is not None:
+                # Copy from the previously compiled file.
+                _remove(resource(), "morphologies")
+                with h5py.File(source, "r") as previous:
+                    previous.copy("/morphologies", resource())
             else:  # Fresh compilation
                 self.initialise_repo_structure(resource())
                 if self.morphology_repository is not None:  # Repo specified
@@ -914,10 +1328,57 @@ class HDF5Formatter(OutputFormatter, MorphologyRepository):
         if entity:
             with self.load() as resource:
                 return resource()["/entities/" + name][()]
-        # Slice out the cells of this type based on the map in the position dataset attributes.
+        # Read only the rows of this type from the position dataset.
+        with self.load() as resource:
+            map_dataset = resource()["/cells/type_maps/{}_map".format(name)]
+            cells_group = resource()["/cells"]
+            if "range" in map_dataset.attrs:
+                start, stop = map_dataset.attrs["range"]
+                return _read_cells(cells_group, slice(start, stop))
+            type_map = map_dataset[()]
+            if _is_contiguous(type_map):
+                return _read_cells(cells_group, slice(type_map[0], type_map[-1] + 1))
+            return _read_cells(cells_group, type_map)
+
+    def get_cells_of_layer(self, name):
+        """
+        Read the spilled cells of a layer.
+        """
         with self.load() as resource:
-            type_map = self.get_type_map(name)
-            return resource()["/cells/positions"][()][type_map]
+            cells_group = resource()["/cells"]
+            path = "layer_maps/{}_map".format(name)
+            if path not in cells_group:
+                return np.empty((0, 5))
+            return _read_cells(cells_group, cells_group[path][()])
+
+    def read_cells(self, selector):
+        """
+        Read the selected rows of the cell dataset.
+
+        :param selector: Selects the rows of the cells.
+        :type selector: slice, boolean mask or array of indices
+        :returns: Global id, type id and position of the cells
+        :rtype: (n, 5) shaped :class:`numpy.ndarray`
+        """
+        with self.load() as resource:
+            cells_group = resource()["/cells"]
+            count = len(cells_group["positions"])
+            if isinstance(selector, slice):
+                start, stop, step = selector.indices(count)
+                if step == 1:
+                    return _read_cells(cells_group, slice(start, max(start, stop)))
+                rows = np.arange(start, stop, step)
+            else:
+                rows = np.asarray(selector)
+                if rows.dtype == bool:
+                    rows = np.nonzero(rows)[0]
+                rows = rows.astype(int).reshape(-1)
+                if np.any((rows >= count) | (rows < -count)):
+                    raise IndexError(
+                        "Cell index out of range for {} cells.".format(count)
+                    )
+                rows[rows < 0] += count
+            return _read_cells(cells_group, rows).reshape(-1, 5)
 
     def get_type_map(self, type):
         with self.load() as resource:
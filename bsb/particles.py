@@ -1,5 +1,6 @@
 import numpy as np
 from sklearn.neighbors import KDTree
+from scipy.spatial import cKDTree
 from rtree import index
 from random import choice
 from .reporting import report
@@ -368,6 +369,162 @@ class LargeParticleSystem(ParticleSystem):
         super().solve_collisions()
 
 
+class ArrayParticleSystem:
+    """
+    Particle system that stores its particles as arrays of positions and radii instead
+    of :class:`Particle` objects. Colliding pairs are found with a single tree query and
+    are pushed apart with vectorized displacements, using the same repulsion as
+    :meth:`Particle.displace_by`, until no collisions are left.
+    """
+
+    def __init__(self, dimensions=3):
+        self.dimensions = dimensions
+        self.positions = np.empty((0, dimensions))
+        self.radii = np.empty(0)
+        self.types = np.empty(0, dtype=int)
+        self.particle_types = []
+        self.voxels = []
+        self.displaced = np.empty(0, dtype=bool)
+
+    def fill(self, voxels, particles):
+        """
+        Fill the voxels with particles at uniformly random positions.
+
+        :param voxels: The origin and size of each voxel.
+        :type voxels: list
+        :param particles: The particle types, dictionaries with a ``name``, the
+          ``voxels`` to place them in, their ``radius`` and ``count``.
+        :type particles: list
+        """
+        self.voxels.extend([ParticleVoxel(v[0], v[1]) for v in voxels])
+        origins = np.array([voxel.origin for voxel in self.voxels], dtype=float)
+        sizes = np.array([voxel.size for voxel in self.voxels], dtype=float)
+        for particle_type in particles:
+            placement_voxels = np.array(particle_type["voxels"], dtype=int)
+            # The first column picks the voxel, the others the position in the voxel.
+            placement_matrix = np.random.rand(particle_type["count"], self.dimensions + 1)
+            voxel_ids = placement_voxels[
+                (placement_matrix[:, 0] * len(placement_voxels)).astype(int)
+            ]
+            positions = origins[voxel_ids] + placement_matrix[:, 1:] * sizes[voxel_ids]
+            self.add_particles(particle_type, positions)
+
+    def add_particles(self, particle_type, positions, displaced=None):
+        """
+        Add particles of a particle type.
+
+        :param particle_type: Dictionary with the ``name`` and ``radius`` of the
+          particle type.
+        :type particle_type: dict
+        :param positions: Positions of the particles.
+        :type positions: :class:`numpy.ndarray`
+        :param displaced: Which of the particles have been displaced before.
+        :type displaced: :class:`numpy.ndarray`
+        """
+        positions = np.asarray(positions, dtype=float).reshape(-1, self.dimensions)
+        if displaced is None:
+            displaced = np.zeros(len(positions), dtype=bool)
+        if particle_type not in self.particle_types:
+            self.particle_types.append(particle_type)
+        type_id = self.particle_types.index(particle_type)
+        self.positions = np.concatenate((self.positions, positions))
+        self.radii = np.concatenate(
+            (self.radii, np.full(len(positions), particle_type["radius"], dtype=float))
+        )
+        self.types = np.concatenate(
+            (self.types, np.full(len(positions), type_id, dtype=int))
+        )
+        self.displaced = np.concatenate((self.displaced, displaced))
+
+    def find_colliding_pairs(self):
+        """
+        Get the pairs of overlapping particles.
+
+        :returns: The indices of the particles in each pair, and the vector between them.
+        :rtype: tuple
+        """
+        if len(self.positions) < 2:
+            return np.empty((0, 2), dtype=int), np.empty((0, self.dimensions))
+        tree = cKDTree(self.positions)
+        pairs = tree.query_pairs(2 * np.max(self.radii), output_type="ndarray")
+        vectors = self.positions[pairs[:, 0]] - self.positions[pairs[:, 1]]
+        overlap = np.sum(vectors ** 2, axis=1) < np.sum(self.radii[pairs], axis=1) ** 2
+        return pairs[overlap], vectors[overlap]
+
+    def solve_collisions(self, max_iterations=100):
+        """
+        Push colliding particles apart until no collisions are left. Particles that
+        were moved are flagged in the ``displaced`` mask.
+
+        :returns: The amount of collisions left after ``max_iterations``.
+        :rtype: int
+        """
+        volumes = sphere_volume(self.radii)
+        for _ in range(max_iterations):
+            pairs, vectors = self.find_colliding_pairs()
+            if not len(pairs):
+                return 0
+            report("Untangling {} collisions".format(len(pairs)), level=3, ongoing=True)
+            a, b = pairs[:, 0], pairs[:, 1]
+            distances = np.sqrt(np.sum(vectors ** 2, axis=1))
+            # Particles on the exact same position are pushed apart in a random direction.
+            same = distances == 0
+            if np.any(same):
+                vectors[same] = np.random.normal(
+                    size=(np.count_nonzero(same), self.dimensions)
+                )
+                distances[same] = np.sqrt(np.sum(vectors[same] ** 2, axis=1))
+            collision_radii = self.radii[a] + self.radii[b]
+            force = np.where(
+                same,
+                0.9,
+                np.minimum(0.9, 0.3 / ((distances / collision_radii) ** 2)),
+            )
+            push = vectors / distances[:, None] * (force * collision_radii)[:, None]
+            inertia = volumes[b] / (volumes[a] + volumes[b])
+            displacement = np.zeros(self.positions.shape)
+            np.add.at(displacement, a, push * inertia[:, None])
+            np.add.at(displacement, b, -push * (1 - inertia)[:, None])
+            self.positions = self.positions + displacement
+            self.displaced[a] = True
+            self.displaced[b] = True
+        return len(self.find_colliding_pairs()[0])
+
+    def prune(self, bounds=None):
+        """
+        Remove the particles that lie outside of the bounds.
+
+        :param bounds: Lower and upper corner of the bounds, by default the bounding box
+          of the voxels.
+        :type bounds: :class:`numpy.ndarray`
+        :returns: Total amount of pruned particles and the amount per particle type.
+        :rtype: tuple
+        """
+        if bounds is None:
+            bounds = np.array(
+                [
+                    np.min([voxel.origin for voxel in self.voxels], axis=0),
+                    np.max([voxel.origin + voxel.size for voxel in self.voxels], axis=0),
+                ]
+            )
+        inside = np.all(
+            (self.positions >= bounds[0]) & (self.positions <= bounds[1]), axis=1
+        )
+        pruned_types = np.bincount(
+            self.types[~inside], minlength=len(self.particle_types)
+        )
+        self.positions = self.positions[inside]
+        self.radii = self.radii[inside]
+        self.types = self.types[inside]
+        self.displaced = self.displaced[inside]
+        number_pruned_per_type = {
+            particle_type["name"]: int(count)
+            for particle_type, count in zip(self.particle_types, pruned_types)
+            if count
+        }
+        return int(np.sum(pruned_types)), number_pruned_per_type
+
+
 def plot_particle_system(system):
     nc_particles = list(filter(lambda p: not p.colliding, system.particles))
     c_particles = list(filter(lambda p: p.colliding, system.particles))
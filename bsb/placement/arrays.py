@@ -1,5 +1,5 @@
 from .strategy import Layered, PlacementStrategy
-import math, numpy as np
+import math, zlib, numpy as np
 
 
 class ParallelArrayPlacement(Layered, PlacementStrategy):
@@ -11,9 +11,13 @@ class ParallelArrayPlacement(Layered, PlacementStrategy):
         "extension_x": float,
         "extension_z": float,
         "angle": lambda x: float(x) * 2 * math.pi / 360,
+        "seed": int,
     }
 
-    defaults = {"angle": 0.08726646259971647}  # 5 degrees
+    defaults = {
+        "angle": 0.08726646259971647,  # 5 degrees
+        "seed": None,
+    }
 
     required = ["extension_x", "extension_z", "angle"]
 
@@ -21,13 +25,42 @@ class ParallelArrayPlacement(Layered, PlacementStrategy):
         """
         Cell placement: Create a lattice of parallel arrays/lines in the layer's surface.
         """
-        cell_type = self.cell_type
         layer = self.layer_instance
-        radius = cell_type.placement.radius
+        cells = self.get_lattice(
+            layer, self.get_placement_count(), self.get_random(layer)
+        )
+        # Place all the cells in 1 batch (more efficient)
+        self.scaffold.place_cells(self.cell_type, layer, cells)
+
+    def get_random(self, layer):
+        """
+        Get the random generator of the lattice in a layer. If a ``seed`` is configured
+        the generator is seeded with it and the name of the layer, otherwise numpy's
+        global generator is used.
+        """
+        if self.seed is None:
+            return np.random
+        return np.random.RandomState([self.seed, zlib.crc32(layer.name.encode())])
+
+    def get_lattice(self, layer, count, random=np.random):
+        """
+        Create a lattice of parallel arrays of cells, tilted by the ``angle`` and
+        jittered along the Z axis, in a layer.
+
+        :param layer: The layer to fill.
+        :type layer: :class:`.models.Layer`
+        :param count: The amount of cells to place in the layer.
+        :type count: int
+        :param random: Generator of the random offset, heights and jitter.
+        :type random: :class:`numpy.random.RandomState`
+        :returns: The positions of the cells in the layer.
+        :rtype: :class:`numpy.ndarray`
+        """
+        radius = self.radius
         # Extension of a single array in the X dimension
         extension_x = self.extension_x
         # Add a random shift to the starting points of the arrays for variation.
-        start_offset = np.random.rand() * extension_x
+        start_offset = random.rand() * extension_x
         # Place purkinje cells equally spaced over the entire length of the X axis kept apart by their dendritic trees.
         # They are placed in straight lines, tilted by a certain angle by adding a shifting value.
         x_positions = (
@@ -40,14 +73,10 @@ class ParallelArrayPlacement(Layered, PlacementStrategy):
             x_positions = np.array([start_offset])
         # Amount of parallel arrays of cells
         n_arrays = x_positions.shape[0]
-        # Number of cells
-        n = self.get_placement_count()
         # Add extra cells to fill the lattice error volume which will be pruned
-        n += int((n_arrays * extension_x % layer.width) / layer.width * n)
+        n = count + int((n_arrays * extension_x % layer.width) / layer.width * count)
         # cells to distribute along the rows
         cells_per_row = round(n / n_arrays)
-        # The rounded amount of cells that will be placed
-        cells_placed = cells_per_row * n_arrays
         # Calculate the position of the cells along the z-axis.
         z_positions, z_axis_distance = np.linspace(
             start=0.0,
@@ -64,31 +93,19 @@ class ParallelArrayPlacement(Layered, PlacementStrategy):
         bounded_x = lattice_x - radius * 2
         # Epsilon: jitter along the z-axis
         ϵ = self.extension_z / 2
-        # Storage array for the cells
-        cells = np.empty((cells_placed, 3))
-        for i in np.arange(z_positions.shape[0]):
-            # Shift the arrays at an angle
-            angleShift = z_positions[i] * math.tan(self.angle)
-            # Apply shift and offset
-            x = x_positions + angleShift
-            # Place the cells in a bounded lattice with a little modulus magic
-            x = layer.origin[0] + x % bounded_x + radius
-            # Place them at a uniformly random height throughout the layer.
-            y = layer.origin[1] + np.random.uniform(
-                radius, layer.height - radius, x.shape[0]
-            )
-            # Place the cells in their z-position with slight jitter
-            z = layer.origin[2] + np.array(
-                [
-                    z_positions[i] + ϵ * (np.random.rand() - 0.5)
-                    for _ in np.arange(x.shape[0])
-                ]
-            )
-            # Store this stack's cells
-            cells[(i * len(x)) : ((i + 1) * len(x)), 0] = x
-            cells[(i * len(x)) : ((i + 1) * len(x)), 1] = y
-            cells[(i * len(x)) : ((i + 1) * len(x)), 2] = z
-        # Place all the cells in 1 batch (more efficient)
-        self.scaffold.place_cells(
-            cell_type, layer, cells[cells[:, 0] < layer.width - radius]
-        )
+        # Grid of the arrays (columns) at each position along the z-axis (rows).
+        x, z = np.meshgrid(x_positions, z_positions)
+        # Shift the arrays at an angle, and place the cells in a bounded lattice with a
+        # little modulus magic
+        x = layer.origin[0] + (x + z * math.tan(self.angle)) % bounded_x + radius
+        # Place them at a uniformly random height throughout the layer.
+        y = layer.origin[1] + random.uniform(radius, layer.height - radius, x.shape)
+        # Place the cells in their z-position with slight jitter
+        z = layer.origin[2] + z + ϵ * (random.rand(*z.shape) - 0.5)
+        cells = np.column_stack((x.ravel(), y.ravel(), z.ravel()))
+        # Prune the cells of the lattice error volume, and any cell jittered out of the
+        # layer.
+        low = layer.origin[[0, 2]]
+        high = low + [layer.width - radius, layer.depth]
+        xz = cells[:, [0, 2]]
+        return cells[np.all((xz >= low) & (xz < high), axis=1)]
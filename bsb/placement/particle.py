@@ -1,65 +1,118 @@
 from .strategy import Layered, PlacementStrategy
-from ..particles import ParticleSystem
+from ..particles import ArrayParticleSystem
 from ..exceptions import *
 from ..reporting import report, warn
+import numpy as np
 
 
 class ParticlePlacement(Layered, PlacementStrategy):
+    """
+    Places cells at random positions in the layer and pushes colliding cells apart.
+    The layer is split into voxels along the X and Z axis that are filled and untangled
+    independently, after which the collisions between cells of neighbouring voxels
+    are untangled.
+    """
+
+    tileable = True
 
     casts = {
         "prune": bool,
         "bounded": bool,
+        "voxel_size": float,
     }
 
     defaults = {
         "prune": True,
         "bounded": False,
+        "voxel_size": 100.0,
     }
 
     def place(self):
-        cell_type = self.cell_type
         layer = self.layer_instance
+        positions = self.fill(layer, self.get_placement_count())
+        self.scaffold.place_cells(self.cell_type, layer, positions)
+
+    def fill(self, layer, count):
+        cell_type = self.cell_type
         origin = layer.origin.copy()
         # Shift voxel origin up based on y_restriction.
         origin[1] = layer.origin[1] + layer.thickness * self.restriction_minimum
         # Computing voxel thickness based on y_restriction
-        volume = [layer.width, layer.thickness * self.restriction_factor, layer.depth]
-        # Create a list of voxels with the current restricted layer as only voxel.
-        voxels = [[origin, volume]]
-        # Define the particles for the particle system.
-        particles = [
-            {
-                "name": cell_type.name,
-                "voxels": [0],
-                "radius": cell_type.placement.radius,
-                "count": self.get_placement_count(),
-            }
-        ]
-        # Create and fill the particle system.
-        system = ParticleSystem(track_displaced=True, scaffold=self.scaffold)
-        system.fill(voxels, particles)
+        volume = np.array(
+            [layer.width, layer.thickness * self.restriction_factor, layer.depth]
+        )
+        voxels, counts = self.get_voxels(origin, volume, count)
+        particle_type = {
+            "name": cell_type.name,
+            "voxels": [0],
+            "radius": cell_type.placement.radius,
+        }
+        # Fill and untangle each voxel independently.
+        voxel_systems = []
+        colliding = 0
+        for voxel, voxel_count in zip(voxels, counts):
+            if voxel_count:
+                voxel_system = ArrayParticleSystem()
+                voxel_system.fill([voxel], [dict(particle_type, count=voxel_count)])
+                colliding += voxel_system.solve_collisions()
+                voxel_systems.append(voxel_system)
         # Raise a warning if no cells could be placed in the volume
-        if len(system.particles) == 0:
+        if not voxel_systems:
             warn(
                 "Did not place any {} cell in the {}!".format(cell_type.name, layer.name),
                 PlacementWarning,
             )
-            return
-
-        # Find the set of colliding particles
-        colliding = system.find_colliding_particles()
-        if len(colliding) > 0:
-            system.solve_collisions()
-            if self.prune:
-                number_pruned, pruned_per_type = system.prune(
-                    at_risk_particles=system.displaced_particles
-                )
+            return np.empty((0, 3))
+        # Untangle the collisions between the cells of neighbouring voxels.
+        system = ArrayParticleSystem()
+        system.add_particles(
+            particle_type,
+            np.concatenate([voxel_system.positions for voxel_system in voxel_systems]),
+            np.concatenate([voxel_system.displaced for voxel_system in voxel_systems]),
+        )
+        if len(voxel_systems) > 1:
+            colliding = system.solve_collisions()
+        if self.prune and np.any(system.displaced):
+            bounds = np.array([origin, origin + volume])
+            number_pruned, pruned_per_type = system.prune(bounds)
+            if number_pruned:
                 report(
                     "{} {} ({}%) cells pruned.".format(
                         number_pruned,
                         cell_type.name,
-                        int((number_pruned / self.get_placement_count()) * 100),
+                        int((number_pruned / count) * 100),
                     )
                 )
-        particle_positions = system.positions
-        self.scaffold.place_cells(cell_type, layer, particle_positions)
+            if colliding:
+                # Pruning might have removed some of the colliding cells.
+                colliding = len(system.find_colliding_pairs()[0])
+        if colliding:
+            warn(
+                "{} pairs of {} cells still collide in the {}, it might be too dense.".format(
+                    colliding, cell_type.name, layer.name
+                ),
+                PlacementWarning,
+            )
+        return system.positions
+
+    def get_voxels(self, origin, volume, count):
+        """
+        Split the volume into voxels of about ``voxel_size`` along the X and Z axis, and
+        divide the cells over the voxels by volume.
+
+        :returns: The origin and size of each voxel, and the amount of cells to place
+          in each voxel.
+        :rtype: tuple
+        """
+        shape = np.maximum(np.round(volume[[0, 2]] / self.voxel_size), 1).astype(int)
+        size = volume.copy()
+        size[[0, 2]] = volume[[0, 2]] / shape
+        voxels = [
+            [origin + size * [i, 0, j], size]
+            for i in range(shape[0])
+            for j in range(shape[1])
+        ]
+        # The voxels are the same size, the remaining cells go to random voxels.
+        counts = np.full(len(voxels), count // len(voxels))
+        counts[np.random.choice(len(voxels), count % len(voxels), replace=False)] += 1
+        return voxels, counts
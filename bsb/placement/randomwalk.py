@@ -1,6 +1,6 @@
 from .strategy import Layered, PlacementStrategy
-import random, numpy as np
-from ..functions import get_candidate_points, add_y_axis, exclude_index
+import random, itertools, numpy as np
+from ..functions import get_candidate_points, add_y_axis
 from ..reporting import report, warn
 from scipy.spatial import distance
 from ..exceptions import *
@@ -11,6 +11,8 @@ class LayeredRandomWalk(Layered, PlacementStrategy):
     Implementation of the placement of cells in sublayers via a self avoiding random walk.
     """
 
+    tileable = True
+
     casts = {"distance_multiplier_min": float, "distance_multiplier_max": float}
 
     defaults = {"distance_multiplier_min": 0.75, "distance_multiplier_max": 1.25}
@@ -24,12 +26,16 @@ class LayeredRandomWalk(Layered, PlacementStrategy):
         sublayers and distributes cells into each sublayer using a
         self-avoiding random walk.
         """
+        layer = self.layer_instance
+        positions = self.fill(layer, self.get_placement_count())
+        self.scaffold.place_cells(self.cell_type, layer, positions)
+
+    def fill(self, layer, count):
         # Variables
         cell_type = self.cell_type
         scaffold = self.scaffold
         config = scaffold.configuration
-        layer = self.layer_instance
-        layer_thickness = self.get_restricted_thickness()
+        layer_thickness = self.get_restricted_thickness(layer)
         # Virtual layer origin point that applies the Y-Restriction used for example by basket and stellate cells.
         restricted_origin = np.array(
             [
@@ -50,7 +56,7 @@ class LayeredRandomWalk(Layered, PlacementStrategy):
             )
         )
         # Get the number of cells that belong in the available volume.
-        n_cells_to_place = self.get_placement_count()
+        n_cells_to_place = count
         if n_cells_to_place == 0:
             warn(
                 "Volume or density too low, no '{}' cells will be placed".format(
@@ -76,7 +82,7 @@ class LayeredRandomWalk(Layered, PlacementStrategy):
                 np.round(layer_thickness / (1.5 * cell_type.placement_radius))
             )
         ## Sublayer partitioning
-        partitions = self.partition_layer(n_sublayers)
+        partitions = self.partition_layer(n_sublayers, layer)
         # Adjust partitions for cell radius.
         partitions = partitions + np.array([cell_radius, -cell_radius])
 
@@ -85,7 +91,9 @@ class LayeredRandomWalk(Layered, PlacementStrategy):
         max_ϵ = self.distance_multiplier_max * cell_type.ϵ
         cells_per_sublayer = max(1, int(np.round(n_cells_to_place / n_sublayers)))
 
-        layer_cell_positions = np.empty((0, 3))
+        # Preallocate the positions of all sublayers.
+        layer_cell_positions = np.empty((n_sublayers * cells_per_sublayer, 3))
+        n_placed = 0
         previously_placed_cells = scaffold.cells_by_layer[layer.name][:, [2, 3, 4]]
         previously_placed_types = np.array(
             scaffold.cells_by_layer[layer.name][:, 1], dtype=int
@@ -104,7 +112,27 @@ class LayeredRandomWalk(Layered, PlacementStrategy):
             )
         else:
             previously_placed_min_dist = np.empty((0))
-        other_cell_type_count = previously_placed_min_dist.shape[0]
+        # Hash the previously placed cells, so that candidates are only compared to the
+        # cells near them.
+        previously_placed_hash = SpatialHash(
+            np.max(previously_placed_min_dist, initial=0.0),
+            capacity=len(previously_placed_cells),
+        )
+        previously_placed_hash.add(previously_placed_cells)
+
+        def get_isolated(full_coords, inter_cell_soma_dist):
+            # Get the indices of the candidates that keep their distance from the
+            # cells of this sublayer and from the previously placed cells. The
+            # candidates lie exactly `inter_cell_soma_dist` away from the last cell,
+            # so allow for rounding errors or about half of them would be rejected
+            # depending on where the layer is.
+            isolated = sublayer_hash.isolated(
+                full_coords[:, [0, 2]], inter_cell_soma_dist * (1 - 1e-9)
+            )
+            isolated[isolated] = previously_placed_hash.isolated(
+                full_coords[isolated], previously_placed_min_dist
+            )
+            return list(np.nonzero(isolated)[0])
 
         for sublayer_id in np.arange(n_sublayers):
             if cells_per_sublayer == 0:
@@ -118,7 +146,7 @@ class LayeredRandomWalk(Layered, PlacementStrategy):
             starting_position = np.array(
                 (
                     np.random.uniform(cell_bounds[0, 0], cell_bounds[0, 1]),  # X
-                    np.random.uniform(cell_bounds[1, 0], cell_bounds[1, 1]),  # Y
+                    np.random.uniform(sublayer_floor, sublayer_roof),  # Y
                     np.random.uniform(cell_bounds[2, 0], cell_bounds[2, 1]),  # Z
                 )
             )
@@ -149,11 +177,15 @@ class LayeredRandomWalk(Layered, PlacementStrategy):
                         PlacementWarning,
                     )
                     continue
-            placed_positions = np.array([starting_position])
-            planar_placed_positions = np.array([starting_position[[0, 2]]])
-            full_coords = add_y_axis(
-                planar_placed_positions, sublayer_floor, sublayer_roof
+            # Hash the planar positions of the cells of this sublayer by the largest
+            # distance they have to keep from each other.
+            sublayer_hash = SpatialHash(
+                cell_radius * 2 + max_ϵ, dimensions=2, capacity=cells_per_sublayer
             )
+            layer_cell_positions[n_placed] = starting_position
+            n_placed += 1
+            sublayer_hash.add(starting_position[[0, 2]])
+            full_coords = add_y_axis(sublayer_hash.points, sublayer_floor, sublayer_roof)
             good_points_store = [np.copy(full_coords)]
             last_position = starting_position
             for current_cell_count in np.arange(1, cells_per_sublayer, dtype=int):
@@ -169,65 +201,25 @@ class LayeredRandomWalk(Layered, PlacementStrategy):
                 )
                 full_coords = add_y_axis(planar_candidates, sublayer_floor, sublayer_roof)
                 inter_cell_soma_dist = cell_radius * 2 + rnd_ϵ
-                sublayer_distances = distance.cdist(
-                    planar_candidates, planar_placed_positions
-                )
-                good_indices = list(
-                    np.where(
-                        np.sum(sublayer_distances > inter_cell_soma_dist, axis=1)
-                        == current_cell_count
-                    )[0]
-                )
-                planar_candidates = planar_candidates[good_indices]
-                full_coords = full_coords[good_indices]
-                layer_distances = distance.cdist(full_coords, previously_placed_cells)
-                good_indices = list(
-                    np.where(
-                        np.sum(layer_distances > previously_placed_min_dist, axis=1)
-                        == other_cell_type_count
-                    )[0]
-                )
+                good_indices = get_isolated(full_coords, inter_cell_soma_dist)
                 if len(good_indices) == 0:
                     max_attempts = len(good_points_store)
                     for attempt in range(max_attempts):
                         store_id = np.random.randint(max_attempts - attempt)
-                        planar_candidates = good_points_store[store_id][:, [0, 2]]
                         full_coords = good_points_store[store_id]
                         rnd_ϵ = np.random.uniform(min_ϵ, max_ϵ)
                         inter_cell_soma_dist = cell_radius * 2 + rnd_ϵ
-                        sublayer_distances = distance.cdist(
-                            planar_candidates, planar_placed_positions
-                        )
-                        good_indices = list(
-                            np.where(
-                                np.sum(sublayer_distances > inter_cell_soma_dist, axis=1)
-                                == current_cell_count
-                            )[0]
-                        )
-                        planar_candidates = planar_candidates[good_indices]
-                        full_coords = full_coords[good_indices]
-                        layer_distances = distance.cdist(
-                            full_coords, previously_placed_cells
-                        )
-                        good_indices = list(
-                            np.where(
-                                np.sum(
-                                    layer_distances > previously_placed_min_dist, axis=1
-                                )
-                                == other_cell_type_count
-                            )[0]
-                        )
+                        good_indices = get_isolated(full_coords, inter_cell_soma_dist)
                         if len(good_indices) > 0:
                             random_index = random.sample(good_indices, 1)[0]
                             candidate = full_coords[random_index]
-                            placed_positions = np.vstack([placed_positions, candidate])
-                            planar_placed_positions = np.vstack(
-                                [planar_placed_positions, candidate[[0, 2]]]
-                            )
+                            layer_cell_positions[n_placed] = candidate
+                            n_placed += 1
+                            sublayer_hash.add(candidate[[0, 2]])
                             last_position = candidate
                             break
                         else:
-                            good_points_store = exclude_index(good_points_store, store_id)
+                            del good_points_store[store_id]
                     if len(good_indices) == 0:
                         if sublayer_attempts < 10:
                             sublayer_attempts += 1
@@ -254,17 +246,12 @@ class LayeredRandomWalk(Layered, PlacementStrategy):
                 else:
                     random_index = random.sample(good_indices, 1)[0]
                     new_position = full_coords[random_index]
-                    placed_positions = np.vstack([placed_positions, new_position])
-                    planar_placed_positions = np.vstack(
-                        [planar_placed_positions, new_position[[0, 2]]]
-                    )
-
+                    layer_cell_positions[n_placed] = new_position
+                    n_placed += 1
+                    sublayer_hash.add(new_position[[0, 2]])
                     good_points_store.append(full_coords[good_indices])
                     last_position = new_position
 
-            layer_cell_positions = np.concatenate(
-                (layer_cell_positions, placed_positions)
-            )
             report(
                 "Filling {} sublayer {}/{}...".format(
                     cell_type.name, sublayer_id + 1, n_sublayers
@@ -273,26 +260,106 @@ class LayeredRandomWalk(Layered, PlacementStrategy):
                 ongoing=True,
             )
 
-        scaffold.place_cells(cell_type, layer, layer_cell_positions)
+        return layer_cell_positions[:n_placed]
 
-    def partition_layer(self, n_sublayers):
+    def partition_layer(self, n_sublayers, layer=None):
+        if layer is None:
+            layer = self.layer_instance
         # Allow restricted placement along the Y-axis.
         yMin = self.restriction_minimum
-        layer_thickness = self.get_restricted_thickness()
+        layer_thickness = self.get_restricted_thickness(layer)
         sublayerHeight = layer_thickness / n_sublayers
         # Divide the Y axis into equal pieces
         sublayerYs = np.linspace(sublayerHeight, layer_thickness, n_sublayers)
         # Add the bottom of the lowest layer and translate all the points by the layer's Y position, keeping the Y restriction into account
         sublayerYs = (
-            np.insert(sublayerYs, 0, 0)
-            + self.layer_instance.origin[1]
-            + yMin * self.layer_instance.thickness
+            np.insert(sublayerYs, 0, 0) + layer.origin[1] + yMin * layer.thickness
         )
         # Create pairs of points on the Y axis corresponding to the bottom and ceiling of each sublayer partition
         sublayerPartitions = np.column_stack([sublayerYs, np.roll(sublayerYs, -1)])[:-1]
         return sublayerPartitions
 
-    def get_restricted_thickness(self):
-        return self.layer_instance.thickness * (
-            self.restriction_maximum - self.restriction_minimum
-        )
+    def get_restricted_thickness(self, layer=None):
+        if layer is None:
+            layer = self.layer_instance
+        return layer.thickness * (self.restriction_maximum - self.restriction_minimum)
+
+
+class SpatialHash:
+    """
+    Hashes points into a grid of buckets by their position, so that the points near a
+    position can be found without comparing against all points. The points are
+    stored in a preallocated buffer that doubles in size when it's full.
+    """
+
+    def __init__(self, cell_size, dimensions=3, capacity=64):
+        """
+        :param cell_size: Size of the buckets. Lookups are fastest for buckets about
+          the size of the distances that are looked up.
+        :type cell_size: float
+        :param dimensions: Amount of dimensions of the points.
+        :type dimensions: int
+        :param capacity: Initial size of the buffer.
+        :type capacity: int
+        """
+        self.cell_size = cell_size if cell_size > 0 else 1.0
+        self.count = 0
+        self._buffer = np.empty((max(capacity, 1), dimensions))
+        self._buckets = {}
+
+    @property
+    def points(self):
+        return self._buffer[: self.count]
+
+    def add(self, points):
+        """
+        Add points to the hash.
+        """
+        dimensions = self._buffer.shape[1]
+        points = np.asarray(points, dtype=float).reshape(-1, dimensions)
+        end = self.count + len(points)
+        if end > len(self._buffer):
+            buffer = np.empty((max(end, 2 * len(self._buffer)), dimensions))
+            buffer[: self.count] = self.points
+            self._buffer = buffer
+        self._buffer[self.count : end] = points
+        keys = np.floor(points / self.cell_size).astype(int)
+        for index, key in enumerate(map(tuple, keys), start=self.count):
+            self._buckets.setdefault(key, []).append(index)
+        self.count = end
+
+    def query(self, low, high):
+        """
+        Get the indices of the points in the buckets that overlap with a box.
+
+        :param low: Lower corner of the box.
+        :param high: Upper corner of the box.
+        :rtype: :class:`numpy.ndarray`
+        """
+        low = np.floor(np.asarray(low) / self.cell_size).astype(int)
+        high = np.floor(np.asarray(high) / self.cell_size).astype(int)
+        indices = []
+        for key in itertools.product(*(range(l, h + 1) for l, h in zip(low, high))):
+            indices.extend(self._buckets.get(key, ()))
+        return np.array(indices, dtype=int)
+
+    def isolated(self, points, min_distance):
+        """
+        Get a boolean mask of the points that are further than ``min_distance`` away from
+        all hashed points.
+
+        :param min_distance: Distance to keep from the hashed points, or the distance to
+          keep from each hashed point.
+        :type min_distance: float or :class:`numpy.ndarray`
+        """
+        points = np.asarray(points, dtype=float)
+        if not len(points) or not self.count:
+            return np.ones(len(points), dtype=bool)
+        min_distance = np.asarray(min_distance, dtype=float)
+        reach = np.max(min_distance, initial=0.0)
+        near = self.query(points.min(axis=0) - reach, points.max(axis=0) + reach)
+        if not len(near):
+            return np.ones(len(points), dtype=bool)
+        if min_distance.ndim:
+            min_distance = min_distance[near]
+        return np.all(distance.cdist(points, self._buffer[near]) > min_distance, axis=1)
@@ -0,0 +1,322 @@
+import random, zlib, copy, math, os, numpy as np
+from sklearn.neighbors import KDTree
+from ..models import CellType
+from ..reporting import report, warn
+from ..exceptions import *
+
+# Scheduler whose tiles are placed by the processes of a local process pool.
+_pool_scheduler = None
+# Tiles place this many times their share of the cells, so that their share is left
+# after cells outside of the tile and cells colliding between tiles are removed.
+_surplus = 1.1
+# Least amount of cells per tile.
+_min_tile_cells = 10
+
+
+class Tile:
+    """
+    Part of the X/Z extent of a layer. A tile places its share of the cells in a copy of
+    the layer that covers the tile and extends into the neighbouring tiles, so that
+    cells are placed up to the edges of the tile as densely as elsewhere. Only the
+    cells within the bounds of the tile itself are kept.
+    """
+
+    def __init__(self, id, layer, bounds, halo):
+        """
+        :param id: Index of the tile in the layer.
+        :type id: int
+        :param layer: Layer that the tile is part of.
+        :type layer: :class:`.models.Layer`
+        :param bounds: X/Z bounds of the tile, as ``[[x0, z0], [x1, z1]]``.
+        :type bounds: :class:`numpy.ndarray`
+        :param halo: Extension of the tile into its neighbours.
+        :type halo: float
+        """
+        self.id = id
+        self.bounds = bounds
+        # Only the edges that are shared with other tiles are extended.
+        layer_bounds = np.array(
+            [layer.origin[[0, 2]], (layer.origin + layer.dimensions)[[0, 2]]]
+        )
+        inner = ~np.isclose(bounds, layer_bounds)
+        self.edges = np.where(inner, bounds, [[-np.inf] * 2, [np.inf] * 2])
+        extended = bounds + np.where(inner, [[-halo] * 2, [halo] * 2], 0)
+        self.layer = copy.copy(layer)
+        self.layer.origin = layer.origin.copy()
+        self.layer.origin[[0, 2]] = extended[0]
+        self.layer.dimensions = layer.dimensions.copy()
+        self.layer.dimensions[[0, 2]] = extended[1] - extended[0]
+        if layer.volume:
+            fraction = self.layer.volume / layer.volume
+            self.layer.volumeOccupied = layer.volumeOccupied * fraction
+
+    @property
+    def area(self):
+        return np.prod(self.bounds[1] - self.bounds[0])
+
+    @property
+    def extended_area(self):
+        return np.prod(self.layer.dimensions[[0, 2]])
+
+    def get_owned(self, positions):
+        """
+        Get a boolean mask of the positions that lie within the bounds of the tile. The
+        bounds include the edges of the layer and the lower edges shared with other
+        tiles, so that each position is owned by exactly one tile.
+        """
+        xz = positions[:, [0, 2]]
+        return np.all((xz >= self.edges[0]) & (xz < self.edges[1]), axis=1)
+
+    def get_interior(self, positions, margin):
+        """
+        Get a boolean mask of the positions that lie further than ``margin`` inside of
+        the edges that the tile shares with other tiles.
+        """
+        xz = positions[:, [0, 2]]
+        return np.all(
+            (xz >= self.edges[0] + margin) & (xz <= self.edges[1] - margin), axis=1
+        )
+
+
+class PlacementScheduler:
+    """
+    Runs the placement strategies of a scaffold. Sequentially, or in parallel by
+    splitting the X/Z extent of the layer of each tileable placement strategy into tiles
+    that are placed in parallel: distributed over the MPI processes, or over a pool of
+    local processes when not running under MPI.
+
+    Each tile places a surplus of cells, of which it keeps those within its own bounds.
+    The cells of the tiles are stitched together by removing the cells that collide
+    with a cell of an earlier tile, which can only happen within 2 cell radii of the
+    edges between the tiles, and the surplus that is left. They are then placed at
+    once so that their identifiers are allocated in tile order. Cell types are placed
+    one after the other in resolved order, and cell types that can't be tiled or have
+    too few cells are placed as a whole.
+    """
+
+    def __init__(self, scaffold, seed=None, tile_size=None, processes=None):
+        """
+        :param scaffold: The scaffold to place.
+        :type scaffold: :class:`.core.Scaffold`
+        :param seed: Seed for the random generators. Each cell type and each of its
+          tiles is placed with numpy's and Python's global generators seeded with this
+          seed, its name and the index of the tile, so that its cells don't depend on
+          where it is placed.
+        :type seed: int
+        :param tile_size: Size of the tiles along the X and Z axis. By default layers
+          are split in about as many tiles as there are processes.
+        :type tile_size: float
+        :param processes: Size of the local process pool, by default the amount of
+          CPUs.
+        :type processes: int
+        """
+        self.scaffold = scaffold
+        self.seed = seed
+        self.tile_size = tile_size
+        self.processes = processes
+        self.comm = None
+        self.tiles = []
+
+    def run(self, parallel=False):
+        """
+        Place all cell types.
+
+        :param parallel: Place the tiles of tileable placement strategies in parallel.
+        :type parallel: bool
+        """
+        scaffold = self.scaffold
+        if parallel and scaffold.spilling:
+            warn("Cell types can't be placed in parallel while spilling.")
+            parallel = False
+        if parallel:
+            parallel = self._start()
+        for cell_type in CellType.resolve_order(scaffold.configuration.cell_types):
+            tiles = self.get_tiles(cell_type) if parallel else []
+            if len(tiles) < 2:
+                self.seed_random(cell_type)
+                scaffold.place_cell_type(cell_type)
+            else:
+                self.place_tiles(cell_type, tiles)
+                scaffold._finish_placement(cell_type)
+
+    def _start(self):
+        scaffold = self.scaffold
+        if scaffold.has_mpi_installed and scaffold.MPI.COMM_WORLD.size > 1:
+            self.comm = scaffold.MPI.COMM_WORLD
+            if self.seed is None:
+                self.seed = self.comm.bcast(np.random.randint(np.iinfo(np.int32).max))
+            return True
+        import multiprocessing
+
+        try:
+            self.context = multiprocessing.get_context("fork")
+        except ValueError:
+            warn("Process pools require `fork`, cell types are placed sequentially.")
+            return False
+        if self.seed is None:
+            self.seed = np.random.randint(np.iinfo(np.int32).max)
+        return True
+
+    def seed_random(self, cell_type, tile=None):
+        """
+        Seed the random generators for a cell type, or one of its tiles.
+        """
+        if self.seed is None:
+            return
+        keys = [self.seed, zlib.crc32(cell_type.name.encode())]
+        if tile is not None:
+            keys.append(tile.id)
+        np.random.seed(keys)
+        random.seed(":".join(map(str, keys)))
+
+    def get_tiles(self, cell_type):
+        """
+        Split the layer of a tileable placement strategy into tiles.
+
+        :returns: The tiles of the layer, or an empty list if the cell type can't be
+          tiled or has too few cells for the amount of tiles.
+        :rtype: list
+        """
+        placement = cell_type.placement
+        if cell_type.entity or not placement.tileable:
+            return []
+        layer = placement.layer_instance
+        origin, size = layer.origin[[0, 2]], layer.dimensions[[0, 2]]
+        if self.tile_size is not None:
+            shape = np.maximum(np.ceil(size / self.tile_size), 1).astype(int)
+        else:
+            # Split the layer in about as many square tiles as there are processes.
+            if self.comm is not None:
+                n = self.comm.size
+            else:
+                n = self.processes or os.cpu_count() or 1
+            nx = max(1, round(math.sqrt(n * size[0] / size[1])))
+            shape = np.array([nx, max(1, math.ceil(n / nx))])
+        # Which of the few cells of a tile end up in the tile itself is too random,
+        # such cell types are placed as a whole.
+        if placement.get_placement_count() < np.prod(shape) * _min_tile_cells:
+            return []
+        x = np.linspace(origin[0], origin[0] + size[0], shape[0] + 1)
+        z = np.linspace(origin[1], origin[1] + size[1], shape[1] + 1)
+        tiles = []
+        for i in range(shape[0]):
+            for j in range(shape[1]):
+                bounds = np.array([[x[i], z[j]], [x[i + 1], z[j + 1]]])
+                tiles.append(Tile(len(tiles), layer, bounds, 2 * placement.radius))
+        return tiles
+
+    def place_tiles(self, cell_type, tiles):
+        """
+        Place the tiles of a cell type in parallel, stitch them together and place the
+        stitched cells.
+        """
+        # Divide the cells over the tiles by area, using the largest remainder method.
+        count = cell_type.placement.get_placement_count()
+        areas = np.array([tile.area for tile in tiles])
+        shares = areas / np.sum(areas) * count
+        counts = np.floor(shares).astype(int)
+        largest = np.argsort(counts - shares, kind="stable")[: count - np.sum(counts)]
+        counts[largest] += 1
+        jobs = [(tile.id, n) for tile, n in zip(tiles, counts) if n > 0]
+        self.tiles = tiles
+        if self.comm is not None:
+            rank, size = self.comm.rank, self.comm.size
+            placed = {
+                id: self.place_tile(cell_type, tiles[id], n) for id, n in jobs[rank::size]
+            }
+            for node_placed in self.comm.allgather(placed):
+                placed.update(node_placed)
+        else:
+            global _pool_scheduler
+            _pool_scheduler = self
+            try:
+                with self.context.Pool(self.processes) as pool:
+                    results = pool.starmap(
+                        _place_tile_in_pool, [(cell_type.name, *job) for job in jobs]
+                    )
+            finally:
+                _pool_scheduler = None
+            placed = dict(zip((job[0] for job in jobs), results))
+        positions = self.stitch(cell_type, tiles, placed, dict(jobs))
+        layer = cell_type.placement.layer_instance
+        self.scaffold.place_cells(cell_type, layer, positions)
+
+    def place_tile(self, cell_type, tile, count):
+        """
+        Fill a tile with the placement strategy of a cell type. The extension of the
+        tile is filled as densely as the tile itself, with a surplus of cells that is
+        removed during stitching, after which only the cells within the bounds of the
+        tile are kept.
+
+        :returns: The positions of the cells within the tile.
+        :rtype: :class:`numpy.ndarray`
+        """
+        self.seed_random(cell_type, tile)
+        extended_count = int(round(_surplus * count * tile.extended_area / tile.area))
+        positions = cell_type.placement.fill(tile.layer, extended_count)
+        positions = np.array(positions, dtype=float).reshape(-1, 3)
+        return positions[tile.get_owned(positions)]
+
+    def stitch(self, cell_type, tiles, placed, counts=None):
+        """
+        Join the cells of the tiles of a cell type, without the cells that collide
+        with cells of an earlier tile. Random cells of each tile are then removed
+        until it has its share of the cells.
+
+        :param placed: The positions of the cells of each tile, by tile index.
+        :type placed: dict
+        :param counts: The share of the cells of each tile, by tile index. By default
+          all cells are kept.
+        :type counts: dict
+        :returns: The positions of the stitched cells.
+        :rtype: :class:`numpy.ndarray`
+        """
+        radius = cell_type.placement.radius
+        filled = [tile for tile in tiles if tile.id in placed]
+        if not filled:
+            return np.empty((0, 3))
+        positions = np.concatenate([placed[tile.id] for tile in filled])
+        tile_ids = np.concatenate(
+            [np.full(len(placed[tile.id]), tile.id) for tile in filled]
+        )
+        # Cells can only collide with the cells of another tile if they are within
+        # 2 radii of the edges between the tiles.
+        halo = np.ones(len(positions), dtype=bool)
+        for tile in tiles:
+            in_tile = tile_ids == tile.id
+            halo[in_tile] = ~tile.get_interior(positions[in_tile], 2 * radius)
+        candidates = np.nonzero(halo)[0]
+        keep = np.ones(len(positions), dtype=bool)
+        if len(candidates) > 1:
+            tree = KDTree(positions[candidates])
+            neighbours = tree.query_radius(positions[candidates], r=2 * radius)
+            for i, cell in enumerate(candidates):
+                if not keep[cell]:
+                    continue
+                others = candidates[neighbours[i]]
+                # Remove the colliding cells of later tiles.
+                others = others[(others > cell) & (tile_ids[others] != tile_ids[cell])]
+                keep[others] = False
+        removed = len(keep) - np.count_nonzero(keep)
+        if removed:
+            report(
+                "Removed {} colliding {} cells between tiles.".format(
+                    removed, cell_type.name
+                ),
+                level=3,
+            )
+        if counts is not None:
+            # Remove the surplus of each tile. The stitching is repeated by each MPI
+            # process, so the same cells have to be removed.
+            self.seed_random(cell_type)
+            for tile in tiles:
+                cells = np.nonzero(keep & (tile_ids == tile.id))[0]
+                surplus = len(cells) - counts.get(tile.id, 0)
+                if surplus > 0:
+                    keep[np.random.choice(cells, surplus, replace=False)] = False
+        return positions[keep]
+
+
+def _place_tile_in_pool(name, tile_id, count):
+    cell_type = _pool_scheduler.scaffold.configuration.cell_types[name]
+    return _pool_scheduler.place_tile(cell_type, _pool_scheduler.tiles[tile_id], count)
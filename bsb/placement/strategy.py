@@ -7,6 +7,10 @@ import numpy as np
 
 
 class PlacementStrategy(ConfigurableClass):
+    # Can the strategy place parts of the X/Z extent of its layer independently?
+    # Tileable strategies implement `fill`.
+    tileable = False
+
     def __init__(self, cell_type):
         super().__init__()
         self.cell_type = cell_type
@@ -23,6 +27,23 @@ class PlacementStrategy(ConfigurableClass):
     def place(self):
         pass
 
+    def fill(self, layer, count):
+        """
+        Get the positions of ``count`` cells in (a part of) a layer, without placing
+        them. Implemented by tileable strategies, so that each tile can be filled
+        independently.
+
+        :param layer: The layer, or a copy of it that covers part of its X/Z extent.
+        :type layer: :class:`.models.Layer`
+        :param count: The amount of cells to place in the layer.
+        :type count: int
+        :returns: The positions of the cells.
+        :rtype: :class:`numpy.ndarray`
+        """
+        raise NotImplementedError(
+            "{} can't fill parts of its layer.".format(self.__class__.__name__)
+        )
+
     def is_entities(self):
         return "entities" in self.__class__.__dict__ and self.__class__.entities
 
@@ -3,12 +3,24 @@ from .reporting import report, warn
 from scipy.stats import truncnorm
 import numpy as np
 from .exceptions import *
+from .functions import isin_sorted
 
 
 class PostProcessingHook(ConfigurableClass):
     def validate(self):
         pass
 
+    def get_random_state(self):
+        """
+        Return the random number generator for this hook. If the hook is configured
+        with a ``seed`` a new generator is seeded with it, otherwise numpy's global
+        generator is used.
+        """
+        seed = getattr(self, "seed", None)
+        if seed is None:
+            return np.random
+        return np.random.RandomState(seed)
+
     def after_placement(self):
         raise NotImplementedError(
             "`after_placement` hook not defined on " + self.__class__.__name__
@@ -68,19 +80,17 @@ class LabelMicrozones(PostProcessingHook):
                 # array that lists the planet for each satellite. `sattelite_map[n]`` will
                 # hold the planet ID for sattelite `n`, where `n` the index of the
                 # satellites in their cell type, not their scaffold ID.
-                satellite_map = self.scaffold._planets[possible_satellites.name].copy()
+                satellite_map = np.array(
+                    self.scaffold._planets[possible_satellites.name], dtype=int
+                )
                 # Create counters for each label for the report below
                 satellite_label_count = {l: 0 for l in labels.keys()}
-                # Iterate each label to check for any planets with that label, and label
-                # their sattelite with the same label. After iterating all labels, each
-                # satellite should have the same labels as their planet.
+                # Label the satellites of all labelled planets at once, so that each
+                # satellite has the same labels as its planet.
                 for label, labelled_cells in labels.items():
-                    for i, satellite in enumerate(satellites):
-                        planet = satellite_map[i]
-                        if planet in labelled_cells:
-                            self.scaffold.label_cells([satellite], label=label)
-                            # Increase the counter of this label
-                            satellite_label_count[label] += 1
+                    labelled_mask = isin_sorted(satellite_map, np.sort(labelled_cells))
+                    self.scaffold.label_cells(satellites[labelled_mask], label=label)
+                    satellite_label_count[label] = np.count_nonzero(labelled_mask)
                 if sum(satellite_label_count.values()) > 0:
                     # Report how many labels have been applied to which cell type.
                     report(
@@ -100,6 +110,8 @@ class LabelMicrozones(PostProcessingHook):
 
 
 class AscendingAxonLengths(PostProcessingHook):
+    casts = {"seed": int}
+
     def after_placement(self):
         granule_type = self.scaffold.get_cell_type("granule_cell")
         granules = self.scaffold.get_cells_by_type(granule_type.name)
@@ -111,23 +123,23 @@ class AscendingAxonLengths(PostProcessingHook):
         floor_ml = molecular_layer.Y
         roof_ml = floor_ml + molecular_layer.height  # Roof of the molecular layer
 
-        for idx, granule in enumerate(granules):
-            granule_y = granule[3]
-            # Determine min and max height so that the parallel fiber is inside of the molecular layer
-            pf_height_min = floor_ml - granule_y
-            pf_height_max = roof_ml - granule_y
-            # Determine the shape parameters a and b of the truncated normal distribution.
-            # See https://docs.scipy.org/doc/scipy/reference/generated/scipy.stats.truncnorm.html
-            a, b = (
-                (pf_height_min - pf_height) / pf_height_sd,
-                (pf_height_max - pf_height) / pf_height_sd,
-            )
-            # Draw a sample for the parallel fiber height from a truncated normal distribution
-            # with sd `pf_height_sd` and mean `pf_height`, truncated by the molecular layer bounds.
-            parallel_fibers[idx, 1] = (
-                truncnorm.rvs(a, b, size=1) * pf_height_sd + pf_height
-            )  # Height
-            parallel_fibers[idx, 0] = granule[0]  # ID
+        # Determine min and max height so that the parallel fiber is inside of the
+        # molecular layer
+        pf_height_min = floor_ml - granules[:, 3]
+        pf_height_max = roof_ml - granules[:, 3]
+        # Determine the shape parameters a and b of the truncated normal distribution.
+        # See https://docs.scipy.org/doc/scipy/reference/generated/scipy.stats.truncnorm.html
+        a = (pf_height_min - pf_height) / pf_height_sd
+        b = (pf_height_max - pf_height) / pf_height_sd
+        # Draw the parallel fiber heights of all granule cells at once from truncated
+        # normal distributions with sd `pf_height_sd` and mean `pf_height`, truncated by
+        # the molecular layer bounds.
+        parallel_fibers[:, 0] = granules[:, 0]  # ID
+        parallel_fibers[:, 1] = (
+            truncnorm.rvs(a, b, size=len(granules), random_state=self.get_random_state())
+            * pf_height_sd
+            + pf_height
+        )  # Height
         self.scaffold.append_dset("cells/ascending_axon_lengths", data=parallel_fibers)
 
 
@@ -137,15 +149,17 @@ class DCNRotations(PostProcessingHook):
     storing id and the planar coefficients a, b, c and d for each DCN cell
     """
 
+    casts = {"seed": int}
+
     def after_placement(self):
         dcn_matrix = self.scaffold.get_cells_by_type("dcn_cell")
-        dend_tree_coeff = np.zeros((dcn_matrix.shape[0], 4))
-        for i in range(len(dcn_matrix)):
-            # Make the planar coefficients a, b and c.
-            dend_tree_coeff[i] = np.random.rand(4) * 2.0 - 1.0
-            # Calculate the last planar coefficient d from ax + by + cz - d = 0
-            # => d = - (ax + by + cz)
-            dend_tree_coeff[i, 3] = -np.sum(dend_tree_coeff[i, 0:2] * dcn_matrix[i, 2:4])
+        # Make the planar coefficients a, b and c.
+        dend_tree_coeff = self.get_random_state().rand(len(dcn_matrix), 4) * 2.0 - 1.0
+        # Calculate the last planar coefficient d from ax + by + cz - d = 0
+        # => d = - (ax + by + cz)
+        dend_tree_coeff[:, 3] = -np.sum(
+            dend_tree_coeff[:, 0:2] * dcn_matrix[:, 2:4], axis=1
+        )
         # Compose the matrix
         matrix = np.column_stack((dcn_matrix[:, 0], dend_tree_coeff))
         # Save the matrix
@@ -2,4 +2,5 @@ from .cell import SimulationCell
 from .component import SimulationComponent
 from .targetting import TargetsNeurons, TargetsSections
 from .adapter import SimulatorAdapter
-from .results import SimulationResult, SimulationRecorder
+from .identifiers import IdentifierMap
+from .results import SimulationResult, SimulationRecorder, append_dataset
@@ -3,6 +3,7 @@ import numpy as np
 from ..helpers import ConfigurableClass
 from ..reporting import report
 from ..exceptions import *
+from .targetting import SpatialIndex
 from time import time
 
 
@@ -14,6 +15,7 @@ class SimulatorAdapter(ConfigurableClass):
         self.devices = {}
         self.entities = {}
         self._progress_listeners = []
+        self._spatial_index = None
 
     def get_configuration_classes(self):
         if not hasattr(self.__class__, "simulator_name"):
@@ -82,3 +84,12 @@ class SimulatorAdapter(ConfigurableClass):
 
     def add_progress_listener(self, listener):
         self._progress_listeners.append(listener)
+
+    def get_spatial_index(self):
+        """
+        Get the spatial index that devices of this adapter use for targetting. It is
+        built on first use after each :meth:`prepare`.
+        """
+        if self._spatial_index is None:
+            self._spatial_index = SpatialIndex(self.scaffold)
+        return self._spatial_index
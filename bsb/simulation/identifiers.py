@@ -0,0 +1,119 @@
+import numpy as np
+from ..exceptions import *
+
+
+class IdentifierMap:
+    """
+    Translates between scaffold identifiers and simulator identifiers. Identifiers are
+    stored as runs in which both the scaffold and the simulator identifiers are
+    consecutive, which is usually a single run per cell type. Translation in either
+    direction is a vectorized ``searchsorted`` over the starts of the runs.
+    """
+
+    def __init__(self):
+        self.types = []
+        self._runs = []
+        self._by_scaffold = None
+        self._by_simulator = None
+
+    def add(self, scaffold_ids, simulator_ids, name=None):
+        """
+        Map a set of scaffold identifiers to simulator identifiers.
+
+        :param scaffold_ids: Scaffold identifiers.
+        :type scaffold_ids: iterable
+        :param simulator_ids: Simulator identifier for each scaffold identifier.
+        :type simulator_ids: iterable
+        :param name: Name of the cell type that the identifiers belong to.
+        :type name: str
+        """
+        scaffold_ids = np.asarray(scaffold_ids, dtype=int).reshape(-1)
+        simulator_ids = np.asarray(simulator_ids, dtype=int).reshape(-1)
+        if len(scaffold_ids) != len(simulator_ids):
+            raise AdapterError(
+                "Can't map {} scaffold identifiers to {} simulator identifiers.".format(
+                    len(scaffold_ids), len(simulator_ids)
+                )
+            )
+        type_id = len(self.types)
+        self.types.append(name)
+        if not len(scaffold_ids):
+            return
+        # Start a new run wherever either of the identifiers isn't consecutive.
+        breaks = (np.diff(scaffold_ids) != 1) | (np.diff(simulator_ids) != 1)
+        starts = np.concatenate(([0], np.nonzero(breaks)[0] + 1))
+        lengths = np.diff(np.append(starts, len(scaffold_ids)))
+        runs = np.column_stack(
+            (
+                scaffold_ids[starts],
+                simulator_ids[starts],
+                lengths,
+                np.full(len(starts), type_id),
+            )
+        )
+        self._runs.append(runs)
+        self._by_scaffold = None
+        self._by_simulator = None
+
+    def to_simulator(self, ids):
+        """
+        Translate scaffold identifiers to simulator identifiers.
+
+        :raises: UnmappedIdentifierError if any of the identifiers isn't mapped.
+        """
+        runs, run, offset = self._find(ids, 0)
+        return runs[run, 1] + offset
+
+    def to_scaffold(self, ids):
+        """
+        Translate simulator identifiers to scaffold identifiers.
+
+        :raises: UnmappedIdentifierError if any of the identifiers isn't mapped.
+        """
+        runs, run, offset = self._find(ids, 1)
+        return runs[run, 0] + offset
+
+    def get_types(self, ids):
+        """
+        Get the name of the cell type of each scaffold identifier.
+        """
+        runs, run, _ = self._find(ids, 0)
+        return np.array(self.types, dtype=object)[runs[run, 3]]
+
+    def contains(self, ids):
+        """
+        Get a boolean mask of which scaffold identifiers are mapped.
+        """
+        _, _, mask = self._search(ids, 0)
+        return mask
+
+    def _find(self, ids, column):
+        runs, run, mask = self._search(ids, column)
+        if not np.all(mask):
+            ids = np.asarray(ids, dtype=int).reshape(-1)
+            raise UnmappedIdentifierError(
+                "{} identifiers are not mapped, e.g.: {}".format(
+                    np.count_nonzero(~mask), ids[~mask][:10].tolist()
+                )
+            )
+        offset = np.asarray(ids, dtype=int) - runs[run, column]
+        return runs, run, offset
+
+    def _search(self, ids, column):
+        ids = np.asarray(ids, dtype=int)
+        runs = self._get_runs(column)
+        if not len(runs):
+            return runs, np.zeros(ids.shape, dtype=int), np.zeros(ids.shape, dtype=bool)
+        run = np.maximum(np.searchsorted(runs[:, column], ids, side="right") - 1, 0)
+        offset = ids - runs[run, column]
+        return runs, run, (offset >= 0) & (offset < runs[run, 2])
+
+    def _get_runs(self, column):
+        if self._by_scaffold is None:
+            runs = np.concatenate(self._runs) if self._runs else np.empty((0, 4), int)
+            self._by_scaffold = runs[np.argsort(runs[:, 0], kind="stable")]
+            self._by_simulator = runs[np.argsort(runs[:, 1], kind="stable")]
+        return self._by_simulator if column else self._by_scaffold
+
+    def __len__(self):
+        return int(sum(np.sum(runs[:, 2]) for runs in self._runs))
@@ -1,10 +1,13 @@
 from ..reporting import warn
+import numpy as np
 import traceback
 
 
 class SimulationResult:
     def __init__(self):
         self.recorders = []
+        self._stream = None
+        self._stream_memory = None
 
     def add(self, recorder):
         self.recorders.append(recorder)
@@ -29,8 +32,63 @@ class SimulationResult:
                 traceback.print_exc()
                 warn("Recorder errored out!")
 
+    def stream(self, group, memory=None):
+        """
+        Stream the data of the recorders that support it to extendable datasets in an
+        HDF5 group, instead of keeping it in memory until :meth:`collect`. The data
+        is written to the group with each :meth:`flush`, and from then on
+        :meth:`collect` only yields the data recorded since the last flush.
+
+        :param group: The HDF5 file or group to stream to.
+        :type group: :class:`h5py.Group`
+        :param memory: Amount of bytes that the recorders may buffer before a flush
+          writes them out. If ``None`` every flush writes out the buffers.
+        :type memory: int
+        """
+        self._stream = group
+        self._stream_memory = memory
+
+    def flush(self, force=False):
+        """
+        Append the buffered data of the streaming recorders to their datasets and
+        clear their buffers, if the buffers exceed the memory cap given to
+        :meth:`stream`.
+
+        :param force: Flush regardless of the memory cap.
+        :type force: bool
+        :returns: Whether the buffers were flushed.
+        :rtype: bool
+        """
+        if self._stream is None:
+            return False
+        streaming = [
+            r for r in self.recorders if getattr(r, "stream_axis", None) is not None
+        ]
+        if (
+            not force
+            and self._stream_memory is not None
+            and sum(r.get_buffer_size() for r in streaming) < self._stream_memory
+        ):
+            return False
+        for recorder in streaming:
+            try:
+                path = "/".join(recorder.get_path())
+                append_dataset(
+                    self._stream, path, recorder.get_data(), recorder.stream_axis
+                )
+                recorder.clear()
+            except Exception as e:
+                traceback.print_exc()
+                warn("Recorder errored out!")
+        self._stream.file.flush()
+        return True
+
 
 class SimulationRecorder:
+    #: Axis along which the data of the recorder grows. Recorders that can be streamed
+    #: set this and implement `get_buffer_size` and `clear`.
+    stream_axis = None
+
     def get_path(self):
         raise NotImplementedError("Recorders need to implement the `get_path` function.")
 
@@ -40,6 +98,20 @@ class SimulationRecorder:
     def get_meta(self):
         return {}
 
+    def get_buffer_size(self):
+        """
+        Return the amount of bytes of data that the recorder has buffered.
+        """
+        return 0
+
+    def clear(self):
+        """
+        Discard the buffered data, after it has been streamed out.
+        """
+        raise NotImplementedError(
+            "Streaming recorders need to implement the `clear` function."
+        )
+
 
 class ClosureRecorder(SimulationRecorder):
     def __init__(self, path_func, data_func, meta_func=None):
@@ -58,3 +130,37 @@ class PresetPathMixin:
 class PresetMetaMixin:
     def get_meta(self):
         return self.meta
+
+
+def append_dataset(group, path, data, axis=0, chunks=True):
+    """
+    Append data to a dataset along the given axis. If the dataset does not exist yet
+    it is created as a chunked dataset that can be extended along that axis.
+
+    :param group: The HDF5 group containing the dataset.
+    :type group: :class:`h5py.Group`
+    :param path: Path of the dataset in the group.
+    :type path: str
+    :param data: Data to append.
+    :type data: :class:`numpy.ndarray`
+    :param axis: Axis to extend.
+    :type axis: int
+    :param chunks: Chunk shape of a newly created dataset, or True to let h5py guess.
+    :type chunks: tuple or bool
+    :returns: The dataset.
+    :rtype: :class:`h5py.Dataset`
+    """
+    data = np.asarray(data)
+    if path not in group:
+        maxshape = list(data.shape)
+        maxshape[axis] = None
+        return group.create_dataset(
+            path, data=data, maxshape=tuple(maxshape), chunks=chunks
+        )
+    dset = group[path]
+    start = dset.shape[axis]
+    dset.resize(start + data.shape[axis], axis=axis)
+    index = [slice(None)] * data.ndim
+    index[axis] = slice(start, None)
+    dset[tuple(index)] = data
+    return dset
@@ -1,7 +1,87 @@
-import random, numpy as np
+import random, zlib, numpy as np
+from sklearn.neighbors import KDTree
 from ..exceptions import *
 
 
+class SpatialIndex:
+    """
+    Spatial index over the cells of any set of cell types, for device targetting. It
+    reuses the trees of the scaffold's ``cells`` :class:`.trees.TreeCollection`, and
+    caches the result of each query.
+    """
+
+    def __init__(self, scaffold):
+        self.scaffold = scaffold
+        self._types = {}
+        self._cache = {}
+
+    def sphere(self, cell_types, origin, radius):
+        """
+        Get the identifiers of the cells of the given types within ``radius`` of the
+        ``origin``.
+        """
+        origin = np.array(origin, dtype=float).reshape(1, 3)
+
+        def query(tree, ids, positions):
+            return ids[tree.query_radius(origin, radius)[0]]
+
+        return self._query(("sphere", tuple(origin[0]), radius), cell_types, query)
+
+    def cylinder(self, cell_types, center, radius):
+        """
+        Get the identifiers of the cells of the given types within ``radius`` of the
+        vertical (Y) axis through the given XZ ``center``.
+        """
+        center = np.array(center, dtype=float)
+
+        def query(tree, ids, positions):
+            d2 = np.sum((positions[:, [0, 2]] - center) ** 2, axis=1)
+            return ids[d2 < radius ** 2]
+
+        return self._query(("cylinder", tuple(center), radius), cell_types, query)
+
+    def box(self, cell_types, origin, size):
+        """
+        Get the identifiers of the cells of the given types inside of the box with
+        the given ``size`` centered on the ``origin``.
+        """
+        origin = np.array(origin, dtype=float)
+        half = np.array(size, dtype=float) / 2
+
+        def query(tree, ids, positions):
+            # Query the sphere around the box and filter out the corners.
+            radius = np.sqrt(np.sum(half ** 2))
+            candidates = tree.query_radius(origin.reshape(1, 3), radius)[0]
+            inside = np.all(np.abs(positions[candidates] - origin) <= half, axis=1)
+            return ids[candidates[inside]]
+
+        key = ("box", tuple(origin), tuple(half))
+        return self._query(key, cell_types, query)
+
+    def _query(self, key, cell_types, query):
+        key = key + (tuple(sorted(cell_types)),)
+        if key not in self._cache:
+            targets = [np.empty(0, dtype=int)]
+            for name in sorted(cell_types):
+                tree, ids, positions = self._get_type(name)
+                if len(ids):
+                    targets.append(query(tree, ids, positions))
+            self._cache[key] = np.sort(np.concatenate(targets))
+        return self._cache[key].copy()
+
+    def _get_type(self, name):
+        if name not in self._types:
+            cells = self.scaffold.get_cells_by_type(name)
+            ids = cells[:, 0].astype(int)
+            positions = cells[:, 2:5]
+            # The stored tree is built from the positions in the same order.
+            tree = self.scaffold.trees.cells.get_tree(name)
+            if tree is None and len(positions):
+                tree = KDTree(positions)
+            self._types[name] = (tree, ids, positions)
+        return self._types[name]
+
+
 class TargetsNeurons:
     def initialise(self, scaffold):
         super().initialise(scaffold)
@@ -22,62 +102,30 @@ class TargetsNeurons:
         """
         Target all or certain cells in a spherical location.
         """
-        if len(self.cell_types) != 1:
-            # Compile a list of the cells and build a compound tree.
-            target_cells = np.empty((0, 5))
-            id_map = np.empty((0, 1))
-            for t in self.cell_types:
-                cells = self.scaffold.get_cells_by_type(t)
-                target_cells = np.vstack((target_cells, cells[:, 2:5]))
-                id_map = np.vstack((id_map, cells[:, 0]))
-            tree = KDTree(target_cells)
-            target_positions = target_cells
-        else:
-            # Retrieve the prebuilt tree from the SHDF file
-            tree = self.scaffold.trees.cells.get_tree(self.cell_types[0])
-            target_cells = self.scaffold.get_cells_by_type(self.cell_types[0])
-            id_map = target_cells[:, 0]
-            target_positions = target_cells[:, 2:5]
-        # Query the tree for all the targets
-        target_ids = tree.query_radius(np.array(self.origin).reshape(1, -1), self.radius)[
-            0
-        ].tolist()
-        return id_map[target_ids]
+        index = self.adapter.get_spatial_index()
+        return index.sphere(self.cell_types, self.origin, self.radius)
 
     def _targets_cylinder(self):
         """
         Target all or certain cells within a cylinder of specified radius.
         """
-        if len(self.cell_types) != 1:
-            # Compile a list of the cells.
-            target_cells = np.empty((0, 5))
-            id_map = np.empty((0, 1))
-            for t in self.cell_types:
-                cells = self.scaffold.get_cells_by_type(t)
-                target_cells = np.vstack((target_cells, cells[:, 2:5]))
-                id_map = np.vstack((id_map, cells[:, 0]))
-            target_positions = target_cells
+        index = self.adapter.get_spatial_index()
+        if hasattr(self, "origin"):
+            center = [self.origin[0], self.origin[2]]
         else:
-            # Retrieve the prebuilt tree from the SHDF file
-            # tree = self.scaffold.trees.cells.get_tree(self.cell_types[0])
-            target_cells = self.scaffold.get_cells_by_type(self.cell_types[0])
-            # id_map = target_cells[:, 0]
-            target_positions = target_cells[:, 2:5]
-            # Query the tree for all the targets
-            center_scaffold = [
+            center = [
                 self.scaffold.configuration.X / 2,
                 self.scaffold.configuration.Z / 2,
             ]
+        return index.cylinder(self.cell_types, center, self.radius)
 
-            # Find cells falling into the cylinder volume
-            target_cells_idx = np.sum(
-                (target_positions[:, [0, 2]] - np.array(center_scaffold)) ** 2, axis=1
-            ).__lt__(self.radius ** 2)
-            cylinder_target_cells = target_cells[target_cells_idx, 0]
-            cylinder_target_cells = cylinder_target_cells.astype(int)
-            cylinder_target_cells = cylinder_target_cells.tolist()
-            # print(id_stim)
-            return cylinder_target_cells
+    def _targets_box(self):
+        """
+        Target all or certain cells within a box centered on the ``origin`` with the
+        given ``size``.
+        """
+        index = self.adapter.get_spatial_index()
+        return index.box(self.cell_types, self.origin, self.size)
 
     def _targets_cell_type(self):
         """
@@ -105,7 +153,7 @@ class TargetsNeurons:
         # Use the `cell_fraction` or `cell_count` attribute to determine what portion of
         # the selected ids to exclude.
         r_threshold = getattr(self, "cell_fraction", getattr(self, "cell_count", n) / n)
-        ids = ids[np.random.random_sample(n) <= r_threshold]
+        ids = ids[self.get_random_state().random_sample(n) <= r_threshold]
         return ids
 
     def _targets_representatives(self):
@@ -117,14 +165,34 @@ class TargetsNeurons:
         if hasattr(self, "cell_types"):
             target_types = list(filter(lambda c: c.name in self.cell_types, target_types))
         target_ids = [cell_type.get_ids() for cell_type in target_types]
+        random_state = self.get_random_state()
         representatives = [
-            random.choice(type_ids) for type_ids in target_ids if len(target_ids) > 0
+            type_ids[random_state.randint(len(type_ids))]
+            for type_ids in target_ids
+            if len(type_ids) > 0
         ]
         return representatives
 
     def _targets_by_id(self):
         return self.targets
 
+    def get_random_state(self, stream=None):
+        """
+        Return a random state for the target selection of this device. It is seeded
+        with the device's ``seed``, or with a seed derived from its name, so that every
+        MPI process selects the same targets.
+
+        :param stream: Name of an independent stream of random numbers for another
+          purpose than target selection, e.g. ``"patterns"``.
+        :type stream: str
+        """
+        seed = getattr(self, "seed", None)
+        if seed is None:
+            seed = zlib.crc32(self.name.encode())
+        if stream is not None:
+            seed = [seed, zlib.crc32(stream.encode())]
+        return np.random.RandomState(seed)
+
     def get_targets(self):
         """
         Return the targets of the device.
@@ -150,12 +218,9 @@ class TargetsNeurons:
         )
 
     def initialise_targets(self):
-        if self.adapter.pc_id == 0:
-            targets = self._get_targets()
-        else:
-            targets = None
-        # Broadcast to make sure all the nodes have the same targets for each device.
-        self._targets = self.scaffold.MPI.COMM_WORLD.bcast(targets, root=0)
+        # Target selection is seeded per device, so all the nodes select the same
+        # targets without having to broadcast them.
+        self._targets = self._get_targets()
 
     def initialise_patterns(self):
         if self.adapter.pc_id == 0:
@@ -3,9 +3,11 @@ from ..simulation import (
     SimulationComponent,
     SimulationCell,
     TargetsNeurons,
+    IdentifierMap,
 )
 from ..models import ConnectivitySet
 from ..helpers import ListEvalConfiguration
+from ..functions import poisson_trains
 from ..reporting import report, warn
 from ..exceptions import *
 import os, json, weakref, numpy as np
@@ -30,15 +32,16 @@ class MapsScaffoldIdentifiers:
     def reset_identifiers(self):
         self.nest_identifiers = []
         self.scaffold_identifiers = []
-        self.scaffold_to_nest_map = {}
+        self.identifier_map = IdentifierMap()
 
     def _build_identifier_map(self):
-        self.scaffold_to_nest_map = dict(
-            zip(self.scaffold_identifiers, self.nest_identifiers)
+        self.identifier_map = IdentifierMap()
+        self.identifier_map.add(
+            self.scaffold_identifiers, self.nest_identifiers, self.name
         )
 
     def get_nest_ids(self, ids):
-        return [self.scaffold_to_nest_map[id] for id in ids]
+        return self.identifier_map.to_simulator(ids)
 
 
 class NestCell(SimulationCell, MapsScaffoldIdentifiers):
@@ -229,6 +232,9 @@ class NestDevice(TargetsNeurons, SimulationComponent):
     casts = {
         "radius": float,
         "origin": [float],
+        "size": [float],
+        "seed": int,
+        "poisson": dict,
         "parameters": dict,
         "stimulus": ListEvalConfiguration.cast,
     }
@@ -252,6 +258,19 @@ class NestDevice(TargetsNeurons, SimulationComponent):
                     self.node_name
                 )
             )
+        if hasattr(self, "poisson"):
+            if self.device != "spike_generator" or self.io != "input":
+                raise ConfigurationError(
+                    "Only input `spike_generator` devices can generate `poisson` trains"
+                    + " in {}".format(self.get_config_node())
+                )
+            for key in ("rate", "stop"):
+                if key not in self.poisson:
+                    raise ConfigurationError(
+                        "Missing `{}` in the `poisson` trains of {}".format(
+                            key, self.get_config_node()
+                        )
+                    )
         if hasattr(self, "stimulus"):
             stimulus_name = (
                 "stimulus"
@@ -293,9 +312,10 @@ class NestAdapter(SimulatorAdapter):
         "entities": NestEntity,
     }
 
-    casts = {"threads": int, "modules": list}
+    casts = {"threads": int, "modules": list, "spike_collection": str}
 
     defaults = {
+        "spike_collection": "files",
         "default_synapse_model": "static_synapse",
         "default_neuron_model": "iaf_cond_alpha",
         "verbosity": "M_ERROR",
@@ -304,6 +324,8 @@ class NestAdapter(SimulatorAdapter):
         "modules": [],
     }
 
+    spike_collections = ["files", "memory"]
+
     required = [
         "default_neuron_model",
         "default_synapse_model",
@@ -330,7 +352,7 @@ class NestAdapter(SimulatorAdapter):
         self.suffix = ""
         self.multi = False
         self.has_lock = False
-        self.global_identifier_map = {}
+        self.identifier_map = IdentifierMap()
         self.simulation_id = _randint()
 
     def prepare(self):
@@ -338,6 +360,7 @@ class NestAdapter(SimulatorAdapter):
             raise AdapterError(
                 "Attempting to prepare the same adapter twice. Please use `bsb.create_adapter` for multiple adapter instances of the same simulation."
             )
+        self._spatial_index = None
         report("Locking NEST kernel...", level=2)
         self.lock()
         report("Installing  NEST modules...", level=2)
@@ -449,7 +472,7 @@ class NestAdapter(SimulatorAdapter):
         self.is_prepared = False
         if hasattr(self, "nest"):
             self.reset_kernel()
-        self.global_identifier_map = {}
+        self.identifier_map = IdentifierMap()
         for cell_model in self.cell_models.values():
             cell_model.reset()
 
@@ -514,36 +537,50 @@ class NestAdapter(SimulatorAdapter):
             print(str(e))
             rank = 0
 
-        if rank == 0:
-            timestamp = str(time.time()).split(".")[0] + str(_randint())
-            with h5py.File("results_" + self.name + "_" + timestamp + ".hdf5", "a") as f:
-                for path, data, meta in self.result.safe_collect():
-                    try:
-                        path = "/".join(path)
-                        if path in f:
-                            data = np.vstack((f[path][()], data))
-                            del f[path]
-                        d = f.create_dataset(path, data=data)
-                        for k, v in meta.items():
-                            d.attrs[k] = v
-                    except Exception as e:
-                        import traceback
-
-                        traceback.print_exc()
-                        if not isinstance(data, np.ndarray):
-                            warn(
-                                "Recorder {} numpy.ndarray expected, got {}".format(
-                                    path, type(data)
-                                )
+        results = self.result.safe_collect()
+        if rank != 0:
+            # Take part in the collectives of recorders that gather their data on the
+            # main node.
+            for _ in results:
+                pass
+            return
+        timestamp = str(time.time()).split(".")[0] + str(_randint())
+        with h5py.File("results_" + self.name + "_" + timestamp + ".hdf5", "a") as f:
+            for path, data, meta in results:
+                try:
+                    path = "/".join(path)
+                    if path in f:
+                        data = np.vstack((f[path][()], data))
+                        del f[path]
+                    d = f.create_dataset(path, data=data, **_storage_options(data))
+                    for k, v in meta.items():
+                        d.attrs[k] = v
+                except Exception as e:
+                    import traceback
+
+                    traceback.print_exc()
+                    if not isinstance(data, np.ndarray):
+                        warn(
+                            "Recorder {} numpy.ndarray expected, got {}".format(
+                                path, type(data)
                             )
-                        else:
-                            warn(
-                                "Recorder {} processing errored out: {}".format(
-                                    path, "{} {}".format(data.dtype, data.shape)
-                                )
+                        )
+                    else:
+                        warn(
+                            "Recorder {} processing errored out: {}".format(
+                                path, "{} {}".format(data.dtype, data.shape)
                             )
+                        )
 
     def validate(self):
+        if self.spike_collection not in self.__class__.spike_collections:
+            raise ConfigurationError(
+                "Unknown `spike_collection` '{}' for '{}', choose from: {}".format(
+                    self.spike_collection,
+                    self.name,
+                    ", ".join(self.__class__.spike_collections),
+                )
+            )
         for cell_model in self.cell_models.values():
             cell_model.neuron_model = (
                 cell_model.neuron_model
@@ -605,18 +642,22 @@ class NestAdapter(SimulatorAdapter):
         # Iterate over all simulation components that contain representations
         # of scaffold components with an ID to create a map of all scaffold ID's
         # to all NEST ID's this adapter manages
+        self.identifier_map = IdentifierMap()
         for mapping_type in chain(self.entities.values(), self.cell_models.values()):
             # "Freeze" the type's identifiers into a map
             mapping_type._build_identifier_map()
-            # Add the type's map to the global map
-            self.global_identifier_map.update(mapping_type.scaffold_to_nest_map)
+            # Add the type's identifiers to the global map
+            self.identifier_map.add(
+                mapping_type.scaffold_identifiers,
+                mapping_type.nest_identifiers,
+                mapping_type.name,
+            )
 
     def get_nest_ids(self, ids):
-        return [self.global_identifier_map[id] for id in ids]
+        return self.identifier_map.to_simulator(ids)
 
     def get_scaffold_ids(self, ids):
-        scaffold_map = {v: k for k, v in self.global_identifier_map.items()}
-        return [scaffold_map[id] for id in ids]
+        return self.identifier_map.to_scaffold(ids)
 
     def create_neurons(self):
         """
@@ -687,12 +728,8 @@ class NestAdapter(SimulatorAdapter):
                 )
                 continue
             # Get the NEST identifiers for the connections made in the connectivity matrix
-            presynaptic_sources = np.array(
-                self.get_nest_ids(np.array(cs.from_identifiers, dtype=int))
-            )
-            postsynaptic_targets = np.array(
-                self.get_nest_ids(np.array(cs.to_identifiers, dtype=int))
-            )
+            presynaptic_sources = self.get_nest_ids(cs.from_identifiers)
+            postsynaptic_targets = self.get_nest_ids(cs.to_identifiers)
             if not len(presynaptic_sources) or not len(postsynaptic_targets):
                 warn("No connections for " + name)
                 continue
@@ -775,6 +812,9 @@ class NestAdapter(SimulatorAdapter):
         """
         for device_model in self.devices.values():
             device_model.protocol.before_create()
+            if hasattr(device_model, "poisson"):
+                self.create_poisson_generators(device_model)
+                continue
             device = self.nest.Create(device_model.device)
             report("Creating device:  " + device_model.device, level=3)
             # Execute SetStatus and catch DictError
@@ -827,9 +867,72 @@ class NestAdapter(SimulatorAdapter):
                             device_model.get_config_node()
                         ),
                     }
-                }
+                },
             )
 
+    def create_poisson_generators(self, device_model):
+        """
+        Create a ``spike_generator`` for each target of a device, each with its own
+        Poisson train. The trains of all targets are drawn at once, from the random
+        state of the device. Each generator is connected to its own target, with the
+        ``connection`` and ``synapse`` specification of the device.
+        """
+        targets = device_model.get_targets()
+        report(
+            "Creating {} poisson trains for {}".format(len(targets), device_model.name),
+            level=3,
+        )
+        poisson = device_model.poisson
+        start = float(poisson.get("start", 0.0))
+        times, offsets = poisson_trains(
+            # NEST rates are in Hz, its times in ms.
+            float(poisson["rate"]) / 1000.0,
+            float(poisson["stop"]) - start,
+            len(targets),
+            start,
+            random_state=device_model.get_random_state("patterns"),
+        )
+        # Spike generators only accept strictly positive spike times on the time grid.
+        times = np.maximum(np.round(times / self.resolution), 1) * self.resolution
+        generators = self.nest.Create("spike_generator", len(targets))
+        self.execute_command(
+            self.nest.SetStatus,
+            generators,
+            [
+                dict(
+                    device_model.parameters,
+                    spike_times=times[offsets[i] : offsets[i + 1]].tolist(),
+                )
+                for i in range(len(targets))
+            ],
+            exceptions={
+                "DictError": {
+                    "from": None,
+                    "exception": catch_dict_error(
+                        "Could not create {} device '{}': ".format(
+                            device_model.device, device_model.name
+                        )
+                    ),
+                }
+            },
+        )
+        device_model.protocol.after_create(generators)
+        connect_params = [generators, targets]
+        # Each generator only targets its own cell.
+        connect_params.append(dict(device_model.connection, rule="one_to_one"))
+        if device_model.synapse is not None:
+            connect_params.append(device_model.synapse)
+        self.execute_command(
+            self.nest.Connect,
+            *connect_params,
+            exceptions={
+                "IllegalConnection": {
+                    "from": None,
+                    "exception": catch_connection_error(device_model.get_config_node()),
+                }
+            },
+        )
+
     def create_model(self, cell_model):
         """
         Create a NEST cell model in the simulator based on a cell model configuration.
@@ -942,8 +1045,8 @@ class SpikeRecorder(SimulationRecorder):
             for file in files:
                 file_spikes = np.loadtxt(file)
                 if len(file_spikes):
-                    scaffold_ids = np.array(
-                        self.device_model.adapter.get_scaffold_ids(file_spikes[:, 0])
+                    scaffold_ids = self.device_model.adapter.get_scaffold_ids(
+                        file_spikes[:, 0]
                     )
                     times = file_spikes[:, 1]
                     scaffold_spikes = np.vstack((scaffold_ids, times)).T
@@ -960,13 +1063,56 @@ class SpikeRecorder(SimulationRecorder):
         }
 
 
+class MemorySpikeRecorder(SpikeRecorder):
+    """
+    Reads the spikes from the events that the spike detector kept in memory, instead of
+    from its ``.gdf`` files. When running on multiple processes the events are
+    gathered on the main node, so this recorder must be collected on all nodes.
+    """
+
+    def __init__(self, device_model):
+        super().__init__(device_model)
+        self.device_id = None
+
+    def get_data(self):
+        adapter = self.device_model.adapter
+        events = adapter.nest.GetStatus(self.device_id, "events")[0]
+        senders = np.asarray(events["senders"], dtype=int)
+        times = np.asarray(events["times"], dtype=float)
+        comm = mpi4py.MPI.COMM_WORLD
+        if comm.size > 1:
+            senders = comm.gather(senders, root=0)
+            times = comm.gather(times, root=0)
+            if comm.rank != 0:
+                return None
+            senders = np.concatenate(senders)
+            times = np.concatenate(times)
+        spikes = np.empty((len(senders), 2), dtype=float)
+        if len(senders):
+            spikes[:, 0] = adapter.get_scaffold_ids(senders)
+        spikes[:, 1] = times
+        return spikes
+
+
 def _randint():
     return np.random.randint(np.iinfo(int).max)
 
 
+def _storage_options(data, size=2 ** 16):
+    # Compress non-scalar datasets in chunks of whole rows, of up to `size` elements.
+    # Chunks can't be larger than the dataset, so empty datasets are stored as is.
+    shape = np.shape(data)
+    if not len(shape) or 0 in shape:
+        return {}
+    row = int(np.prod(shape[1:]))
+    rows = max(1, min(shape[0], size // max(row, 1)))
+    return {"chunks": (rows,) + tuple(shape[1:]), "compression": "gzip"}
+
+
 class DeviceProtocol:
     def __init__(self, device):
         self.device = device
+        self.recorder = None
 
     def before_create(self):
         pass
@@ -986,9 +1132,19 @@ class SpikeDetectorProtocol(DeviceProtocol):
         device_tag = str(_randint())
         device_tag = mpi4py.MPI.COMM_WORLD.bcast(device_tag, root=0)
         self.device.parameters["label"] += device_tag
-        if mpi4py.MPI.COMM_WORLD.rank == 0:
+        if self.device.adapter.spike_collection == "memory":
+            # Every node keeps its own spikes in memory, and takes part in gathering them.
+            self.device.parameters["to_file"] = False
+            self.device.parameters["to_memory"] = True
+            self.recorder = MemorySpikeRecorder(self.device)
+            self.device.adapter.result.add(self.recorder)
+        elif mpi4py.MPI.COMM_WORLD.rank == 0:
             self.device.adapter.result.add(SpikeRecorder(self.device))
 
+    def after_create(self, id):
+        if self.recorder is not None:
+            self.recorder.device_id = id
+
 
 def get_device_protocol(device):
     if device.device in _device_protocols:
@@ -6,17 +6,17 @@ from ...simulation import (
     TargetsSections,
     SimulationResult,
     SimulationRecorder,
+    append_dataset,
 )
 from ...helpers import get_configurable_class
 from ...reporting import report, warn
 from ...models import ConnectivitySet
 from ...exceptions import *
-import random, os, sys
+import random, os, sys, signal
 import numpy as np
 import traceback
 import errr
 
-
 try:
     import neuron
 
@@ -93,6 +93,8 @@ class NeuronDevice(TargetsNeurons, TargetsSections, SimulationComponent):
     casts = {
         "radius": float,
         "origin": [float],
+        "size": [float],
+        "seed": int,
     }
 
     defaults = {}
@@ -204,9 +206,19 @@ class NeuronAdapter(SimulatorAdapter):
         "duration": float,
         "resolution": float,
         "initial": float,
+        "progress_interval": float,
+        "collection": str,
+        "stream_memory": float,
+    }
+
+    defaults = {
+        "initial": -65.0,
+        "progress_interval": 1.0,
+        "collection": "serial",
+        "stream_memory": None,
     }
 
-    defaults = {"initial": -65.0}
+    collection_modes = ["serial", "gather", "shards"]
 
     required = ["temperature", "duration", "resolution"]
 
@@ -215,9 +227,26 @@ class NeuronAdapter(SimulatorAdapter):
         self.cells = {}
         self._next_gid = 0
         self.transmitter_map = {}
+        self._result_filename = None
+        self._stream_file = None
 
     def validate(self):
-        pass
+        if self.progress_interval <= 0:
+            raise ConfigurationError(
+                "The `progress_interval` of '{}' must be a positive duration.".format(
+                    self.name
+                )
+            )
+        if self.collection not in self.__class__.collection_modes:
+            raise ConfigurationError(
+                "Unknown `collection` mode '{}' for '{}', choose from: {}".format(
+                    self.collection, self.name, ", ".join(self.__class__.collection_modes)
+                )
+            )
+        if self.stream_memory is not None and self.stream_memory < 0:
+            raise ConfigurationError(
+                "The `stream_memory` of '{}' can't be negative.".format(self.name)
+            )
 
     def validate_prepare(self):
         output_handler = self.scaffold.output_formatter
@@ -247,6 +276,7 @@ class NeuronAdapter(SimulatorAdapter):
         report("Preparing simulation", level=3)
 
         self.validate_prepare()
+        self._spatial_index = None
         self.h = simulator
 
         simulator.dt = self.resolution
@@ -354,55 +384,123 @@ class NeuronAdapter(SimulatorAdapter):
         report("Simulating...", level=2)
         pc.set_maxstep(10)
         simulator.finitialize(self.initial)
-        progression = 0
-        while progression < self.duration:
-            progression += 1
-            pc.psolve(progression)
-            pc.barrier()
-            self.progress(progression, self.duration)
-            if os.path.exists("interrupt_neuron"):
-                report("Iterrupt requested. Stopping simulation.", level=1)
-                break
+        self._interrupted = False
+        self._result_filename = None
+        if self.stream_memory is not None:
+            self._open_stream()
+        handler = self._install_interrupt_handler()
+        try:
+            progression = 0
+            # Integrate in chunks of `progress_interval` ms. Progress reports and
+            # interrupt polling only happen between chunks.
+            while progression < self.duration:
+                progression = min(progression + self.progress_interval, self.duration)
+                pc.psolve(progression)
+                self.progress(progression, self.duration)
+                self.result.flush()
+                if self._poll_interrupt(pc):
+                    report("Interrupt requested. Stopping simulation.", level=1)
+                    break
+        finally:
+            self._restore_interrupt_handler(handler)
         report("Finished simulation.", level=2)
 
-    def collect_output(self):
-        import h5py, time
+    def _install_interrupt_handler(self):
+        # Sending SIGUSR1 to any of the processes requests an interrupt. The handler
+        # only sets a flag, which is picked up at the next progress checkpoint.
+        def interrupt(signum, frame):
+            self._interrupted = True
+
+        try:
+            return signal.signal(signal.SIGUSR1, interrupt)
+        except (ValueError, AttributeError):
+            # Not on the main thread, or no SIGUSR1 on this platform.
+            return None
+
+    def _restore_interrupt_handler(self, handler):
+        if handler is not None:
+            signal.signal(signal.SIGUSR1, handler)
+
+    def _poll_interrupt(self, pc):
+        # Only the main node looks for the `interrupt_neuron` file. The interrupt flags
+        # of all nodes are combined so that all nodes stop at the same checkpoint.
+        interrupted = self._interrupted or (
+            self.pc_id == 0 and os.path.exists("interrupt_neuron")
+        )
+        # Allreduce type 2 takes the maximum over all nodes.
+        return pc.allreduce(float(interrupted), 2) > 0
+
+    def _open_stream(self):
+        import h5py
+
+        # Stream the recorders to this node's shard of the result file. The megabytes
+        # of `stream_memory` cap the recorder buffers of each node.
+        self._result_filename = self._create_result_filename()
+        shard = _shard_filename(self._result_filename, self.pc_id)
+        self._stream_file = h5py.File(shard, "w")
+        self.result.stream(self._stream_file, self.stream_memory * 2 ** 20)
+
+    def _create_result_filename(self):
+        import time
 
         timestamp = str(time.time()).split(".")[0] + str(random.random()).split(".")[1]
         timestamp = self.pc.broadcast(timestamp)
+        return "results_" + self.name + "_" + timestamp + ".hdf5"
+
+    def collect_output(self):
+        filename = self._result_filename or self._create_result_filename()
+        if self._stream_file is not None or self.collection == "shards":
+            # Streamed results are already spread over the shards.
+            self._collect_shards(filename)
+        elif self.collection == "gather":
+            self._collect_gathered(filename)
+        else:
+            self._collect_serial(filename)
+
+    def _collect_serial(self, filename):
+        import h5py
+
+        # Each node appends its results to the result file in turn.
         for node in range(self.scaffold.MPI.COMM_WORLD.size):
             self.pc.barrier()
             if node == self.pc_id:
                 print("Node", self.pc_id, "is writing")
-                with h5py.File(
-                    "results_" + self.name + "_" + timestamp + ".hdf5", "a"
-                ) as f:
-                    for path, data, meta in self.result.safe_collect():
-                        try:
-                            path = "/".join(path)
-                            if path in f:
-                                data = np.concatenate((f[path][()], data))
-                                del f[path]
-                            d = f.create_dataset(path, data=data)
-                            for k, v in meta.items():
-                                d.attrs[k] = v
-                        except Exception as e:
-                            if not isinstance(data, np.ndarray):
-                                warn(
-                                    "Recorder {} numpy.ndarray expected, got {}".format(
-                                        path, type(data)
-                                    )
-                                )
-                            else:
-                                warn(
-                                    "Recorder {} processing errored out: {}\n\n{}".format(
-                                        path,
-                                        "{} {}".format(data.dtype, data.shape),
-                                        traceback.format_exc(),
-                                    )
-                                )
+                with h5py.File(filename, "a") as f:
+                    _write_results(f, self.result.safe_collect())
             self.pc.barrier()
 
+    def _collect_gathered(self, filename):
+        import h5py
+
+        # Gather the results of all nodes on the main node in a single collective, so
+        # that only the main node writes.
+        comm = self.scaffold.MPI.COMM_WORLD
+        results = comm.gather(list(self.result.safe_collect()), root=0)
+        if self.pc_id == 0:
+            with h5py.File(filename, "a") as f:
+                for node_results in results:
+                    _write_results(f, node_results)
+        comm.barrier()
+
+    def _collect_shards(self, filename):
+        import h5py
+
+        # Each node writes its results to its own shard file, without waiting on other
+        # nodes. The main node then writes an index file of virtual datasets that
+        # combine the shards into the regular result layout.
+        comm = self.scaffold.MPI.COMM_WORLD
+        shard = _shard_filename(filename, self.pc_id)
+        f = self._stream_file or h5py.File(shard, "w")
+        self._stream_file = None
+        with f:
+            _write_results(f, self.result.safe_collect())
+            datasets = _list_datasets(f)
+        shards = comm.gather((shard, datasets), root=0)
+        if self.pc_id == 0:
+            with h5py.File(filename, "w") as f:
+                _write_virtual_index(f, shards)
+        comm.barrier()
+
     def create_transmitters(self):
         for connection_model in self.connection_models.values():
             self.create_connection_transmitters(connection_model)
@@ -422,28 +520,29 @@ class NeuronAdapter(SimulatorAdapter):
                     )
                 )
                 return
-            intersections = connectivity_set.intersections
-            transmitters = [
-                [i.from_id, i.from_compartment.section_id] for i in intersections
-            ]
-            if not transmitters:
+            (
+                from_ids,
+                _,
+                from_comps,
+                _,
+                from_morphos,
+                _,
+            ) = connectivity_set.get_intersection_arrays()
+            if not len(from_ids):
                 # Empty dataset
                 return
-            unique_transmitters = [tuple(a) for a in np.unique(transmitters, axis=0)]
-            transmitter_gids = list(
-                range(self._next_gid, self._next_gid + len(unique_transmitters))
-            )
-            self._next_gid += len(unique_transmitters)
-            partial_map = dict(zip(unique_transmitters, transmitter_gids))
-            self.transmitter_map.update(partial_map)
-
+            from_sections = connectivity_set.get_section_ids(from_comps, from_morphos)
+            # Every node enumerates all the unique transmitters so that they agree on
+            # their GIDs, but only creates the transmitters of its own cells.
+            transmitters = np.unique(np.column_stack((from_ids, from_sections)), axis=0)
+            gids = np.arange(self._next_gid, self._next_gid + len(transmitters))
+            self._next_gid += len(transmitters)
+            self.transmitter_map[connection_model.name] = (transmitters, gids[0])
+            local = self._is_node_cell(transmitters[:, 0])
             tcount = 0
-            for (cell_id, section_id), gid in partial_map.items():
-                cell_id = int(cell_id)
-                if not cell_id in self.node_cells:
-                    continue
-                cell = self.cells[cell_id]
-                cell.create_transmitter(cell.sections[int(section_id)], gid)
+            for (cell_id, section_id), gid in zip(transmitters[local], gids[local]):
+                cell = self.cells[int(cell_id)]
+                cell.create_transmitter(cell.sections[int(section_id)], int(gid))
                 tcount += 1
             report(
                 f"Node {self.pc_id} created {tcount} transmitters",
@@ -470,40 +569,63 @@ class NeuronAdapter(SimulatorAdapter):
                 # .get_locations() should offer some insights
             else:
                 synapse_types = connection_model.resolve_synapses()
-                for intersection in connectivity_set.intersections:
-                    if intersection.to_id in self.node_cells:
-                        cell = self.cells[int(intersection.to_id)]
-                        section_id = int(intersection.to_compartment.section_id)
-                        section = cell.sections[section_id]
-                        gid = self.transmitter_map[
-                            (
-                                intersection.from_id,
-                                intersection.from_compartment.section_id,
-                            )
-                        ]
-                        for synapse_type in synapse_types:
-                            try:
-                                cell.create_receiver(section, gid, synapse_type)
-                            except Exception as e:
-                                raise ScaffoldError(
-                                    "[" + connection_model.name + "] " + str(e)
-                                ) from None
+                (
+                    from_ids,
+                    to_ids,
+                    from_comps,
+                    to_comps,
+                    from_morphos,
+                    to_morphos,
+                ) = connectivity_set.get_intersection_arrays()
+                # Only handle the intersections that end on cells of this node.
+                local = self._is_node_cell(to_ids)
+                if not np.any(local):
+                    continue
+                from_sections = connectivity_set.get_section_ids(
+                    from_comps[local], from_morphos[local]
+                )
+                to_sections = connectivity_set.get_section_ids(
+                    to_comps[local], to_morphos[local]
+                )
+                transmitters, first_gid = self.transmitter_map[connection_model.name]
+                gids = first_gid + _find_rows(
+                    transmitters, np.column_stack((from_ids[local], from_sections))
+                )
+                for to_id, section_id, gid in zip(to_ids[local], to_sections, gids):
+                    cell = self.cells[int(to_id)]
+                    section = cell.sections[int(section_id)]
+                    for synapse_type in synapse_types:
+                        try:
+                            cell.create_receiver(section, int(gid), synapse_type)
+                        except Exception as e:
+                            raise ScaffoldError(
+                                "[" + connection_model.name + "] " + str(e)
+                            ) from None
+
+    def _is_node_cell(self, ids):
+        # Vectorized membership test of the round robin `node_cells` set.
+        return np.asarray(ids, dtype=int) % self.nhost == self.pc_id
 
     def create_neurons(self):
         for cell_model in self.cell_models.values():
-            cell_positions = None
-            if self.scaffold.configuration.get_cell_type(cell_model.name).entity:
-                cell_data = self.scaffold.get_entities_by_type(cell_model.name)
-                cell_data = np.column_stack((cell_data, np.zeros((len(cell_data), 4))))
-            else:
-                cell_data = self.scaffold.get_cells_by_type(cell_model.name)
-            report("Placing " + str(len(cell_data)) + " " + cell_model.name)
-            for cell in cell_data:
-                cell_id = int(cell[0])
-                if not cell_id in self.node_cells:
-                    continue
+            # Read only the cells that the load balance assigned to this node.
+            placement_set = self.scaffold.get_placement_set(cell_model.name)
+            cell_ids, cell_positions = placement_set.get_node_cells(
+                self.pc_id, self.nhost
+            )
+            if cell_positions is None:
+                cell_positions = np.zeros((len(cell_ids), 3))
+            report(
+                "Node {} placing {} {}".format(
+                    self.pc_id, len(cell_ids), cell_model.name
+                ),
+                level=3,
+                all_nodes=True,
+            )
+            for cell_id, position in zip(cell_ids, cell_positions):
+                cell_id = int(cell_id)
                 kwargs = cell_model.get_parameters()
-                kwargs["position"] = cell[2:5]
+                kwargs["position"] = position
                 if cell_model.entity or cell_model.relay:
                     kwargs["relay"] = cell_model.relay
                     instance = NeuronEntity.instantiate(**kwargs)
@@ -536,13 +658,8 @@ class NeuronAdapter(SimulatorAdapter):
 
     def create_devices(self):
         for device in self.devices.values():
-            if self.pc_id == 0:
-                # Have root 0 prepare the possibly random targets.
-                targets = device.get_targets()
-            else:
-                targets = None
-            # Broadcast to make sure all the nodes have the same targets for each device.
-            targets = self.scaffold.MPI.COMM_WORLD.bcast(targets, root=0)
+            # Every node selected the same targets in `initialise_targets`.
+            targets = device.get_targets()
             for target in targets:
                 for location in device.get_locations(target):
                     device.implement(target, location)
@@ -675,6 +792,8 @@ class NeuronAdapter(SimulatorAdapter):
 
 
 class LocationRecorder(SimulationRecorder):
+    stream_axis = 0
+
     def __init__(
         self, group, cell, recorder, time_recorder=None, section=None, x=None, meta=None
     ):
@@ -690,6 +809,10 @@ class LocationRecorder(SimulationRecorder):
         self.meta = meta
         self.recorder = recorder
         self.time_recorder = time_recorder
+        if time_recorder:
+            # The recording and time vector are stacked end to end, which can't be
+            # extended in chunks.
+            self.stream_axis = None
         self.section = section
         self.x = x
         # Compose the tag: `cell.section_name(x)`
@@ -712,6 +835,12 @@ class LocationRecorder(SimulationRecorder):
     def get_meta(self):
         return self.meta
 
+    def get_buffer_size(self):
+        return len(self.recorder) * 8
+
+    def clear(self):
+        self.recorder.resize(0)
+
 
 class TargetLocation:
     def __init__(self, cell, section, connection=None):
@@ -724,6 +853,108 @@ class TargetLocation:
 
 
 class SpikeRecorder(LocationRecorder):
+    stream_axis = 1
+
+    def get_buffer_size(self):
+        # The recorded times and the cell id row.
+        return len(self.recorder) * 16
+
     def get_data(self):
         recording = np.array(self.recorder)
         return np.vstack((np.ones(recording.shape) * self.id, recording))
+
+
+def _find_rows(sorted_rows, rows):
+    # Find the index of each row of `rows` in the lexicographically sorted 2 column
+    # array `sorted_rows`, as returned by `np.unique(..., axis=0)`.
+    width = max(np.max(sorted_rows[:, 1]), np.max(rows[:, 1], initial=0)) + 1
+    keys = sorted_rows[:, 0] * width + sorted_rows[:, 1]
+    return np.searchsorted(keys, rows[:, 0] * width + rows[:, 1])
+
+
+def _write_results(f, results):
+    # Write the `(path, data, meta)` tuples of a `SimulationResult` to an HDF5 file.
+    # Data for a path that already exists is appended to it, in place if the dataset
+    # is extendable, as created by streaming recorders.
+    for path, data, meta in results:
+        try:
+            path = "/".join(path)
+            if path in f and None in f[path].maxshape:
+                axis = f[path].maxshape.index(None)
+                d = append_dataset(f, path, data, axis)
+            else:
+                if path in f:
+                    data = np.concatenate((f[path][()], data))
+                    del f[path]
+                d = f.create_dataset(path, data=data)
+            for k, v in meta.items():
+                d.attrs[k] = v
+        except Exception as e:
+            if not isinstance(data, np.ndarray):
+                warn(
+                    "Recorder {} numpy.ndarray expected, got {}".format(path, type(data))
+                )
+            else:
+                warn(
+                    "Recorder {} processing errored out: {}\n\n{}".format(
+                        path,
+                        "{} {}".format(data.dtype, data.shape),
+                        traceback.format_exc(),
+                    )
+                )
+
+
+def _shard_filename(filename, node):
+    root, ext = os.path.splitext(filename)
+    return "{}.rank{}{}".format(root, node, ext)
+
+
+def _list_datasets(f):
+    # List the path, shape, dtype and attributes of every dataset in an HDF5 file.
+    import h5py
+
+    datasets = []
+
+    def visit(name, obj):
+        if isinstance(obj, h5py.Dataset):
+            datasets.append((name, obj.shape, obj.dtype, dict(obj.attrs)))
+
+    f.visititems(visit)
+    return datasets
+
+
+def _write_virtual_index(f, shards):
+    """
+    Write virtual datasets that concatenate the datasets of each shard along the first
+    axis, in node order. Shard files are referred to by their name relative to the
+    index file so that results can be moved as a whole.
+
+    :param f: The index file.
+    :type f: :class:`h5py.File`
+    :param shards: The filename and :func:`_list_datasets` of each shard.
+    :type shards: list
+    """
+    import h5py
+
+    sources = {}
+    for shard, datasets in shards:
+        for path, shape, dtype, meta in datasets:
+            sources.setdefault(path, []).append((shard, shape, dtype, meta))
+    for path, parts in sources.items():
+        shape, dtype = parts[0][1], parts[0][2]
+        if any(not len(p[1]) or p[1][1:] != shape[1:] or p[2] != dtype for p in parts):
+            warn(
+                "Recorder {} shards have mismatching shapes or types and can't be"
+                " combined.".format(path)
+            )
+            continue
+        length = sum(p[1][0] for p in parts)
+        layout = h5py.VirtualLayout(shape=(length,) + shape[1:], dtype=dtype)
+        offset = 0
+        for shard, shape, _, _ in parts:
+            source = h5py.VirtualSource(os.path.basename(shard), path, shape=shape)
+            layout[offset : offset + shape[0]] = source
+            offset += shape[0]
+        d = f.create_virtual_dataset(path, layout)
+        for k, v in parts[-1][3].items():
+            d.attrs[k] = v
@@ -1,7 +1,7 @@
 from ..adapter import NeuronDevice
 from ....simulation.results import SimulationRecorder, PresetPathMixin, PresetMetaMixin
 from ....helpers import listify_input
-from ....functions import poisson_train
+from ....functions import poisson_trains
 from ....reporting import report, warn
 import numpy as np
 
@@ -48,13 +48,21 @@ class SpikeGenerator(NeuronDevice):
         number = int(self.parameters["number"])
         start = float(self.parameters["start"])
         noise = "noise" in self.parameters and self.parameters["noise"]
-        if not noise:
+        targets = self.get_targets()
+        if noise:
+            # Draw the trains of all targets at once.
+            times, offsets = poisson_trains(
+                1.0 / interval,
+                interval * number,
+                len(targets),
+                start,
+                random_state=self.get_random_state("patterns"),
+            )
+        else:
             pattern = [start + i * interval for i in range(number)]
-        for target in self.get_targets():
-            frequency = 1.0 / interval
-            duration = interval * number
+        for i, target in enumerate(targets):
             if noise:
-                pattern = list(poisson_train(frequency, duration, start))
+                pattern = times[offsets[i] : offsets[i + 1]]
             patterns[target] = pattern
             if self.record:
                 self.adapter.result.add(GeneratorRecorder(self, target, pattern))
@@ -31,6 +31,8 @@ class SynapseRecorder(PatternlessDevice, NeuronDevice):
 
 
 class _SynapticRecorder(PresetPathMixin, PresetMetaMixin, SimulationRecorder):
+    stream_axis = 0
+
     def __init_subclass__(cls, record=None, slug=None, **kwargs):
         super().__init_subclass__(**kwargs)
         cls._record = record
@@ -64,6 +66,13 @@ class _SynapticRecorder(PresetPathMixin, PresetMetaMixin, SimulationRecorder):
             signal.extend(v)
         return np.array(signal)
 
+    def get_buffer_size(self):
+        return sum(len(v) for v in self.vectors) * 8
+
+    def clear(self):
+        for v in self.vectors:
+            v.resize(0)
+
 
 def _record_i(self, point_process):
     from patch import p
@@ -0,0 +1,53 @@
+"""
+Benchmark the file size and read time of the default and the compact output schema
+on a 200 by 200 test network. Run with `python compact_output.py`.
+"""
+
+import os, sys
+import numpy as np
+from time import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from bsb.core import Scaffold, from_hdf5
+from bsb.config import JSONConfig
+from bsb.reporting import set_verbosity
+
+config_file = os.path.join(
+    os.path.dirname(__file__), "..", "configs", "legacy_mouse_cerebellum.json"
+)
+schemas = {
+    "default": {"compact": False},
+    "compact": {"compact": True, "coordinate_dtype": "float32"},
+}
+repeats = 10
+
+set_verbosity(0)
+for schema, options in schemas.items():
+    np.random.seed(0)
+    config = JSONConfig(config_file)
+    config.resize(200, 200)
+    config.output_formatter.file = "_{}_network.hdf5".format(schema)
+    config.output_formatter.__dict__.update(options)
+    Scaffold(config).compile_network()
+    scaffold = from_hdf5(config.output_formatter.file)
+    formatter = scaffold.output_formatter
+    t = time()
+    for _ in range(repeats):
+        for cell_type in scaffold.get_cell_types(entities=False):
+            formatter.get_cells_of_type(cell_type.name)
+    cell_time = (time() - t) / repeats
+    t = time()
+    for _ in range(repeats):
+        for tag in scaffold.cell_connections_by_tag:
+            scaffold.get_connectivity_set(tag).get_dataset()
+    connection_time = (time() - t) / repeats
+    print(
+        "{}: {:.2f}MiB, {:.1f}ms to read the cells, {:.1f}ms to read the connections".format(
+            schema,
+            os.path.getsize(formatter.file) / 2 ** 20,
+            cell_time * 1000,
+            connection_time * 1000,
+        )
+    )
+    os.remove(formatter.file)
@@ -0,0 +1,95 @@
+"""
+Benchmark the wall time of a NEURON simulation for different `progress_interval`
+values, i.e. the amount of ms integrated between progress reports and interrupt
+polls. The network consists of single compartment Hodgkin-Huxley cells driven by a
+current clamp, so that only NEURON is needed. Run with
+`python neuron_stepping.py [cells_per_type]` or under `mpiexec` for a parallel run.
+"""
+
+import os, sys, json, gc
+from time import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from bsb.core import Scaffold, from_hdf5
+from bsb.config import JSONConfig
+from bsb.reporting import set_verbosity
+
+config_file = os.path.join(
+    os.path.dirname(__file__), "..", "configs", "test_double_neuron_network.json"
+)
+intervals = [1.0, 10.0, 100.0]
+duration = 1000.0
+# Amount of cells per cell type, can be given as the first argument.
+cells_per_type = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+repeats = 3
+
+
+class HHCell:
+    """
+    Single compartment Hodgkin-Huxley cell that fires regularly.
+    """
+
+    def __init__(self, position=None, **kwargs):
+        from patch import p
+
+        self.position = position
+        self.soma = [p.Section()]
+        self.soma[0].insert("hh")
+        self.clamp = p.IClamp(0.5, sec=self.soma[0])
+        self.clamp.delay = 0
+        self.clamp.dur = duration
+        self.clamp.amp = 0.1
+
+    def set_reference_id(self, id):
+        self.ref_id = id
+
+
+with open(config_file) as f:
+    tree = json.load(f)
+tree["output"]["file"] = "_neuron_stepping.hdf5"
+for cell_type in tree["cell_types"].values():
+    cell_type["placement"]["count"] = cells_per_type
+cell_model = {"model": "__main__.HHCell", "record_spikes": True}
+tree["simulations"] = {
+    "stepping": {
+        "simulator": "neuron",
+        "duration": duration,
+        "temperature": 32,
+        "resolution": 0.025,
+        "cell_models": {"from_cell": cell_model, "to_cell": cell_model},
+        "connection_models": {},
+        "devices": {},
+    }
+}
+
+set_verbosity(0)
+scaffold = Scaffold(JSONConfig(stream=json.dumps(tree)))
+# Compile the network once, all processes then load it.
+if scaffold.is_mpi_master:
+    scaffold.compile_network()
+if scaffold.has_mpi_installed:
+    scaffold.MPI.COMM_WORLD.barrier()
+timings = {interval: [] for interval in intervals}
+for _ in range(repeats):
+    for interval in intervals:
+        # Reload the network so that each run starts from a fresh adapter.
+        scaffold = from_hdf5(scaffold.output_formatter.file)
+        # Free the cells of the previous run, NEURON would simulate them too.
+        simulation = simulator = None
+        gc.collect()
+        simulation = scaffold.get_simulation("stepping")
+        simulation.progress_interval = interval
+        simulator = simulation.prepare()
+        t = time()
+        simulation.simulate(simulator)
+        timings[interval].append(time() - t)
+
+if simulation.pc_id == 0:
+    for interval, wall_times in timings.items():
+        print(
+            "{}ms stepping: {:.3f}s wall time (best of {})".format(
+                interval, min(wall_times), repeats
+            )
+        )
+    os.remove(scaffold.output_formatter.file)
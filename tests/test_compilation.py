@@ -1,10 +1,17 @@
-import unittest, os, sys, numpy as np, h5py
+import unittest, os, sys, random, numpy as np, h5py
+from scipy.spatial import distance
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 from bsb.core import Scaffold, from_hdf5
 from bsb.config import JSONConfig
 from bsb.models import Layer, CellType
-from bsb.placement import Satellite
+from bsb.placement import Satellite, ParallelArrayPlacement
+from bsb.exceptions import ConfigurationError, PlacementWarning
+from bsb.connectivity.scheduler import get_dependency_levels, ConnectivityScheduler
+from bsb.placement.scheduler import PlacementScheduler
+from bsb.placement.randomwalk import SpatialHash
+from bsb.particles import ArrayParticleSystem
+from sklearn.neighbors import KDTree
 from test_setup import get_test_network
 
 
@@ -13,6 +20,11 @@ def relative_to_tests_folder(path):
 
 
 single_neuron_config = relative_to_tests_folder("configs/test_single_neuron.json")
+double_neuron_config = relative_to_tests_folder("configs/test_double_neuron_network.json")
+legacy_config = relative_to_tests_folder("configs/legacy_mouse_cerebellum.json")
+heterosyn_config = relative_to_tests_folder(
+    "configs/test_double_neuron_network_heterosyn.json"
+)
 
 
 class TestSingleTypeCompilation(unittest.TestCase):
@@ -49,6 +61,487 @@ class TestSingleTypeCompilation(unittest.TestCase):
         self.assertEqual(scaffold_copy.get_cell_total(), 4)
         self.assertRaises(OSError, from_hdf5, "doesntexist")
 
+    def test_cells_of_type(self):
+        formatter = self.scaffold.output_formatter
+        with h5py.File(formatter.file, "r") as f:
+            type_map = f["cells/type_maps/test_cell_map"]
+            self.assertEqual([0, 4], list(type_map.attrs["range"]))
+            expected = f["cells/positions"][()][type_map[()]]
+        cells = formatter.get_cells_of_type("test_cell")
+        self.assertTrue(np.array_equal(expected, cells))
+
+
+class TestIncrementalOutput(unittest.TestCase):
+    """
+    Check that compiled networks are updated in place.
+    """
+
+    @classmethod
+    def setUpClass(self):
+        super(TestIncrementalOutput, self).setUpClass()
+        config = JSONConfig(file=double_neuron_config)
+        self.scaffold = Scaffold(config)
+        self.scaffold.compile_network()
+        self.file = self.scaffold.output_formatter.file
+
+    def test_compile_connectivity(self):
+        with h5py.File(self.file, "a") as f:
+            f["morphologies"].attrs["marker"] = 1
+            positions = f["cells/positions"][()]
+        self.scaffold.compile_connectivity()
+        self.assertFalse(os.path.exists("__backup__.hdf5"))
+        with h5py.File(self.file, "r") as f:
+            # The morphologies and placement should not have been rewritten.
+            self.assertEqual(1, f["morphologies"].attrs["marker"])
+            self.assertTrue(np.array_equal(positions, f["cells/positions"][()]))
+            connections = f["cells/connections/from_cell_to_cell"]
+            self.assertEqual((16, 2), connections.shape)
+            self.assertEqual("from_cell_to_cell", connections.attrs["tag"])
+
+    def test_save_as(self):
+        formatter = self.scaffold.output_formatter
+        with h5py.File(self.file, "a") as f:
+            f["morphologies"].attrs["marker"] = 2
+        formatter.save_file_as = "_test_save_as.hdf5"
+        try:
+            self.scaffold.compile_output(placement=False)
+            with h5py.File("_test_save_as.hdf5", "r") as f:
+                # The morphologies should be copied from the previous file.
+                self.assertEqual(2, f["morphologies"].attrs["marker"])
+                self.assertEqual(8, len(f["cells/positions"]))
+        finally:
+            formatter.file = self.file
+            formatter.save_file_as = None
+            os.remove("_test_save_as.hdf5")
+
+
+class TestSpill(unittest.TestCase):
+    """
+    Check that spilling the network to the output file during compilation produces the
+    same network as keeping it in memory.
+    """
+
+    def compile(self, spill):
+        np.random.seed(0)
+        config = JSONConfig(file=double_neuron_config)
+        config.output_formatter.file = "_test_spill_{}.hdf5".format(int(spill))
+        config.output_formatter.spill = spill
+        scaffold = Scaffold(config)
+        scaffold.compile_network()
+        self.addCleanup(os.remove, config.output_formatter.file)
+        return scaffold
+
+    def test_spill(self):
+        in_memory = self.compile(False)
+        spilled = self.compile(True)
+        self.assertTrue(spilled.spilling)
+        self.assertTrue(np.array_equal(in_memory.cells, spilled.cells))
+        self.assertTrue(
+            np.array_equal(in_memory.get_cells([3, 1]), spilled.get_cells([3, 1]))
+        )
+        self.assertTrue(
+            np.array_equal(in_memory.get_cell_position(5), spilled.get_cell_position(5))
+        )
+        for name in ("from_cell", "to_cell"):
+            self.assertTrue(
+                np.array_equal(
+                    in_memory.cells_by_type[name], spilled.get_cells_by_type(name)
+                )
+            )
+        paths = [
+            "cells/positions",
+            "cells/type_maps/to_cell_map",
+            "cells/placement/to_cell/identifiers",
+            "cells/placement/to_cell/positions",
+            "cells/connections/from_cell_to_cell",
+        ]
+        with h5py.File(in_memory.output_formatter.file, "r") as f:
+            with h5py.File(spilled.output_formatter.file, "r") as g:
+                for path in paths:
+                    self.assertTrue(np.array_equal(f[path][()], g[path][()]), path)
+                self.assertEqual(
+                    list(f["cells/type_maps/to_cell_map"].attrs["range"]),
+                    list(g["cells/type_maps/to_cell_map"].attrs["range"]),
+                )
+                connections = g["cells/connections/from_cell_to_cell"]
+                self.assertEqual(
+                    ["from_cell_to_cell"], list(connections.attrs["connection_types"])
+                )
+
+    def test_spill_layers(self):
+        # The random walk avoids the cells placed earlier in the same layer.
+        placed = []
+        for spill in (False, True):
+            np.random.seed(0)
+            random.seed(0)
+            config = JSONConfig(file=legacy_config)
+            config.resize(100, 100)
+            config.output_formatter.file = "_test_spill_layers_{}.hdf5".format(int(spill))
+            scaffold = Scaffold(config)
+            if spill:
+                scaffold.start_spill()
+                self.addCleanup(os.remove, config.output_formatter.file)
+            scaffold.place_cell_types()
+            placed.append(scaffold)
+        in_memory, spilled = placed
+        self.assertTrue(np.array_equal(in_memory.cells, spilled.cells))
+        for name in ("granular_layer", "purkinje_layer"):
+            self.assertTrue(
+                np.array_equal(
+                    in_memory.cells_by_layer[name], spilled.cells_by_layer[name]
+                ),
+                name,
+            )
+        self.assertTrue(
+            np.array_equal(
+                in_memory.get_cell_positions(slice(10, None, 7)),
+                spilled.get_cell_positions(slice(10, None, 7)),
+            )
+        )
+
+
+class TestCompactOutput(unittest.TestCase):
+    """
+    Check that the compact schema is read back as the default schema.
+    """
+
+    def compile(self, compact):
+        np.random.seed(0)
+        config = JSONConfig(file=double_neuron_config)
+        config.output_formatter.file = "_test_compact_{}.hdf5".format(int(compact))
+        config.output_formatter.compact = compact
+        config.output_formatter.coordinate_dtype = "float32"
+        scaffold = Scaffold(config)
+        scaffold.compile_network()
+        self.addCleanup(os.remove, config.output_formatter.file)
+        return from_hdf5(config.output_formatter.file)
+
+    def test_compact(self):
+        default = self.compile(False)
+        compact = self.compile(True)
+        with h5py.File(compact.output_formatter.file, "r") as f:
+            self.assertEqual(np.float32, f["cells/positions"].dtype)
+            self.assertEqual(np.int32, f["cells/identifiers"].dtype)
+            self.assertEqual(np.uint8, f["cells/types"].dtype)
+            self.assertEqual(np.int32, f["cells/connections/from_cell_to_cell"].dtype)
+        for name in ("from_cell", "to_cell"):
+            cells = compact.get_cells_by_type(name)
+            self.assertEqual(np.float64, cells.dtype)
+            self.assertTrue(np.allclose(default.get_cells_by_type(name), cells))
+        default_set = default.get_connectivity_set("from_cell_to_cell")
+        compact_set = compact.get_connectivity_set("from_cell_to_cell")
+        self.assertTrue(
+            np.array_equal(default_set.from_identifiers, compact_set.from_identifiers)
+        )
+        self.assertTrue(
+            np.array_equal(default_set.to_identifiers, compact_set.to_identifiers)
+        )
+
+    def test_recompile(self):
+        # Recompile a compact file in place, first with the compact schema and then
+        # with the default schema, which has no separate identifiers and types.
+        file = self.compile(True).output_formatter.file
+        for compact in (True, False):
+            config = JSONConfig(file=double_neuron_config)
+            config.output_formatter.file = file
+            config.output_formatter.compact = compact
+            scaffold = Scaffold(config)
+            scaffold.compile_network()
+        default = from_hdf5(file)
+        with h5py.File(file, "r") as f:
+            self.assertNotIn("identifiers", f["cells"])
+            self.assertNotIn("types", f["cells"])
+            self.assertEqual((8, 5), f["cells/positions"].shape)
+        for name in ("from_cell", "to_cell"):
+            self.assertTrue(
+                np.array_equal(
+                    scaffold.cells_by_type[name], default.get_cells_by_type(name)
+                )
+            )
+
+    def test_coordinate_dtype(self):
+        config = JSONConfig(file=double_neuron_config)
+        config.output_formatter.coordinate_dtype = "int8"
+        self.assertRaises(ConfigurationError, Scaffold, config)
+
+
+class TestParallelConnectivity(unittest.TestCase):
+    """
+    Check that connection types run in parallel make the same connections as when
+    they are run sequentially.
+    """
+
+    def test_dependency_levels(self):
+        config = JSONConfig(
+            file=relative_to_tests_folder("configs/test_nrn_mf_granule.json")
+        )
+        levels = get_dependency_levels(config.connection_types)
+        self.assertEqual(
+            [["mossy_to_glomerulus"], ["glomerulus_to_granule"]],
+            [[ct.name for ct in level] for level in levels],
+        )
+
+    def test_parallel(self):
+        config = JSONConfig(file=heterosyn_config)
+        scaffold = Scaffold(config)
+        scaffold.place_cell_types()
+        scaffold.connect_cell_types(seed=1)
+        sequential = scaffold.cell_connections_by_tag
+        scaffold._reset_connectivity_cache()
+        scaffold.connect_cell_types(parallel=True, seed=1)
+        parallel = scaffold.cell_connections_by_tag
+        self.assertEqual(list(sequential.keys()), list(parallel.keys()))
+        for tag, connections in sequential.items():
+            self.assertTrue(np.array_equal(connections, parallel[tag]), tag)
+
+    def test_record(self):
+        # A recorded connection type shouldn't leave its connections in the network
+        # cache, where the next connection type recorded by the process could see them.
+        config = JSONConfig(file=heterosyn_config)
+        scaffold = Scaffold(config)
+        scaffold.place_cell_types()
+        scheduler = ConnectivityScheduler(scaffold, seed=1)
+        for connection_type in config.connection_types.values():
+            self.assertGreater(len(scheduler.record(connection_type)), 0)
+            for tag, connections in scaffold.cell_connections_by_tag.items():
+                self.assertEqual(0, len(connections), tag)
+
+
+class TestTiledPlacement(unittest.TestCase):
+    """
+    Check that tiled placement is reproducible and stitches the tiles together without
+    collisions.
+    """
+
+    def config(self):
+        config = JSONConfig(file=double_neuron_config)
+        # Enough cells for 4 tiles.
+        for cell_type in config.cell_types.values():
+            cell_type.placement.count = 40
+        return config
+
+    def place(self):
+        scaffold = Scaffold(self.config())
+        scaffold.place_cell_types(parallel=True, seed=1, tile_size=75)
+        return scaffold
+
+    def test_tiled_placement(self):
+        first, second = self.place(), self.place()
+        for name in ("from_cell", "to_cell"):
+            self.assertEqual(40, len(first.cells_by_type[name]))
+            self.assertTrue(
+                np.array_equal(first.cells_by_type[name], second.cells_by_type[name])
+            )
+        self.assertTrue(np.array_equal(np.arange(80), first.cells[:, 0]))
+
+    def test_small_count(self):
+        scaffold = Scaffold(JSONConfig(file=double_neuron_config))
+        cell_type = scaffold.configuration.cell_types["from_cell"]
+        scheduler = PlacementScheduler(scaffold, tile_size=75)
+        self.assertEqual([], scheduler.get_tiles(cell_type))
+
+    def test_place_tile(self):
+        scaffold = Scaffold(self.config())
+        cell_type = scaffold.configuration.cell_types["from_cell"]
+        scheduler = PlacementScheduler(scaffold, seed=1, tile_size=75)
+        tile = scheduler.get_tiles(cell_type)[3]
+        positions = scheduler.place_tile(cell_type, tile, 10)
+        # Only the cells within the tile are kept, with a surplus for the stitching.
+        self.assertTrue(np.all(tile.get_owned(positions)))
+        self.assertGreaterEqual(len(positions), 10)
+
+    def test_stitch(self):
+        scaffold = Scaffold(self.config())
+        cell_type = scaffold.configuration.cell_types["from_cell"]
+        scheduler = PlacementScheduler(scaffold, tile_size=75)
+        tiles = scheduler.get_tiles(cell_type)
+        self.assertEqual(4, len(tiles))
+        # The first and third tile share the edge at x = 75.
+        self.assertEqual(75, tiles[0].bounds[1, 0])
+        self.assertEqual(75, tiles[2].bounds[0, 0])
+        placed = {
+            # A colliding pair inside of the tile, and a cell on the edge.
+            0: np.array([[20.0, 10.0, 20.0], [22.0, 10.0, 20.0], [74.0, 10.0, 20.0]]),
+            # A cell colliding with the cell on the edge, and one that doesn't.
+            2: np.array([[76.0, 10.0, 20.0], [76.0, 10.0, 30.0]]),
+        }
+        positions = scheduler.stitch(cell_type, tiles, placed)
+        self.assertEqual([20, 22, 74, 76], positions[:, 0].tolist())
+        self.assertEqual(30, positions[3, 2])
+        # The surplus of each tile is removed after the colliding cells.
+        positions = scheduler.stitch(cell_type, tiles, placed, {0: 2, 2: 1})
+        self.assertEqual(2, np.count_nonzero(positions[:, 0] < 75))
+        self.assertEqual([[76.0, 10.0, 30.0]], positions[positions[:, 0] > 75].tolist())
+
+    def test_sequential_counts(self):
+        # Tiled placement should place about as many cells as sequential placement,
+        # without any more overlapping cells.
+        placed = []
+        for parallel in (False, True):
+            np.random.seed(3)
+            random.seed(3)
+            config = JSONConfig(file=legacy_config)
+            config.resize(100, 100)
+            scaffold = Scaffold(config)
+            scaffold.place_cell_types(parallel=parallel, seed=3, tile_size=50)
+            placed.append(scaffold)
+        sequential, tiled = placed
+
+        def overlaps(scaffold, cell_type):
+            cells = scaffold.cells_by_type[cell_type.name][:, 2:5]
+            if not len(cells):
+                return 0
+            pairs = KDTree(cells).query_radius(cells, r=2 * cell_type.placement.radius)
+            return sum(map(len, pairs)) - len(cells)
+
+        for cell_type in sequential.get_cell_types(entities=False):
+            name = cell_type.name
+            count = len(sequential.cells_by_type[name])
+            self.assertAlmostEqual(
+                count,
+                len(tiled.cells_by_type[name]),
+                delta=max(3, 0.05 * count),
+                msg=name,
+            )
+            if cell_type.placement.tileable:
+                self.assertLessEqual(
+                    overlaps(tiled, cell_type), overlaps(sequential, cell_type), name
+                )
+
+
+class TestSpatialHash(unittest.TestCase):
+    """
+    Check that the spatial hash of the random walk finds the same isolated points as
+    comparing against all points.
+    """
+
+    def test_isolated(self):
+        rng = np.random.RandomState(0)
+        points = rng.uniform(0, 100, (500, 3))
+        candidates = rng.uniform(0, 100, (200, 3))
+        hash = SpatialHash(5, capacity=1)
+        # Add the points in batches, to grow the buffer.
+        for batch in np.array_split(points, 7):
+            hash.add(batch)
+        self.assertEqual(500, hash.count)
+        self.assertTrue(np.array_equal(points, hash.points))
+        distances = distance.cdist(candidates, points)
+        expected = np.all(distances > 5, axis=1)
+        self.assertTrue(np.array_equal(expected, hash.isolated(candidates, 5)))
+        per_point = rng.uniform(0, 5, 500)
+        expected = np.all(distances > per_point, axis=1)
+        self.assertTrue(np.array_equal(expected, hash.isolated(candidates, per_point)))
+
+    def test_empty(self):
+        hash = SpatialHash(0, dimensions=2)
+        self.assertTrue(np.all(hash.isolated(np.zeros((3, 2)), 1)))
+        self.assertEqual(0, len(hash.isolated(np.empty((0, 2)), 1)))
+
+
+class TestLayeredRandomWalk(unittest.TestCase):
+    """
+    Check that the random walk places the same cells wherever its layer is, and that
+    they don't overlap.
+    """
+
+    def place(self, shift=0):
+        np.random.seed(0)
+        random.seed(0)
+        config = JSONConfig(file=legacy_config)
+        config.resize(50, 50)
+        scaffold = Scaffold(config)
+        cell_type = scaffold.configuration.cell_types["granule_cell"]
+        cell_type.placement.layer_instance.origin[0] += shift
+        scaffold.place_cell_type(cell_type)
+        positions = scaffold.cells_by_type["granule_cell"][:, 2:5]
+        positions[:, 0] -= shift
+        return positions, cell_type.placement.radius
+
+    def test_translation(self):
+        positions, _ = self.place()
+        shifted, _ = self.place(shift=1000)
+        self.assertEqual(len(positions), len(shifted))
+        self.assertTrue(np.allclose(positions, shifted))
+
+    def test_overlap(self):
+        positions, radius = self.place()
+        self.assertTrue(np.all(distance.pdist(positions) > 2 * radius))
+
+
+class TestArrayParticleSystem(unittest.TestCase):
+    """
+    Check that the array particle system untangles and prunes its particles.
+    """
+
+    def test_solve_collisions(self):
+        np.random.seed(0)
+        system = ArrayParticleSystem()
+        particles = [{"name": "a", "voxels": [0], "radius": 2.5, "count": 2000}]
+        system.fill([[np.zeros(3), np.full(3, 60.0)]], particles)
+        self.assertGreater(len(system.find_colliding_pairs()[0]), 0)
+        self.assertEqual(0, system.solve_collisions())
+        self.assertEqual(0, len(system.find_colliding_pairs()[0]))
+        # Only displaced particles can be out of bounds.
+        inside = np.all((system.positions >= 0) & (system.positions <= 60), axis=1)
+        self.assertTrue(np.all(system.displaced[~inside]))
+        total, per_type = system.prune()
+        self.assertEqual(np.count_nonzero(~inside), total)
+        self.assertEqual({"a": total} if total else {}, per_type)
+        self.assertEqual(2000 - total, len(system.positions))
+        self.assertEqual(len(system.positions), len(system.radii))
+
+    def test_voxels(self):
+        config = JSONConfig(file=double_neuron_config)
+        config.cell_types["from_cell"].placement.voxel_size = 50
+        scaffold = Scaffold(config)
+        voxels, counts = scaffold.configuration.cell_types[
+            "from_cell"
+        ].placement.get_voxels(np.zeros(3), np.array([150.0, 600.0, 150.0]), 13)
+        self.assertEqual(9, len(voxels))
+        self.assertEqual(13, np.sum(counts))
+        self.assertTrue(np.all(counts >= 1))
+        scaffold.place_cell_types()
+        self.assertEqual(4, len(scaffold.cells_by_type["from_cell"]))
+
+    def test_too_dense(self):
+        # At 0.008 cells per µm³ not all collisions are untangled.
+        np.random.seed(0)
+        config = JSONConfig(file=double_neuron_config)
+        config.cell_types["from_cell"].placement.count = 10800
+        scaffold = Scaffold(config)
+        scaffold.configuration.layers["test_layer"].dimensions[1] = 60
+        with self.assertWarns(PlacementWarning):
+            scaffold.place_cell_type(scaffold.configuration.cell_types["from_cell"])
+
+
+class TestParallelArrayPlacement(unittest.TestCase):
+    """
+    Check that the lattice of parallel arrays fills the layer and is seeded per layer.
+    """
+
+    def setUp(self):
+        self.placement = ParallelArrayPlacement(None)
+        self.placement.radius = 7.5
+        self.placement.extension_x = 130.0
+        self.placement.extension_z = 3.5
+        self.placement.angle = np.radians(70)
+        self.placement.seed = 1
+
+    def test_lattice(self):
+        layer = Layer("purkinje_layer", [100, 50, 100], [1000, 30, 800])
+        random = self.placement.get_random(layer)
+        cells = self.placement.get_lattice(layer, 1360, random)
+        self.assertAlmostEqual(1360, len(cells), delta=20)
+        self.assertTrue(np.all(cells >= layer.origin))
+        self.assertTrue(np.all(cells <= layer.origin + layer.dimensions))
+        # The same seed should give the same lattice in the same layer only.
+        same = self.placement.get_lattice(layer, 1360, self.placement.get_random(layer))
+        self.assertTrue(np.array_equal(cells, same))
+        other_layer = Layer("other_layer", layer.origin, layer.dimensions)
+        other = self.placement.get_random(other_layer)
+        other = self.placement.get_lattice(other_layer, 1360, other)
+        self.assertFalse(np.array_equal(cells, other))
+
 
 _using_morphologies = True
 
@@ -0,0 +1,119 @@
+import unittest, os, sys, numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from bsb.connectivity.connectome.granule_golgi import ConnectomeGranuleGolgiBulk
+from bsb.connectivity.connectome.gap_junctions import (
+    ConnectomeGapJunctionsGolgi,
+    ConnectomeGapJunctionsGolgiTree,
+    ConnectomeGapJunctionsTree,
+)
+
+
+def _random_cells(n, type_id, first_id=0, size=200.0):
+    cells = np.zeros((n, 5))
+    cells[:, 0] = np.arange(first_id, first_id + n)
+    cells[:, 1] = type_id
+    cells[:, 2:] = np.random.rand(n, 3) * size
+    return cells
+
+
+class TestGranuleGolgiBulk(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        super(TestGranuleGolgiBulk, self).setUpClass()
+        np.random.seed(42)
+        self.granules = _random_cells(20000, 0)
+        self.golgis = _random_cells(40, 1, first_id=20000)
+        self.radius = 50.0
+        self.strategy = ConnectomeGranuleGolgiBulk()
+        self.strategy.aa_convergence = 100
+        self.strategy.pf_convergence = 300
+
+    def test_ascending_axons(self):
+        pre, post = self.strategy._sample_ascending_axons(
+            self.granules, self.golgis, self.radius
+        )
+        self.assertEqual(len(np.unique(pre)), len(pre), "AA contacts 1 golgi at most")
+        self.assertLessEqual(np.max(np.bincount(post)), self.strategy.aa_convergence)
+        delta = self.granules[pre][:, [2, 4]] - self.golgis[post][:, [2, 4]]
+        self.assertTrue(np.all(np.sum(delta ** 2, axis=1) <= self.radius ** 2))
+
+    def test_parallel_fibers(self):
+        s = self.strategy
+        aa_pre, aa_post = s._sample_ascending_axons(self.granules, self.golgis, 50.0)
+        aa_count = np.bincount(aa_post, minlength=len(self.golgis))
+        wanted = s.aa_convergence + s.pf_convergence - aa_count
+        pre, post = s._sample_parallel_fibers(
+            self.granules, self.golgis, self.radius, aa_pre, aa_post, wanted
+        )
+        pairs = post * len(self.granules) + pre
+        self.assertEqual(len(np.unique(pairs)), len(pairs), "Duplicate PF contacts")
+        aa_pairs = aa_post * len(self.granules) + aa_pre
+        self.assertFalse(np.any(np.isin(pairs, aa_pairs)), "PF reused own AA")
+        dx = np.abs(self.granules[pre, 2] - self.golgis[post, 2])
+        self.assertTrue(np.all(dx <= self.radius))
+        self.assertTrue(
+            np.all(np.bincount(post, minlength=len(self.golgis)) == wanted),
+            "Convergence not reached despite sufficient granule density",
+        )
+
+
+class _ConnectionRecorder:
+    """
+    Minimal scaffold stand-in that records the connections made by a strategy.
+    """
+
+    def __init__(self, cells_by_type):
+        self.cells_by_type = cells_by_type
+        self.connections = None
+
+    def connect_cells(self, strategy, connections, tag=None):
+        self.connections = connections
+
+
+class _GolgiMorphology:
+    dendrite_radius = 20.0
+    axon_x = 30.0
+    axon_y = 20.0
+    axon_z = 40.0
+
+
+class _CellType:
+    name = "golgi_cell"
+    morphology = _GolgiMorphology()
+
+
+def _run_gap_junctions(strategy_cls, cells, **config):
+    strategy = strategy_cls()
+    strategy.__dict__.update(config)
+    strategy.scaffold = _ConnectionRecorder({"golgi_cell": cells})
+    strategy.from_cell_types = [_CellType()]
+    strategy.from_cells = {"golgi_cell": cells}
+    strategy.connect()
+    return strategy.scaffold.connections
+
+
+class TestGapJunctionsTree(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(7)
+        self.cells = _random_cells(300, 0)
+
+    def test_golgi_matches_legacy(self):
+        legacy = _run_gap_junctions(ConnectomeGapJunctionsGolgi, self.cells)
+        tree = _run_gap_junctions(
+            ConnectomeGapJunctionsGolgiTree, self.cells, divergence=None
+        )
+        self.assertEqual(
+            set(map(tuple, legacy)), set(map(tuple, tree)), "Different candidates"
+        )
+
+    def test_divergence(self):
+        cells = self.cells
+        config = {"limit_xy": 60.0, "limit_z": 40.0, "divergence": 4}
+        result = _run_gap_junctions(ConnectomeGapJunctionsTree, cells, **config)
+        self.assertLessEqual(np.max(np.unique(result[:, 0], return_counts=True)[1]), 4)
+        pre = cells[result[:, 0].astype(int)]
+        post = cells[result[:, 1].astype(int)]
+        d_xy = np.sqrt(np.sum((pre[:, 2:4] - post[:, 2:4]) ** 2, axis=1))
+        d_z = np.abs(pre[:, 4] - post[:, 4])
+        self.assertTrue(np.all((d_xy < 60.0) & (d_z < 40.0) & (d_z != 0)))
@@ -0,0 +1,60 @@
+import unittest, os, sys, numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from bsb.functions import poisson_trains
+
+
+class TestPoissonTrains(unittest.TestCase):
+    def test_trains(self):
+        rng = np.random.RandomState(0)
+        times, offsets = poisson_trains(0.05, 1000, 500, 100, random_state=rng)
+        self.assertEqual(501, len(offsets))
+        self.assertEqual(len(times), offsets[-1])
+        self.assertTrue(np.all((times > 100) & (times <= 1100)))
+        counts = np.diff(offsets)
+        # 50 spikes expected per train, with a standard deviation of ~7.
+        self.assertAlmostEqual(50, np.mean(counts), delta=1.5)
+        for i in range(len(counts)):
+            train = times[offsets[i] : offsets[i + 1]]
+            self.assertTrue(np.all(np.diff(train) > 0), "Trains should be sorted")
+
+    def test_frequencies(self):
+        times, offsets = poisson_trains([0, 0.001, 1], 100, 3)
+        counts = np.diff(offsets)
+        self.assertEqual(0, counts[0])
+        # Trains that run past the first block of intervals are extended.
+        self.assertGreater(counts[2], 50)
+
+    def test_extension(self):
+        class ShortFirstTrain(np.random.RandomState):
+            # Shorten the first intervals of the first train so it doesn't reach the end.
+            sizes = []
+
+            def exponential(self, size):
+                intervals = super().exponential(size=size)
+                if not self.sizes:
+                    intervals[0] *= 0.1
+                self.sizes.append(size)
+                return intervals
+
+        rng = ShortFirstTrain(0)
+        times, offsets = poisson_trains(0.1, 100, 20, random_state=rng)
+        # Only the first train should be extended.
+        self.assertEqual(20, rng.sizes[0][0])
+        self.assertTrue(all(size[0] == 1 for size in rng.sizes[1:]))
+        self.assertGreater(len(rng.sizes), 1)
+        first = times[offsets[0] : offsets[1]]
+        self.assertTrue(np.all(np.diff(first) > 0), "Blocks should be merged in order")
+        self.assertGreater(first[-1], 50)
+        self.assertEqual(len(times), offsets[-1])
+
+    def test_seeded(self):
+        a = poisson_trains(0.1, 100, 10, random_state=np.random.RandomState(5))
+        b = poisson_trains(0.1, 100, 10, random_state=np.random.RandomState(5))
+        self.assertTrue(np.array_equal(a[0], b[0]))
+        self.assertTrue(np.array_equal(a[1], b[1]))
+
+    def test_empty(self):
+        times, offsets = poisson_trains(0.1, 100, 0)
+        self.assertEqual(0, len(times))
+        self.assertEqual([0], offsets.tolist())
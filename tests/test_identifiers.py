@@ -0,0 +1,50 @@
+import unittest, os, sys, numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from bsb.simulation import IdentifierMap
+from bsb.exceptions import *
+
+
+class TestIdentifierMap(unittest.TestCase):
+    def setUp(self):
+        self.map = IdentifierMap()
+        # Two contiguous cell types and a type with a gap in both id spaces.
+        self.map.add(range(0, 10), range(1, 11), "a")
+        self.map.add(range(10, 15), range(20, 25), "b")
+        self.map.add([30, 31, 40], [11, 12, 13], "c")
+
+    def test_runs(self):
+        self.assertEqual(18, len(self.map))
+        self.assertEqual(4, sum(len(r) for r in self.map._runs))
+
+    def test_to_simulator(self):
+        ids = self.map.to_simulator([0, 9, 10, 14, 31, 40, 5])
+        self.assertEqual([1, 10, 20, 24, 12, 13, 6], ids.tolist())
+
+    def test_to_scaffold(self):
+        ids = self.map.to_scaffold([1, 10, 20, 24, 12, 13, 6])
+        self.assertEqual([0, 9, 10, 14, 31, 40, 5], ids.tolist())
+
+    def test_round_trip(self):
+        ids = np.array([0, 3, 12, 30, 40, 14])
+        self.assertTrue(
+            np.array_equal(ids, self.map.to_scaffold(self.map.to_simulator(ids)))
+        )
+
+    def test_types(self):
+        types = self.map.get_types([40, 0, 11])
+        self.assertEqual(["c", "a", "b"], types.tolist())
+
+    def test_unmapped(self):
+        mask = self.map.contains([0, 15, 32, 40, -1, 41])
+        self.assertEqual([True, False, False, True, False, False], mask.tolist())
+        with self.assertRaises(UnmappedIdentifierError):
+            self.map.to_simulator([0, 15])
+        with self.assertRaises(UnmappedIdentifierError):
+            self.map.to_scaffold([0])
+        with self.assertRaises(UnmappedIdentifierError):
+            IdentifierMap().to_simulator([0])
+
+    def test_mismatch(self):
+        with self.assertRaises(AdapterError):
+            self.map.add([1, 2], [3])
@@ -0,0 +1,39 @@
+import unittest, os, sys, numpy as np, h5py
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from bsb.labels import LabelCollection
+
+
+class TestLabelCollection(unittest.TestCase):
+    def setUp(self):
+        self.labels = LabelCollection()
+        self.labels.label([5, 3, 1, 3], "odd")
+        self.labels.label([7], "odd")
+        self.labels.label(range(2, 9, 2), "even")
+        self.labels.label(range(4, 8), "big")
+
+    def test_label(self):
+        self.assertEqual([1, 3, 5, 7], list(self.labels.get("odd")))
+        self.assertEqual(["odd"], self.labels.find("odd"))
+        self.assertEqual([], self.labels.find("od"))
+        self.assertEqual(["odd"], self.labels.find("od*"))
+        self.assertEqual(3, len(self.labels.find("*")))
+
+    def test_set_algebra(self):
+        l = self.labels
+        self.assertEqual(list(range(1, 9)), list(l.union("odd", "even")))
+        self.assertEqual([5, 7], list(l.intersection("odd", "big")))
+        self.assertEqual([2, 8], list(l.difference("even", "big")))
+        mask = l.contains([0, 1, 2, 3, 9], "odd", "even")
+        self.assertEqual([False, True, True, True, False], list(mask))
+
+    def test_storage(self):
+        with h5py.File("labels_test.hdf5", "w", driver="core", backing_store=False) as f:
+            self.labels.label(range(100, 200), "range")
+            self.labels.store(f.create_group("labels"))
+            self.assertTrue(f["labels/range"].attrs["continuity"])
+            self.assertEqual(2, len(f["labels/range"]))
+            loaded = LabelCollection.from_group(f["labels"])
+        self.assertEqual(set(self.labels.keys()), set(loaded.keys()))
+        for label, ids in self.labels.items():
+            self.assertTrue(np.array_equal(ids, loaded.get(label)), label)
@@ -464,3 +464,80 @@ class TestDeviceProtocol(unittest.TestCase):
         self.assertEqual(1, len(adapter.result.recorders))
         adapter.simulate(simulator)
         adapter.collect_output()
+
+    def test_memory_spike_recorder(self):
+        import bsb.simulators.nest
+
+        config = JSONConfig(file=recorder_config)
+        config.simulations["test_recorders"].spike_collection = "memory"
+        scaffold = Scaffold(config)
+        adapter = scaffold.configuration.simulations["test_recorders"]
+        simulator = adapter.prepare()
+        recorder = adapter.result.recorders[0]
+        self.assertEqual(bsb.simulators.nest.MemorySpikeRecorder, recorder.__class__)
+        adapter.simulate(simulator)
+        spikes = recorder.get_data()
+        self.assertEqual(2, spikes.shape[1])
+        ids = scaffold.get_placement_set("test_cell").identifiers
+        self.assertTrue(np.all(np.isin(spikes[:, 0], ids)))
+
+    def test_empty_spike_recorder(self):
+        from glob import glob
+
+        for collection in ("files", "memory"):
+            with self.subTest(collection=collection):
+                config = JSONConfig(file=recorder_config)
+                simulation = config.simulations["test_recorders"]
+                simulation.spike_collection = collection
+                # Without the generator the cells don't spike.
+                del simulation.devices["gen"]
+                scaffold = Scaffold(config)
+                adapter = scaffold.configuration.simulations["test_recorders"]
+                adapter.simulate(adapter.prepare())
+                adapter.collect_output()
+                results = max(glob("results_test_recorders_*"), key=os.path.getmtime)
+                try:
+                    with h5py.File(results, "r") as f:
+                        spikes = f["recorders/soma_spikes/record_spikes"]
+                        self.assertEqual((0, 2), spikes.shape)
+                finally:
+                    os.remove(results)
+
+    def test_poisson_generators(self):
+        config = JSONConfig(file=recorder_config)
+        gen = config.simulations["test_recorders"].devices["gen"]
+        gen.device = "spike_generator"
+        gen.poisson = {"rate": 100.0, "stop": 10.0}
+        gen.parameters = {"origin": 1.0}
+        gen.synapse = {"model": "static_synapse", "weight": 2.5, "delay": 1.5}
+        scaffold = Scaffold(config)
+        adapter = scaffold.configuration.simulations["test_recorders"]
+        adapter.prepare()
+        generators = adapter.nest.GetNodes([0], {"model": "spike_generator"})[0]
+        targets = adapter.get_nest_ids(
+            scaffold.get_placement_set("test_cell").identifiers
+        )
+        self.assertEqual(len(targets), len(generators))
+        self.assertTrue(
+            all(o == 1.0 for o in adapter.nest.GetStatus(generators, "origin"))
+        )
+        # Each generator is connected to its own target with the configured synapse.
+        conns = adapter.nest.GetConnections(generators)
+        self.assertEqual(len(targets), len(conns))
+        self.assertEqual(sorted(targets), sorted(adapter.nest.GetStatus(conns, "target")))
+        for weight, delay in adapter.nest.GetStatus(conns, ["weight", "delay"]):
+            self.assertEqual(2.5, weight)
+            self.assertEqual(1.5, delay)
+
+
+class TestStorageOptions(unittest.TestCase):
+    def test_shapes(self):
+        from bsb.simulators.nest import _storage_options
+
+        with h5py.File("tmp.h5", "w", driver="core", backing_store=False) as f:
+            for i, shape in enumerate([(), (0, 2), (5, 0), (3, 2), (100000, 2)]):
+                data = np.ones(shape)
+                d = f.create_dataset(str(i), data=data, **_storage_options(data))
+                self.assertTrue(np.array_equal(data, d[()]), shape)
+        self.assertEqual({}, _storage_options(np.empty((0, 2))))
+        self.assertEqual((2 ** 15, 2), _storage_options(np.empty((100000, 2)))["chunks"])
@@ -476,3 +476,41 @@ class NeuronTest(unittest.TestCase):
                     ),
                 ]
             ).show()
+
+
+class TestResultShards(unittest.TestCase):
+    def test_virtual_index(self):
+        import tempfile
+        from bsb.simulators.neuron.adapter import (
+            _write_results,
+            _list_datasets,
+            _write_virtual_index,
+            _shard_filename,
+        )
+
+        with tempfile.TemporaryDirectory() as dir:
+            filename = os.path.join(dir, "results_test.hdf5")
+            node_results = [
+                [
+                    (("time",), np.arange(5.0), {"resolution": 0.1}),
+                    (("recorders", "soma_spikes", "0"), np.ones((2, 3)), {}),
+                ],
+                [(("recorders", "soma_spikes", "1"), np.zeros((2, 4)), {})],
+                [(("recorders", "soma_spikes", "1"), np.ones((2, 4)), {})],
+            ]
+            shards = []
+            for node, results in enumerate(node_results):
+                shard = _shard_filename(filename, node)
+                with h5py.File(shard, "w") as f:
+                    _write_results(f, results)
+                    shards.append((shard, _list_datasets(f)))
+            with h5py.File(filename, "w") as f:
+                _write_virtual_index(f, shards)
+            with h5py.File(filename, "r") as f:
+                self.assertTrue(np.array_equal(f["time"][()], np.arange(5.0)))
+                self.assertEqual(0.1, f["time"].attrs["resolution"])
+                self.assertEqual((2, 3), f["recorders/soma_spikes/0"].shape)
+                spikes = f["recorders/soma_spikes/1"][()]
+                self.assertEqual((4, 4), spikes.shape)
+                self.assertTrue(np.array_equal(spikes[:2], np.zeros((2, 4))))
+                self.assertTrue(np.array_equal(spikes[2:], np.ones((2, 4))))
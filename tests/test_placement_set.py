@@ -3,7 +3,8 @@ import unittest, os, sys, numpy as np, h5py, test_setup
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 from bsb.core import Scaffold, from_hdf5
 from bsb.config import JSONConfig
-from bsb.models import PlacementSet, Cell
+from bsb.models import PlacementSet, Cell, Resource
+from bsb.output import HDF5ResourceHandler
 from bsb.exceptions import DatasetNotFoundError
 
 
@@ -96,3 +97,107 @@ class TestPlacementSets(unittest.TestCase):
                 (3,),
                 "PlacementSet.cells positions wrong shape",
             )
+
+    def test_node_cells(self):
+        for name in ("from_cell", "to_cell"):
+            ps = self.scaffold.get_placement_set(name)
+            ids, positions = ps.identifiers, ps.positions
+            for nodes in (1, 3):
+                node_ids = []
+                for node in range(nodes):
+                    n_ids, n_positions = ps.get_node_cells(node, nodes)
+                    self.assertTrue(np.all(n_ids % nodes == node), "Wrong node cells")
+                    rows = np.searchsorted(ids, n_ids)
+                    self.assertTrue(np.array_equal(positions[rows], n_positions))
+                    node_ids.extend(n_ids)
+                self.assertEqual(sorted(ids), sorted(node_ids), "Cells not covered")
+
+
+class TestRoundRobinRows(unittest.TestCase):
+    def test_round_robin_rows(self):
+        from bsb.models import _round_robin_rows
+
+        # Identifiers 3-7 and 10-12, for node 1 out of 2
+        ids, rows = _round_robin_rows([3, 5, 10, 3], 1, 2)
+        self.assertEqual([3, 5, 7, 11], list(ids))
+        self.assertEqual([0, 2, 4, 6], list(rows))
+        # A single chain is read as a strided slice
+        ids, rows = _round_robin_rows([4, 6], 1, 4)
+        self.assertEqual([5, 9], list(ids))
+        self.assertEqual(slice(1, 6, 4), rows)
+
+
+class TestReadRows(unittest.TestCase):
+    def test_read_rows(self):
+        from bsb.output import _read_rows
+
+        data = np.arange(3000).reshape(-1, 3)
+        with h5py.File("rows.h5", "w", driver="core", backing_store=False) as f:
+            dset = f.create_dataset("data", data=data)
+            # Dense, sparse, unsorted and repeated rows, in multiple blocks.
+            rows = np.array([5, 3, 4, 999, 0, 500, 4, 6, 7])
+            for block in (2, 4, 100):
+                read = _read_rows(dset, rows, block=block)
+                self.assertTrue(np.array_equal(data[rows], read))
+            self.assertEqual((0, 3), _read_rows(dset, np.empty(0, dtype=int)).shape)
+
+
+class _Handler(HDF5ResourceHandler):
+    def __init__(self, file):
+        super().__init__()
+        self.file = file
+
+
+class TestMemoryMap(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        self.handler = _Handler("_test_memory_map.hdf5")
+        with h5py.File(self.handler.file, "w") as f:
+            f.create_dataset("contiguous", data=np.arange(30.0).reshape(-1, 3))
+            f.create_dataset("chunked", data=np.arange(30.0).reshape(-1, 3), chunks=True)
+            f.create_dataset("empty", shape=(0, 3))
+
+    @classmethod
+    def tearDownClass(self):
+        os.remove(self.handler.file)
+
+    def test_memory_map(self):
+        data = Resource(self.handler, "/contiguous").get_dataset(mmap=True)
+        self.assertTrue(np.array_equal(np.arange(30.0).reshape(-1, 3), data))
+        self.assertIsInstance(data.base, np.memmap)
+        self.assertFalse(data.flags.writeable)
+        view = Resource(self.handler, "/contiguous").get_dataset(
+            (slice(2, 4),), mmap=True
+        )
+        self.assertTrue(np.array_equal([[6, 7, 8], [9, 10, 11]], view))
+
+    def test_fallback(self):
+        chunked = Resource(self.handler, "/chunked").get_dataset(mmap=True)
+        self.assertTrue(np.array_equal(np.arange(30.0).reshape(-1, 3), chunked))
+        self.assertNotIsInstance(chunked.base, np.memmap)
+        empty = Resource(self.handler, "/empty").get_dataset(mmap=True)
+        self.assertEqual((0, 3), empty.shape)
+
+    def test_rewrite(self):
+        resource = Resource(self.handler, "/rewritten")
+        with self.handler.load("a") as f:
+            f().create_dataset("rewritten", data=np.zeros((4, 3)))
+            # Files that are open for writing are read instead of mapped.
+            self.assertNotIsInstance(resource.get_dataset(mmap=True).base, np.memmap)
+        first = resource.get_dataset(mmap=True)
+        self.assertTrue(np.shares_memory(first, resource.get_dataset(mmap=True)))
+        with self.handler.load("a") as f:
+            del f()["rewritten"]
+            f().create_dataset("rewritten", data=np.ones((5, 3)))
+        # The maps are dropped when the file is opened for writing.
+        second = resource.get_dataset(mmap=True)
+        self.assertFalse(np.shares_memory(first, second))
+        self.assertTrue(np.array_equal(np.ones((5, 3)), second))
+
+    def test_handler_default(self):
+        self.handler.memory_map = True
+        try:
+            data = Resource(self.handler, "/contiguous").get_dataset()
+            self.assertIsInstance(data.base, np.memmap)
+        finally:
+            del self.handler.memory_map
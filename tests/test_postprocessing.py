@@ -10,7 +10,7 @@ from bsb.exceptions import (
     MorphologyError,
     MissingMorphologyError,
 )
-from bsb.postprocessing import SpoofDetails
+from bsb.postprocessing import SpoofDetails, LabelMicrozones, DCNRotations
 
 
 def relative_to_tests_folder(path):
@@ -85,3 +85,57 @@ class TestPostProcessing(unittest.TestCase):
             MorphologyError, msg="Did not catch double relay spoofing!"
         ):
             sd.after_connectivity()
+
+
+class TestLabelMicrozones(unittest.TestCase):
+    def test_label_satellites(self):
+        """
+        Assert that satellites receive the labels of their planet
+        """
+        config = JSONConfig(file=_config)
+        scaffold = Scaffold(config)
+        planets = np.column_stack((np.arange(10), np.zeros((10, 3)), np.arange(10)))
+        satellites = np.column_stack((np.arange(10, 15), np.ones((5, 4))))
+        scaffold.cells_by_type["from_cell"] = planets
+        scaffold.cells_by_type["to_cell"] = satellites
+        config.cell_types["to_cell"].placement.planet_types = ["from_cell"]
+        scaffold._planets = {"to_cell": [8, 1, 6, 3, 4]}
+        hook = LabelMicrozones()
+        hook.scaffold = scaffold
+        hook.targets = ["from_cell"]
+        hook.after_placement()
+        positive = scaffold.get_labelled_ids("microzone-positive")
+        negative = scaffold.get_labelled_ids("microzone-negative")
+        self.assertEqual(positive.dtype, int, "Labels should be stored as int arrays")
+        self.assertEqual([5, 6, 7, 8, 9, 10, 12], sorted(positive))
+        self.assertEqual([0, 1, 2, 3, 4, 11, 13, 14], sorted(negative))
+
+
+class _AppendRecorder:
+    def __init__(self, cells):
+        self.cells = cells
+        self.appends = {}
+
+    def get_cells_by_type(self, name):
+        return self.cells
+
+    def append_dset(self, name, data):
+        self.appends[name] = data
+
+
+class TestDCNRotations(unittest.TestCase):
+    def test_seed(self):
+        """
+        Assert that seeded DCN rotations are reproducible
+        """
+        cells = np.column_stack((np.arange(50), np.zeros(50), np.random.rand(50, 3)))
+        results = []
+        for _ in range(2):
+            hook = DCNRotations()
+            hook.seed = 100
+            hook.scaffold = _AppendRecorder(cells)
+            hook.after_placement()
+            results.append(hook.scaffold.appends["cells/dcn_orientations"])
+        self.assertEqual((50, 5), results[0].shape)
+        self.assertTrue(np.array_equal(results[0], results[1]), "Seed not reproducible")
+        self.assertTrue(np.all(np.abs(results[0][:, 1:4]) <= 1))
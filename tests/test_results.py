@@ -0,0 +1,80 @@
+import unittest, os, sys, numpy as np, h5py, tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from bsb.simulation import SimulationResult, SimulationRecorder, append_dataset
+
+
+class _BufferRecorder(SimulationRecorder):
+    # Stand-in for a recorder that buffers samples in a growing vector.
+    def __init__(self, path, axis=0):
+        self.path = path
+        self.stream_axis = axis
+        self.buffer = []
+
+    def record(self, *samples):
+        self.buffer.extend(samples)
+
+    def get_path(self):
+        return self.path
+
+    def get_data(self):
+        data = np.array(self.buffer, dtype=float)
+        if self.stream_axis == 1:
+            return np.vstack((np.zeros(len(data)), data))
+        return data
+
+    def get_buffer_size(self):
+        return len(self.buffer) * 8
+
+    def clear(self):
+        self.buffer = []
+
+
+class TestStreamingResult(unittest.TestCase):
+    def setUp(self):
+        self.file = h5py.File(tempfile.mktemp(suffix=".hdf5"), "w")
+
+    def tearDown(self):
+        name = self.file.filename
+        self.file.close()
+        os.remove(name)
+
+    def test_append_dataset(self):
+        append_dataset(self.file, "a/b", np.empty((0,)))
+        append_dataset(self.file, "a/b", np.arange(3))
+        append_dataset(self.file, "a/b", np.arange(3, 5))
+        self.assertTrue(np.array_equal(self.file["a/b"][()], np.arange(5)))
+        append_dataset(self.file, "c", np.ones((2, 3)), axis=1)
+        append_dataset(self.file, "c", np.zeros((2, 1)), axis=1)
+        self.assertEqual((2, 4), self.file["c"].shape)
+        self.assertEqual((2, None), self.file["c"].maxshape)
+
+    def test_flush(self):
+        result = SimulationResult()
+        voltage = _BufferRecorder(("recorders", "v"))
+        spikes = _BufferRecorder(("recorders", "spikes"), axis=1)
+        result.add(voltage)
+        result.add(spikes)
+        result.create_recorder(lambda: ("time",), lambda: np.arange(3.0))
+        self.assertFalse(result.flush(), "Flushed without a stream")
+        result.stream(self.file, memory=8 * 4)
+        voltage.record(1, 2)
+        spikes.record(1)
+        self.assertFalse(result.flush(), "Flushed below the memory cap")
+        voltage.record(3)
+        self.assertTrue(result.flush(), "Didn't flush at the memory cap")
+        self.assertEqual([], voltage.buffer)
+        voltage.record(4)
+        spikes.record(5)
+        self.assertTrue(result.flush(force=True))
+        self.assertTrue(np.array_equal(self.file["recorders/v"][()], [1, 2, 3, 4]))
+        self.assertTrue(
+            np.array_equal(self.file["recorders/spikes"][()], [[0, 0], [1, 5]])
+        )
+        self.assertNotIn("time", self.file, "Streamed a recorder without stream axis")
+        # `collect` only yields what was recorded since the last flush.
+        voltage.record(6)
+        collected = {p: d for p, d, m in result.safe_collect()}
+        self.assertTrue(np.array_equal(collected[("recorders", "v")], [6]))
+        self.assertEqual((2, 0), collected[("recorders", "spikes")].shape)
+        self.assertTrue(np.array_equal(collected[("time",)], np.arange(3.0)))
@@ -42,3 +42,103 @@ class TestTargetting(unittest.TestCase):
             len(targets),
             "Targetting type `representatives` did not return the correct amount of representatives.",
         )
+
+
+class _Scaffold:
+    # Stand-in for a scaffold with placed cells and a stored tree for some types.
+    def __init__(self, cells, stored):
+        from types import SimpleNamespace
+        from sklearn.neighbors import KDTree
+
+        self.cells = cells
+        trees = {t: KDTree(cells[t][:, 2:5]) for t in stored}
+        self.trees = SimpleNamespace(cells=SimpleNamespace(get_tree=trees.get))
+
+    def get_cells_by_type(self, name):
+        return self.cells[name]
+
+    def get_cell_type(self, name):
+        from types import SimpleNamespace
+
+        return SimpleNamespace(name=name, entity=False)
+
+
+class TestSpatialIndex(unittest.TestCase):
+    def setUp(self):
+        from bsb.simulation.targetting import SpatialIndex
+
+        np.random.seed(0)
+        self.cells = {}
+        start = 0
+        for name, count in (("a", 300), ("b", 200), ("empty", 0)):
+            cells = np.zeros((count, 5))
+            cells[:, 0] = np.arange(start, start + count)
+            cells[:, 2:5] = np.random.rand(count, 3) * 100
+            self.cells[name] = cells
+            start += count
+        self.all = np.vstack(list(self.cells.values()))
+        self.index = SpatialIndex(_Scaffold(self.cells, stored=["a"]))
+
+    def test_sphere(self):
+        origin = np.array([50, 50, 50])
+        targets = self.index.sphere(["a", "b", "empty"], origin, 30)
+        d = np.sqrt(np.sum((self.all[:, 2:5] - origin) ** 2, axis=1))
+        self.assertEqual(self.all[d <= 30, 0].tolist(), targets.tolist())
+
+    def test_cylinder(self):
+        targets = self.index.cylinder(["b"], [20, 40], 25)
+        cells = self.cells["b"]
+        d2 = np.sum((cells[:, [2, 4]] - [20, 40]) ** 2, axis=1)
+        self.assertEqual(cells[d2 < 25 ** 2, 0].tolist(), targets.tolist())
+
+    def test_box(self):
+        targets = self.index.box(["a", "b"], [50, 20, 50], [40, 20, 100])
+        pos = self.all[:, 2:5]
+        inside = (
+            (np.abs(pos[:, 0] - 50) <= 20)
+            & (np.abs(pos[:, 1] - 20) <= 10)
+            & (np.abs(pos[:, 2] - 50) <= 50)
+        )
+        self.assertEqual(self.all[inside, 0].tolist(), targets.tolist())
+
+    def test_cache(self):
+        first = self.index.sphere(["a"], [0, 0, 0], 50)
+        first[:] = -1
+        self.assertEqual(1, len(self.index._cache))
+        second = self.index.sphere(["a"], [0, 0, 0], 50)
+        self.assertFalse(np.any(second == -1), "Cached targets were modified")
+        self.assertEqual(1, len(self.index._cache))
+
+
+class TestSeededTargetting(unittest.TestCase):
+    def _device(self, name, seed=None):
+        from bsb.simulation.targetting import TargetsNeurons
+
+        device = TargetsNeurons()
+        device.name = name
+        device.cell_types = ["a"]
+        device.cell_fraction = 0.5
+        device.scaffold = _Scaffold({"a": np.arange(1000).reshape(-1, 5)}, stored=[])
+        device._get_targets = device._targets_cell_type
+        if seed is not None:
+            device.seed = seed
+        return device
+
+    def test_deterministic(self):
+        # Independently created devices, as on different MPI processes.
+        first, second = self._device("stim"), self._device("stim")
+        first.initialise_targets()
+        second.initialise_targets()
+        self.assertTrue(len(first.get_targets()) > 0)
+        self.assertEqual(first.get_targets().tolist(), second.get_targets().tolist())
+
+    def test_seeds(self):
+        targets = []
+        for device in (self._device("stim"), self._device("other")):
+            device.initialise_targets()
+            targets.append(device.get_targets().tolist())
+        self.assertNotEqual(*targets, "Devices should be seeded by name")
+        seeded = [self._device(name, seed=42) for name in ("stim", "other")]
+        for device in seeded:
+            device.initialise_targets()
+        self.assertEqual(*[d.get_targets().tolist() for d in seeded])